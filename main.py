@@ -1,29 +1,30 @@
+import logging
 import os
 import sys
 
-# from PyQt5 import uic
-from PyQt5.QtWidgets import QApplication
-
-from src.windows.NewMeasurementTab import *
-from src.windows.main_window import MainWindow
-from src.scan.recording import MicrophoneManagerSingleton
+# Создаем отдельный логгер для текущего модуля
+logger = logging.getLogger(__name__)
 
 
-# Конфигурация логирования
-logging.basicConfig(
-    level=logging.DEBUG,  # Установить уровень логирования
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # Формат сообщений
-    handlers=[
-        logging.FileHandler("application.log"),  # Запись логов в файл
-        logging.StreamHandler(sys.stdout)  # Вывод логов в консоль
-    ]
-)
+def main():
+    #интерфейс и журнал поднимаются только при запуске приложения: процессы пула подбора гиперпараметров (spawn)
+    #заново импортируют этот модуль как __mp_main__ и не должны загружать Qt и открывать application.log
+    # from PyQt5 import uic
+    from PyQt5.QtWidgets import QApplication
 
-# Создаем отдельный логгер для текущего модуля
-logger = logging.getLogger(__name__)
+    from src.windows.main_window import MainWindow
+    from src.scan.recording import MicrophoneManagerSingleton
 
+    # Конфигурация логирования
+    logging.basicConfig(
+        level=logging.DEBUG,  # Установить уровень логирования
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # Формат сообщений
+        handlers=[
+            logging.FileHandler("application.log"),  # Запись логов в файл
+            logging.StreamHandler(sys.stdout)  # Вывод логов в консоль
+        ]
+    )
 
-if __name__ == "__main__":
     logger.info("Запуск приложения")  # Логирование начала выполнения программы
     mic = MicrophoneManagerSingleton()
     os.remove("application.log")
@@ -38,4 +39,8 @@ if __name__ == "__main__":
         logger.critical(f"Критическая ошибка при запуске приложения: {e}", exc_info=True)
         sys.exit(1)
 
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
+
+
+if __name__ == "__main__":
+    main()
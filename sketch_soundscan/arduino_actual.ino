@@ -43,6 +43,15 @@ bool making_ding = false;
 bool prepearing_for_new_blade = false;
 bool base_returning = false;
 bool base_run_flag = false;
+bool base_repositioning = false; //продолжение прерванного сканирования: база с поднятой головкой идет к позиции следующей лопатки
+bool resume_pending = false; //после перехода и опускания головки запускается сканирование
+
+//события: при изменении флагов режимов отправляется только то, что изменилось, с порядковым номером
+//{"s":номер,"bf":1,"p":положение базы}; полный снимок (sendStatus) отправляется по команде status и содержит "seq"
+const char* const EVENT_KEYS[] = {"sip", "hp", "bf", "pb", "pr", "md", "pnb", "br", "brp"}; //порядок = биты flagsMask()
+const int EVENT_FLAGS_COUNT = 9;
+uint16_t event_seq = 0;
+uint16_t sent_flags = 0xFFFF; //флаги, уже известные компьютеру (после последнего события или снимка)
 
 //!!!!!!!!!!!!!!!!!
 int blade_width = 16;//расстояние в шагах двигателя которое требуется для того чтобы переступить через шину лопатку(для того чтобы после дзыня головка опускалась не на лопатку а готовилась к новой лопатке)
@@ -56,19 +65,23 @@ int accel_head = 2000;//ускорение медиатора
 int MaxSpeed_head = 1000; //макс скорость медиатора
 
 // JSON буфер и объект
-const size_t capacity = 400;
+const size_t capacity = 512; //с запасом под set_config (все настройки одним сообщением)
 StaticJsonDocument<capacity> jsonDoc;
-char jsonBuffer[256];  // Буфер для хранения строкового JSON
+char jsonBuffer[320];  // Буфер для хранения строкового JSON
 
 // Прототипы функций
 void handleIncomingData();
 void parseJsonCommand(const char* json);
 void executeCommand(const JsonDocument& doc);
+void applyConfig(const JsonDocument& doc);
 void updateTenzoData();
 void controlMotors();
 void sendStatus();
+void sendEvent();
+uint16_t flagsMask();
 void setupMotors();
 void start_scan();
+void resume_scan(long position);
 void ding();
 void return_base();
 
@@ -128,7 +141,7 @@ void setup() {
 
         blade_found = true;
         base_run_flag = false;
-        sendStatus();
+        sendEvent();
         stepper_base.stop();
         stepper_base.setSpeed(10);
         stepper_base.setAcceleration(10); 
@@ -146,7 +159,7 @@ void setup() {
         stepper_base.stop();
         base_run_flag = false;
         pulling_blade = false;
-        sendStatus();
+        sendEvent();
         stepper_base.setSpeed(speed_base);
         stepper_base.setAcceleration(accel_base); 
         stepper_base.setMaxSpeed(MaxSpeed_base);
@@ -178,7 +191,7 @@ void setup() {
               wait_recording_start_time = millis();
               prepearing_for_new_blade = true; //если головка поднята - подготовить медиатор к поиску след. лопатки
               stepper_base.setTarget(blade_width, RELATIVE);
-              sendStatus(); 
+              sendEvent(); 
               stepper_head.reset();
             }else{
               stepper_head.tick();
@@ -215,7 +228,7 @@ void setup() {
             blade_found = false;
             stepper_base.setTarget(circle_in_steps, ABSOLUTE); // продолжаем двигаться к конечной точке равной полному кругу
             base_run_flag = true;
-            sendStatus();
+            sendEvent();
   
               }
               else{
@@ -242,7 +255,7 @@ void setup() {
     if(digitalRead(limitSwitchPin) == 0){ //за счет stepper_head.tick() происходит движение до ранее заданного значения которое находится в парсере комманд
       head_lifting = false;
       head_position = false; // Обновляем положение головки(головка опускается - выходит на нерабочее положение, поэтому head_position = false)
-      sendStatus(); 
+      sendEvent(); 
     }else{
       stepper_head.tick();
       }
@@ -253,7 +266,11 @@ void setup() {
     if(digitalRead(limitSwitchPin)){
       head_falling = false;
       head_position = true; // Обновляем положение головки (головка опускается - выходит на рабочее положение, поэтому head_position = true)
-       sendStatus();
+       sendEvent();
+       if (resume_pending){ //головка опущена после перехода к позиции продолжения - сканирование продолжается с этого места
+        resume_pending = false;
+        start_scan();
+        }
 //       stepper_head.setTarget(-1200,  RELATIVE);
 //       while(stepper_head.tick()){
 //        }
@@ -266,6 +283,22 @@ void setup() {
        stepper_head.disable();
       }
   } 
+   if (base_repositioning && !head_position && !head_lifting){ //переход к позиции продолжения только с поднятой головкой
+    if(!stepper_base.tick()){
+      base_repositioning = false;
+      resume_pending = true;
+      stepper_base.setSpeed(speed_base);
+      stepper_base.setAcceleration(accel_base);
+      stepper_base.setMaxSpeed(MaxSpeed_base);
+      head_falling = true;
+      stepper_head.reset();
+      stepper_head.setSpeed(speed_head);
+      stepper_head.setAcceleration(accel_head);
+      stepper_head.setMaxSpeed(MaxSpeed_head);
+      stepper_head.setTarget(-32000, RELATIVE);
+      sendEvent();
+      }
+   }
    if (base_returning){ //сначала должна быть поднята головка
            if (!head_lifting && head_position){ //логика "заряжания" медиатора на поднятие
           head_lifting = true;
@@ -282,7 +315,7 @@ void setup() {
               if(!digitalRead(limitSwitchPin)){ //за счет stepper_head.tick() происходит движение до ранее заданного значения которое находится в парсере комманд
               head_lifting = false;
               head_position = false; 
-              sendStatus();
+              sendEvent();
 //               stepper_head.disable();
             }
           
@@ -294,7 +327,7 @@ void setup() {
         stepper_base.setSpeed(speed_base);
         stepper_base.setAcceleration(accel_base); 
         stepper_base.setMaxSpeed(MaxSpeed_base);
-        sendStatus();
+        sendEvent();
       }
     
         }
@@ -381,6 +414,9 @@ void executeCommand(const JsonDocument& doc) {
       MaxSpeed_head = doc["MaxSpeed"].as<int>();
       }
   }
+  else if (strcmp(command, "set_config") == 0) { //все настройки установки одним сообщением (одно эхо вместо семи)
+    applyConfig(doc);
+  }
   else if (strcmp(command, "set_motor_on") == 0) {
       Is_motor_on = doc["state"].as<bool>();
       if (Is_motor_on) {
@@ -401,7 +437,7 @@ void executeCommand(const JsonDocument& doc) {
 //      moveHeadUp(speed_head,accel_head,MaxSpeed_head);  // Поднять головку
   } else if (strcmp(command, "move_head_down") == 0) {//новая логика поднятия головки, основанная на флагах(основное действие выполняется в loop для избегания лишних циклов while)
       pressure_threshold = doc["pressure"].as<int>();  // Установить давление для остановки
-      if(!head_falling && head_position == false && !scan_in_progress){
+      if(!head_falling && head_position == false && !scan_in_progress && !base_repositioning){
         head_falling = true;
         stepper_head.reset();
         stepper_head.setSpeed(speed_head);     // задаем макс скорость для издавания звука
@@ -415,19 +451,22 @@ void executeCommand(const JsonDocument& doc) {
      else if (strcmp(command, "start_scan") == 0){
       start_scan();
       }
+    else if (strcmp(command, "resume_scan") == 0){
+      resume_scan(doc["position"].as<long>());
+      }
     else if (strcmp(command, "return_base") == 0){
       return_base();
       }
     else if (strcmp(command, "ding") == 0){
       if(scan_in_progress && pressure_reached){
         making_ding = true;
-        sendStatus(); //там где изменяются флаги режимов вызывается отправка статуса
+        sendEvent(); //там где изменяются флаги режимов вызывается отправка статуса
         }
       }
     else if (strcmp(command, "pull_blade") == 0){
       if(scan_in_progress && blade_found){
         pulling_blade = true;
-        sendStatus();//там где изменяются флаги режимов вызывается отправка статуса
+        sendEvent();//там где изменяются флаги режимов вызывается отправка статуса
         }
       }
     else if (strcmp(command, "status") == 0){
@@ -436,6 +475,47 @@ void executeCommand(const JsonDocument& doc) {
       
 }
 
+// Применение set_config: {"head": [speed, accel, MaxSpeed], "base": [...], "searching_time", "circle_in_steps",
+// "recording_time", "force_to_find", "blade_width", "pressure", "motor_on"}; отсутствующие ключи не меняются
+void applyConfig(const JsonDocument& doc) {
+  if (doc.containsKey("head")){
+    speed_head = doc["head"][0].as<int>();
+    accel_head = doc["head"][1].as<int>();
+    MaxSpeed_head = doc["head"][2].as<int>();
+    }
+  if (doc.containsKey("base")){
+    speed_base = doc["base"][0].as<int>();
+    accel_base = doc["base"][1].as<int>();
+    MaxSpeed_base = doc["base"][2].as<int>();
+    }
+  if (doc.containsKey("searching_time")){
+    search_interval = doc["searching_time"].as<long>();
+    }
+  if (doc.containsKey("circle_in_steps")){
+    circle_in_steps = doc["circle_in_steps"].as<long>();
+    }
+  if (doc.containsKey("recording_time")){
+    prepearing_time = doc["recording_time"].as<long>();
+    }
+  if (doc.containsKey("force_to_find")){
+    pressure_to_find_blade = doc["force_to_find"].as<int>();
+    }
+  if (doc.containsKey("blade_width")){
+    blade_width = doc["blade_width"].as<int>();
+    }
+  if (doc.containsKey("pressure")){
+    pressure_threshold = doc["pressure"].as<int>();
+    }
+  if (doc.containsKey("motor_on")){
+    Is_motor_on = doc["motor_on"].as<bool>();
+    if (Is_motor_on) {
+      stepper_base.enable();
+    } else {
+      stepper_base.disable();
+    }
+  }
+}
+
 // Обновление данных с тензодатчика
 void updateTenzoData() {
   if (millis() - lastUpdateTime >= TenzoUpdateRate) {
@@ -486,7 +566,28 @@ void start_scan(){
     stepper_base.setTarget(circle_in_steps, ABSOLUTE);
     scan_in_progress = true;
     finding_timer = millis();
-    sendStatus();
+    sendEvent();
+  }
+}
+
+// Продолжение прерванного сканирования: position - положение базы (от base_init_pos) на последней записанной лопатке.
+// Головка поднимается, база переходит через эту лопатку, головка опускается и поиск продолжается до конца круга
+void resume_scan(long position){
+  if(!scan_in_progress && !base_returning && !base_repositioning){
+    base_repositioning = true;
+    stepper_base.setSpeed(400);
+    stepper_base.setAcceleration(400);
+    stepper_base.setMaxSpeed(4000);
+    stepper_base.setTarget(base_init_pos + position + blade_width, ABSOLUTE);
+    if (head_position && !head_lifting){
+      head_lifting = true;
+      stepper_head.reset();
+      stepper_head.setSpeed(speed_head);
+      stepper_head.setAcceleration(accel_head);
+      stepper_head.setMaxSpeed(MaxSpeed_head);
+      stepper_head.setTarget(32000, RELATIVE);
+      }
+    sendEvent();
   }
 }
 
@@ -499,6 +600,8 @@ void return_base(){
 //      }
     // Обновляем положение головки(головка опускается - выходит на нерабочее положение, поэтому head_position = false)
     stepper_base.brake();
+    base_repositioning = false;
+    resume_pending = false;
     pressure_reached = false;
     pulling_blade = false;
     making_ding = false;
@@ -513,11 +616,37 @@ void return_base(){
     stepper_base.setMaxSpeed(4000);//выставляем макс скорость для быстрого возврата
     finding_timer = 0;
     stepper_base.setTarget(base_init_pos, ABSOLUTE); //задаем стартовую позицию
-    sendStatus();
+    sendEvent();
   
   }
 
-void sendStatus() { //новый sendStatus теперь возвращает флаги режимов и работает по запросу(когда изменяются эти флаги режима), а не постоянно
+uint16_t flagsMask() {
+  return (scan_in_progress << 0) | (head_position << 1) | (blade_found << 2) | (pulling_blade << 3) |
+         (pressure_reached << 4) | (making_ding << 5) | (prepearing_for_new_blade << 6) | (base_returning << 7) |
+         (base_repositioning << 8);
+}
+
+void sendEvent() { //вызывается там, где изменяются флаги режимов; отправляет только изменившиеся флаги
+  uint16_t flags = flagsMask();
+  uint16_t changed = flags ^ sent_flags;
+  if (!changed) {
+    return;
+  }
+  event_seq++;
+  jsonDoc.clear();
+  jsonDoc["s"] = event_seq;
+  for (int i = 0; i < EVENT_FLAGS_COUNT; i++) {
+    if (changed & (1 << i)) {
+      jsonDoc[EVENT_KEYS[i]] = (flags >> i) & 1;
+    }
+  }
+  jsonDoc["p"] = stepper_base.getCurrent() - base_init_pos;
+  sent_flags = flags;
+  serializeJson(jsonDoc, Serial);
+  Serial.println();
+}
+
+void sendStatus() { //полный снимок флагов режимов по команде status (для синхронизации компьютера после пропуска события)
     jsonDoc.clear();
     jsonDoc["scan_in_progress"] = scan_in_progress;
     jsonDoc["head_position"] = head_position ? "down" : "up";
@@ -527,6 +656,10 @@ void sendStatus() { //новый sendStatus теперь возвращает ф
     jsonDoc["making_ding"] = making_ding;
     jsonDoc["prepearing_for_new_blade"] = prepearing_for_new_blade;
     jsonDoc["base_returning"] = base_returning;
+    jsonDoc["base_repositioning"] = base_repositioning;
+    jsonDoc["base_position"] = stepper_base.getCurrent() - base_init_pos; //для продолжения сканирования после обрыва связи
+    jsonDoc["seq"] = event_seq; //события с этим и меньшими номерами уже учтены в снимке
+    sent_flags = flagsMask();
     
 
   serializeJson(jsonDoc, Serial);  // Отправка JSON данных
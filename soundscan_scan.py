@@ -0,0 +1,188 @@
+"""
+Сканирование без графического интерфейса: та же логика (Scanning, конвейер, запись лопаток), что и во вкладке
+«Новое измерение», но в QCoreApplication без виджетов — для запуска с линейного ПК по расписанию или из супервизора.
+
+    python soundscan_scan.py --disk-type "Тип диска" --repeats 10
+    python soundscan_scan.py --disk-type 3 --repeats 0 --rig "Установка 2"   # бесконечная серия до Ctrl+C/SIGTERM
+    python soundscan_scan.py --disk-type 3 --repeats 5 --all   # серия на каждой установке станции
+
+По умолчанию сканирует первая установка станции; платы остальных установок не открываются.
+Первый SIGINT/SIGTERM останавливает серии после текущего диска (база возвращается), второй — выходит сразу.
+Код выхода: 0 — отсканирован хотя бы один диск, 1 — сканирование не состоялось, 2 — ни одна плата не подключилась.
+"""
+import argparse
+import logging
+import signal
+import sys
+from functools import partial
+
+logger = logging.getLogger("soundscan_scan")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Сканирование дисков без графического интерфейса")
+    parser.add_argument("--disk-type", required=True, help="имя или id типа диска")
+    parser.add_argument("--repeats", type=int, default=1, help="дисков в серии; 0 — до остановки")
+    rigs = parser.add_mutually_exclusive_group()
+    rigs.add_argument("--rig", default=None, help="установка станции (DeviceConfig.name или id); по умолчанию первая")
+    rigs.add_argument("--all", action="store_true", help="серия на каждой установке станции")
+    parser.add_argument("--resume", action="store_true",
+                        help="продолжить прерванное сканирование этого типа диска, если оно есть")
+    parser.add_argument("--connect-timeout", type=float, default=30.0, help="ожидание подключения платы, с")
+    parser.add_argument("--log-file", default=None, help="файл журнала (по умолчанию только stdout)")
+    args = parser.parse_args(argv)
+    if args.repeats < 0:
+        parser.error("--repeats: число дисков не может быть отрицательным (0 — до остановки)")
+    return args
+
+
+def find_disk_type_id(session, disk_type):
+    from src.models import DiskType
+    row = session.query(DiskType).filter_by(name=disk_type).first()
+    if row is None and disk_type.isdigit():
+        row = session.query(DiskType).get(int(disk_type))
+    return row.id if row is not None else None
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if args.log_file:
+        handlers.append(logging.FileHandler(args.log_file))
+    #настраивается до импорта модулей сканирования, иначе их basicConfig направит журнал в application.log
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        handlers=handlers)
+
+    #тяжёлые модули (Qt, БД, аудио, модели) — после разбора аргументов: --help и ошибки аргументов мгновенны
+    from PyQt5.QtCore import QCoreApplication, QTimer
+    from src.config import settings
+    from src.db import Session
+    from src.scan import scan_session
+    from src.scan.blade_writer import BladeWriter
+    from src.scan.series import format_disk, format_series
+    from src.scan.station import Station
+
+    with Session() as session:
+        disk_type_id = find_disk_type_id(session, args.disk_type)
+    if disk_type_id is None:
+        logger.error(f"Тип диска '{args.disk_type}' не найден")
+        return 1
+
+    app = QCoreApplication(sys.argv[:1])
+    blade_writer = BladeWriter(settings.BLADE_JOURNAL_DIR, batch_size=settings.BLADE_WRITE_BATCH,
+                               flush_interval=settings.BLADE_FLUSH_INTERVAL)
+    blade_writer.start()
+    station = Station(blade_writer)
+    if args.all:
+        station.load()
+    elif args.rig is not None:
+        station.load([args.rig])
+    else:
+        station.load(first_only=True)
+    if not station.rigs:
+        logger.error(f"Установка '{args.rig}' не найдена в device_config")
+        blade_writer.close(settings.BLADE_FLUSH_TIMEOUT)
+        return 1
+    #по серии на установку; done — серия завершилась или плата не подключилась (no_connection)
+    runs = [{"rig": rig, "scan": None, "summary": None, "done": False, "no_connection": False}
+            for rig in station.rigs]
+    state = {"stopping": False, "resume_taken": False}
+
+    def finish(run):
+        run["done"] = True
+        if all(other["done"] for other in runs):
+            app.quit()
+
+    def start_scan(run):
+        rig = run["rig"]
+        resume = None
+        #прерванное сканирование продолжает одна установка — первая подключившаяся
+        if args.resume and not state["resume_taken"]:
+            state["resume_taken"] = True
+            blade_writer.flush(settings.BLADE_FLUSH_TIMEOUT)
+            resume = scan_session.find_resumable(disk_type_id, station.active_disk_scans())
+            if resume is not None:
+                logger.info(f"{rig.name}: продолжение сканирования {resume['disk_scan_id']} "
+                            f"с лопатки {resume['last_blade_num'] + 1}")
+        arduino_worker, microphone, recorder = rig.worker, None, None
+        if settings.SCAN_RECORD_DIR:
+            import os
+            from datetime import datetime
+            from src.scan.replay import ScanRecorder
+            name = datetime.now().strftime("%Y%m%d_%H%M%S") + (f"_{rig.config_id}" if len(runs) > 1 else "")
+            recorder = ScanRecorder(os.path.join(settings.SCAN_RECORD_DIR, name),
+                                    meta={"disk_type_id": disk_type_id, "repeats": args.repeats or None,
+                                          "resume": resume})
+            arduino_worker = recorder.wrap_worker(arduino_worker)
+            microphone = recorder.wrap_microphone(rig.microphone)
+        scan = station.create_scan(rig, disk_type_id, repeats=args.repeats or None, resume=resume,
+                                   arduino_worker=arduino_worker, microphone=microphone)
+        scan.disk_finished.connect(lambda result: logger.info(f"{rig.name}: {format_disk(result)}"))
+
+        def on_finished():
+            run["summary"] = scan.series.summary()
+            if recorder is not None:
+                arduino_worker.close()
+                recorder.close()
+            finish(run)
+
+        scan.scanning_finished.connect(on_finished)
+        run["scan"] = scan
+        logger.info(f"{rig.name}: запуск серии ({args.repeats or 'без ограничения'} дисков), тип диска {disk_type_id}")
+        station.run(rig)
+
+    def on_connection_established(run, connected):
+        if connected and run["scan"] is None and not run["done"] and not state["stopping"]:
+            start_scan(run)
+
+    def on_connect_timeout():
+        for run in runs:
+            if run["scan"] is None and not run["done"]:
+                logger.error(f"{run['rig'].name}: плата не подключилась за {args.connect_timeout:.0f} с")
+                run["no_connection"] = True
+                finish(run)
+
+    def on_signal(signum, frame):
+        active = [run for run in runs if run["scan"] is not None and not run["done"]]
+        if active and not state["stopping"]:
+            logger.info("Остановка серий после текущего диска (повторный сигнал — немедленный выход)")
+            state["stopping"] = True
+            for run in active:
+                station.stop_scan(run["rig"])
+            #установки, плата которых ещё не подключилась, серию уже не начнут
+            for run in runs:
+                if run["scan"] is None and not run["done"]:
+                    finish(run)
+        else:
+            state["stopping"] = True
+            app.quit()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    #обработчики сигналов Python выполняются только между байткодами — цикл Qt периодически отдаёт управление
+    signal_timer = QTimer()
+    signal_timer.timeout.connect(lambda: None)
+    signal_timer.start(200)
+
+    for run in runs:
+        run["rig"].worker.connection_established.connect(partial(on_connection_established, run))
+    station.start()
+    QTimer.singleShot(int(args.connect_timeout * 1000), on_connect_timeout)
+    app.exec_()
+
+    station.close()
+    for run in runs:
+        run["rig"].worker.wait(5000)
+    if not blade_writer.flush(settings.BLADE_FLUSH_TIMEOUT):
+        logger.warning("Не все лопатки записаны в БД, они остались в журнале и будут отправлены при следующем запуске")
+    blade_writer.close(settings.BLADE_FLUSH_TIMEOUT)
+    for run in runs:
+        if run["summary"] is not None:
+            logger.info(f"{run['rig'].name}: {format_series(run['summary'])}")
+    if any(run["summary"] is not None and run["summary"]["disks"] > 0 for run in runs):
+        return 0
+    return 2 if all(run["no_connection"] for run in runs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
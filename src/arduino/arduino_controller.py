@@ -14,14 +14,20 @@ logger = logging.getLogger(__name__)
 
 
 class ArduinoController():
-    def __init__(self):
+    def __init__(self, config_id=None, auto_connect=True):
+        """
+        :param config_id: строка DeviceConfig установки станции; None — первая строка (одна установка на ПК)
+        :param auto_connect: искать плату на других портах, если порт из БД недоступен. На станции из нескольких
+            установок поиск выключен: он подключил бы установку к чужой плате.
+        """
         self.serial = QSerialPort()
         self.port_name = None  # Текущий используемый порт
+        self.config_id = config_id
 
         logger.info("Инициализация ArduinoController.")
         # Загружаем порт из базы и пытаемся подключиться
         self.load_port_from_db()
-        if not self.port_name:
+        if not self.port_name and auto_connect:
             self.auto_connect()
         if not self.port_name:
             logger.warning("Портов для подключения ARDUINO не обнаружено")
@@ -35,7 +41,7 @@ class ArduinoController():
         """
         session = DatabaseSession()
         try:
-            config = session.query(DeviceConfig).first()
+            config = self.query_config(session)
             if config:
                 logger.info(f"Попытка подключения к порту из базы данных: {config.operating_port}")
                 self.connect_to_device(config.operating_port, config.SerialBaudRate)
@@ -48,13 +54,18 @@ class ArduinoController():
         finally:
             session.close()
 
+    def query_config(self, session):
+        if self.config_id is not None:
+            return session.query(DeviceConfig).get(self.config_id)
+        return session.query(DeviceConfig).first()
+
     def save_port_to_db(self, port_name, baud_rate):
         """
         Сохранение нового порта в базу данных.
         """
         session = DatabaseSession()
         try:
-            config = session.query(DeviceConfig).first()
+            config = self.query_config(session)
             if config:
                 config.operating_port = port_name
                 config.SerialBaudRate = baud_rate
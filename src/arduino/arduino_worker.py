@@ -1,12 +1,15 @@
 import sys
 import os
 import json
+import hashlib
+import logging
 from PyQt5.QtCore import QThread, pyqtSignal, QObject, pyqtSlot
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QLabel
 import serial
 import time
 import threading
 
+logger = logging.getLogger(__name__)
+
 # Класс для взаимодействия с Arduino в отдельном потоке
 class ArduinoWorker(QThread): #модифицировано на переподключение каждые 5 сек если плата была отключена от компа
     data_received = pyqtSignal(str)
@@ -22,6 +25,7 @@ class ArduinoWorker(QThread): #модифицировано на перепод
         self.expected_response = None
         self.response = None
         self.connected = False
+        self.config_hash = None #хеш последней конфигурации, подтверждённой платой в текущем подключении
 
     def run(self):
         while self.is_running:
@@ -35,6 +39,7 @@ class ArduinoWorker(QThread): #модифицировано на перепод
 
                     self.arduino = serial.Serial(port_name, self.baudrate, timeout=10)
                     time.sleep(2)  # Задержка для установления соединения
+                    self.config_hash = None #плата перезагружается при открытии порта, её настройки сброшены
                     self.connected = True
                     self.connection_established.emit(True)
                     print("Подключено к Arduino")
@@ -63,6 +68,7 @@ class ArduinoWorker(QThread): #модифицировано на перепод
                 print(f"Ошибка чтения: {e}")
                 self.connection_established.emit(False)
                 self.connected = False
+                self.config_hash = None
                 if self.arduino:
                     self.arduino.close()
                     self.arduino = None
@@ -80,6 +86,20 @@ class ArduinoWorker(QThread): #модифицировано на перепод
         if self.arduino:
             self.arduino.close()
 
+    def apply_config(self, config):
+        """
+        Отправляет все настройки установки одним сообщением set_config. Если в этом подключении плата
+        уже подтвердила такую же конфигурацию, ничего не отправляется. Возвращает True, если настройки на плате.
+        """
+        config_hash = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+        if config_hash == self.config_hash:
+            logger.info("Конфигурация установки не изменилась, отправка пропущена")
+            return True
+        if not self.send_command({"command": "set_config", **config}):
+            return False
+        self.config_hash = config_hash
+        return True
+
     def send_command(self, command, retries=3, timeout=5):
         attempt = 0
         json_command = json.dumps(command)
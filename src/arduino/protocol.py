@@ -0,0 +1,75 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# флаги режимов установки и их короткие ключи в событиях (порядок = номер бита в прошивке, см. flagsMask())
+EVENT_FLAGS = (
+    ("scan_in_progress", "sip"),
+    ("head_position", "hp"),  # в событии 1 = опущена ("down")
+    ("blade_found", "bf"),
+    ("pulling_blade", "pb"),
+    ("pressure_reached", "pr"),
+    ("making_ding", "md"),
+    ("prepearing_for_new_blade", "pnb"),
+    ("base_returning", "br"),
+    ("base_repositioning", "brp"),
+)
+SEQ_MODULO = 1 << 16  # номер события в прошивке — uint16_t
+
+
+def is_event(message: dict) -> bool:
+    """Событие-дельта: {"s": номер, <короткий ключ>: 0/1, ..., "p": положение базы}"""
+    return "s" in message
+
+
+def decode_event(message: dict) -> dict:
+    """Изменившиеся флаги события в виде полей полного снимка статуса"""
+    flags = {}
+    for name, key in EVENT_FLAGS:
+        if key in message:
+            value = bool(message[key])
+            flags[name] = ("down" if value else "up") if name == "head_position" else value
+    if "p" in message:
+        flags["base_position"] = message["p"]
+    return flags
+
+
+class RigState:
+    """
+    Состояние установки на стороне приложения, собранное из полных снимков (ответ на status)
+    и событий-дельт, которые прошивка отправляет при каждом изменении флага.
+    Снимок задаёт состояние целиком и номер последнего события; событие применяется поверх.
+    Пропущенный номер события (потеря строки на линии) означает, что состояние могло разойтись с установкой:
+    apply() возвращает False, и вызывающий запрашивает полный снимок.
+    """
+
+    def __init__(self):
+        self.flags = {}
+        self.seq = None  # номер последнего учтённого события
+        self.synced = False  # был хотя бы один полный снимок; до него набор флагов неполный
+        self.gaps = 0
+        self.events = 0
+
+    def apply(self, message: dict) -> bool:
+        if not is_event(message):
+            self.flags = dict(message)
+            self.seq = message.get("seq")
+            self.synced = True
+            return True
+        self.events += 1
+        if self.seq is not None:
+            step = (message["s"] - self.seq) % SEQ_MODULO
+            if step == 0 or step > SEQ_MODULO // 2:
+                return True  # событие уже учтено в более позднем снимке
+        else:
+            step = None
+        self.flags.update(decode_event(message))
+        seq, self.seq = self.seq, message["s"]
+        if step != 1:
+            self.gaps += 1
+            logger.warning(f"Пропуск событий установки: после {seq} пришло {message['s']}")
+            return False
+        return True
+
+    def snapshot(self) -> dict:
+        return dict(self.flags)
@@ -0,0 +1,399 @@
+import argparse
+import heapq
+import json
+import logging
+import os
+import random
+import select
+import threading
+import time
+import tty
+from dataclasses import dataclass
+
+from src.arduino.protocol import EVENT_FLAGS, SEQ_MODULO
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RigTimingModel:
+    """Модель времени и отказов виртуальной установки (секунды)"""
+    blade_count: int = 20
+    search_time: float = 0.8  # поиск лопатки базой
+    pull_time: float = 0.3  # натягивание до давления
+    ding_time: float = 0.1  # подъём медиатора до концевика
+    head_move_time: float = 0.5  # опускание/подъём головки вне цикла
+    return_time: float = 1.5  # возврат базы к старту
+    jitter: float = 0.1  # относительный разброс всех времён (0.1 = ±10 %)
+    miss_rate: float = 0.0  # вероятность не заметить лопатку (она пропускается)
+    abort_rate: float = 0.0  # вероятность, что поиск очередной лопатки истечёт по search_interval
+    event_loss: float = 0.0  # вероятность потерять строку события на линии (проверка досинхронизации по status)
+    seed: int = None
+
+
+class VirtualRig:
+    """
+    Программная замена скетча sketch_soundscan/arduino_actual.ino для работы без железа.
+    Поднимает пару псевдотерминалов: хост (ArduinoWorker) открывает подчинённый конец как обычный
+    последовательный порт (port_name, например "pts/5" — ArduinoWorker добавляет "/dev/"),
+    а установка читает JSON-команды с ведущего конца. Как и скетч, установка повторяет каждую
+    принятую строку (эхо, которого ждёт ArduinoWorker.send_command), меняет флаги режимов по
+    командам и по таймингам RigTimingModel и при каждом изменении отправляет событие с изменившимися
+    флагами и номером (src/arduino/protocol.py); полный снимок — по команде status.
+    legacy_status=True воспроизводит прошивку до событий: полный снимок при каждом изменении.
+    Всё выполняется в одном потоке с очередью отложенных событий, поэтому гонок между
+    командами и таймерами нет.
+    """
+
+    def __init__(self, timing: RigTimingModel = None, legacy_status: bool = False):
+        self.timing = timing or RigTimingModel()
+        self.legacy_status = legacy_status
+        self.random = random.Random(self.timing.seed)
+
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)  # без эха и преобразования строк на стороне терминала
+        self.port_name = os.path.relpath(os.ttyname(self.slave_fd), "/dev")
+
+        self.events = []  # (время, порядковый номер, действие)
+        self.event_seq = 0
+        self.buffer = b""
+        self.running = False
+        self.thread = threading.Thread(target=self._run, name="virtual-rig", daemon=True)
+
+        # параметры, задаваемые командами set_* (значения по умолчанию как в скетче)
+        self.prepearing_time = 3.0
+        self.search_interval = 20.0
+        self.pressure_threshold = 500
+        self.blade_width = 16
+        self.circle_in_steps = 14400
+        self.motor_on = False
+
+        # флаги режимов — те же, что отправляет sendStatus() скетча
+        self.scan_in_progress = False
+        self.head_position = True  # True = опущена ("down")
+        self.blade_found = False
+        self.pulling_blade = False
+        self.pressure_reached = False
+        self.making_ding = False
+        self.prepearing_for_new_blade = False
+        self.base_returning = False
+        self.base_repositioning = False
+        self.head_moving = False
+        self.base_position = 0  # шаги от начальной позиции; лопатки равномерно расставлены по кругу
+
+        self.blades_left = 0
+        self.commands_received = 0
+        self.statuses_sent = 0
+        self.events_sent = 0
+        self.events_lost = 0
+        self.status_seq = 0  # номер последнего события протокола (s)
+        self.sent_flags = None  # флаги, уже известные хосту
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        logger.info(f"Виртуальная установка запущена на порту {self.port_name}")
+        return self.port_name
+
+    def stop(self):
+        self.running = False
+        self.thread.join(1.0)
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+    def _duration(self, base):
+        return max(0.0, base * (1 + self.random.uniform(-self.timing.jitter, self.timing.jitter)))
+
+    def _schedule(self, delay, action):
+        self.event_seq += 1
+        heapq.heappush(self.events, (time.monotonic() + delay, self.event_seq, action))
+
+    def _run(self):
+        while self.running:
+            timeout = 0.05
+            if self.events:
+                timeout = min(timeout, max(0.0, self.events[0][0] - time.monotonic()))
+            readable, _, _ = select.select([self.master_fd], [], [], timeout)
+            if readable:
+                try:
+                    self.buffer += os.read(self.master_fd, 1024)
+                except OSError:
+                    return
+                while b"\n" in self.buffer:
+                    line, self.buffer = self.buffer.split(b"\n", 1)
+                    self._handle_line(line.decode(errors="replace").strip())
+            while self.events and self.events[0][0] <= time.monotonic():
+                _, _, action = heapq.heappop(self.events)
+                action()
+
+    def _write(self, line):
+        os.write(self.master_fd, (line + "\r\n").encode())
+
+    def _flags(self):
+        return {name: getattr(self, name) for name, _ in EVENT_FLAGS}
+
+    def send_event(self):
+        """Изменившиеся с прошлой отправки флаги, как sendEvent() скетча"""
+        if self.legacy_status:
+            self.send_status()
+            return
+        flags = self._flags()
+        changed = {name: value for name, value in flags.items()
+                   if self.sent_flags is None or self.sent_flags[name] != value}
+        if not changed:
+            return
+        self.status_seq = (self.status_seq + 1) % SEQ_MODULO
+        self.sent_flags = flags
+        event = {"s": self.status_seq}
+        event.update({key: int(changed[name]) for name, key in EVENT_FLAGS if name in changed})
+        event["p"] = self.base_position
+        if self.random.random() < self.timing.event_loss:
+            self.events_lost += 1
+            return
+        self.events_sent += 1
+        self._write(json.dumps(event, separators=(",", ":")))
+
+    def send_status(self):
+        self.statuses_sent += 1
+        self.sent_flags = self._flags()
+        self._write(json.dumps({
+            "scan_in_progress": self.scan_in_progress,
+            "head_position": "down" if self.head_position else "up",
+            "blade_found": self.blade_found,
+            "pulling_blade": self.pulling_blade,
+            "pressure_reached": self.pressure_reached,
+            "making_ding": self.making_ding,
+            "prepearing_for_new_blade": self.prepearing_for_new_blade,
+            "base_returning": self.base_returning,
+            "base_repositioning": self.base_repositioning,
+            "base_position": self.base_position,
+            "seq": self.status_seq,
+        }, separators=(",", ":")))
+
+    def _handle_line(self, line):
+        if not line:
+            return
+        self._write(line)  # эхо принятой строки, как Serial.println(jsonBuffer) в скетче
+        self.commands_received += 1
+        try:
+            command = json.loads(line)
+        except json.JSONDecodeError:
+            self._write("Ошибка парсинга JSON")
+            return
+        handler = getattr(self, f"cmd_{command.get('command')}", None)
+        if handler is not None:
+            handler(command)
+
+    # --- команды настройки ---
+    def cmd_set_searching_time(self, command):
+        self.search_interval = command["searching_time"] / 1000
+
+    def cmd_set_recording_time(self, command):
+        self.prepearing_time = command["recording_time"] / 1000
+
+    def cmd_set_circle(self, command):
+        self.circle_in_steps = command["circle_in_steps"]
+
+    def cmd_set_blade_width(self, command):
+        self.blade_width = command["blade_width"]
+
+    def cmd_set_pressure(self, command):
+        self.pressure_threshold = command["pressure"]
+
+    def cmd_set_motor_on(self, command):
+        self.motor_on = bool(command["state"])
+
+    def cmd_set_config(self, command):
+        """Все настройки одним сообщением, как applyConfig() скетча; отсутствующие ключи не меняются"""
+        for key, handler in (("searching_time", self.cmd_set_searching_time),
+                             ("recording_time", self.cmd_set_recording_time),
+                             ("circle_in_steps", self.cmd_set_circle),
+                             ("blade_width", self.cmd_set_blade_width),
+                             ("pressure", self.cmd_set_pressure)):
+            if key in command:
+                handler(command)
+        if "motor_on" in command:
+            self.motor_on = bool(command["motor_on"])
+
+    def cmd_status(self, command):
+        self.send_status()
+
+    # --- движение ---
+    def cmd_move_head_down(self, command):
+        self.pressure_threshold = command.get("pressure", self.pressure_threshold)
+        if not self.head_moving and not self.head_position and not self.scan_in_progress and not self.base_repositioning:
+            self.head_moving = True
+            self._schedule(self._duration(self.timing.head_move_time), self._head_down)
+
+    def cmd_move_head_up(self, command):
+        if not self.head_moving and self.head_position and not self.scan_in_progress:
+            self.head_moving = True
+            self._schedule(self._duration(self.timing.head_move_time), self._head_up)
+
+    def _head_down(self):
+        self.head_moving = False
+        self.head_position = True
+        self.send_event()
+
+    def blade_position(self, index):
+        """Положение лопатки index (с 1) в шагах базы"""
+        return index * self.circle_in_steps // (self.timing.blade_count + 1)
+
+    def _head_up(self):
+        self.head_moving = False
+        self.head_position = False
+        self.send_event()
+
+    def cmd_start_scan(self, command):
+        if not self.blade_found and self.head_position and not self.scan_in_progress:
+            #как и в скетче, поиск идёт от текущего положения базы до конца круга
+            self.blades_left = sum(1 for index in range(1, self.timing.blade_count + 1)
+                                   if self.blade_position(index) > self.base_position)
+            self.scan_in_progress = True
+            self.send_event()
+            self._search_next()
+
+    def cmd_resume_scan(self, command):
+        """Головка поднимается, база переходит через лопатку в position, головка опускается, поиск продолжается"""
+        if self.scan_in_progress or self.base_returning or self.base_repositioning:
+            return
+        self.base_repositioning = True
+        self.send_event()
+        delay = 0.0
+        if self.head_position:
+            delay = self._duration(self.timing.head_move_time)
+            self._schedule(delay, self._head_up)
+        target = command["position"] + self.blade_width
+        self._schedule(delay + self._duration(self.timing.return_time), lambda: self._repositioned(target))
+
+    def _repositioned(self, target):
+        self.base_position = target
+        self.base_repositioning = False
+        self.head_moving = True
+        self.send_event()
+        self._schedule(self._duration(self.timing.head_move_time), self._resume_head_down)
+
+    def _resume_head_down(self):
+        self._head_down()
+        self.cmd_start_scan(None)
+
+    def _search_next(self):
+        """Поиск следующей лопатки: находка, пропуск или истечение search_interval"""
+        if self.blades_left <= 0:
+            # круг пройден — скетч возвращает базу, не доходя reserve_value до полного оборота
+            self._schedule(self._duration(self.timing.search_time), self._return_if_scanning)
+            return
+        if self.random.random() < self.timing.abort_rate:
+            self._schedule(self.search_interval, self._return_if_scanning)
+            return
+        delay = self._duration(self.timing.search_time)
+        while self.blades_left > 1 and self.random.random() < self.timing.miss_rate:
+            self.blades_left -= 1
+            delay += self._duration(self.timing.search_time)
+        self._schedule(delay, self._blade_found)
+
+    def _return_if_scanning(self):
+        if self.scan_in_progress:
+            self.cmd_return_base(None)
+
+    def _blade_found(self):
+        if not self.scan_in_progress or self.blade_found:
+            return
+        self.base_position = self.blade_position(self.timing.blade_count - self.blades_left + 1)
+        self.blades_left -= 1
+        self.blade_found = True
+        self.send_event()
+
+    def cmd_pull_blade(self, command):
+        if self.scan_in_progress and self.blade_found and not self.pulling_blade and not self.pressure_reached:
+            self.pulling_blade = True
+            self.send_event()
+            self._schedule(self._duration(self.timing.pull_time), self._pressure_reached)
+
+    def _pressure_reached(self):
+        if not self.pulling_blade:
+            return
+        self.pulling_blade = False
+        self.pressure_reached = True
+        self.send_event()
+
+    def cmd_ding(self, command):
+        if self.scan_in_progress and self.pressure_reached and not self.making_ding:
+            self.making_ding = True
+            self.send_event()
+            self._schedule(self._duration(self.timing.ding_time), self._ding_done)
+
+    def _ding_done(self):
+        if not self.making_ding:
+            return
+        self.head_position = False
+        self.pressure_reached = False
+        self.making_ding = False
+        self.prepearing_for_new_blade = True
+        self.send_event()
+        # скетч ждёт prepearing_time (время записи), переступает лопатку и опускает головку
+        self._schedule(self.prepearing_time + self._duration(self.timing.head_move_time), self._ready_for_next)
+
+    def _ready_for_next(self):
+        if not self.prepearing_for_new_blade:
+            return
+        self.head_position = True
+        self.prepearing_for_new_blade = False
+        self.blade_found = False
+        self.send_event()
+        self._search_next()
+
+    def cmd_return_base(self, command):
+        self.events = [event for event in self.events if event[2] in (self._head_down, self._head_up)]
+        heapq.heapify(self.events)
+        self.head_moving = bool(self.events)  # отменённое опускание головки после перехода базы не ждём
+        self.pressure_reached = False
+        self.pulling_blade = False
+        self.making_ding = False
+        self.prepearing_for_new_blade = False
+        self.scan_in_progress = False
+        self.blade_found = False
+        self.base_repositioning = False
+        self.base_returning = True
+        self.send_event()
+        delay = 0.0
+        if self.head_position:
+            delay = self._duration(self.timing.head_move_time)
+            self._schedule(delay, self._head_up)
+        self._schedule(delay + self._duration(self.timing.return_time), self._base_returned)
+
+    def _base_returned(self):
+        self.base_position = 0
+        self.base_returning = False
+        self.send_event()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Виртуальная установка SoundScan на псевдотерминале")
+    parser.add_argument("--blades", type=int, default=RigTimingModel.blade_count)
+    parser.add_argument("--search-time", type=float, default=RigTimingModel.search_time)
+    parser.add_argument("--pull-time", type=float, default=RigTimingModel.pull_time)
+    parser.add_argument("--jitter", type=float, default=RigTimingModel.jitter)
+    parser.add_argument("--miss-rate", type=float, default=RigTimingModel.miss_rate)
+    parser.add_argument("--abort-rate", type=float, default=RigTimingModel.abort_rate)
+    parser.add_argument("--event-loss", type=float, default=RigTimingModel.event_loss)
+    parser.add_argument("--legacy-status", action="store_true", help="полный снимок статуса вместо событий")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    rig = VirtualRig(RigTimingModel(blade_count=args.blades, search_time=args.search_time, pull_time=args.pull_time,
+                                    jitter=args.jitter, miss_rate=args.miss_rate, abort_rate=args.abort_rate,
+                                    event_loss=args.event_loss, seed=args.seed),
+                     legacy_status=args.legacy_status)
+    port = rig.start()
+    print(f"Порт виртуальной установки: {port} (укажите его в 'Параметры установки' или DeviceConfig.operating_port)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        rig.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,46 @@ class Settings(BaseSettings):
     DEV_MODE: bool = False
     OPERATING_PORT: Optional[int] = None
     SERIAL_BAUD_RATE: Optional[int] = None
+    # теневая оценка лопаток моделями-кандидатами (не влияет на результат сканирования)
+    SHADOW_MODE: bool = False
+    SHADOW_MAX_CANDIDATES: int = 3
+    # бэкенд инференса при сканировании: "keras" или "tflite"
+    INFERENCE_BACKEND: str = "keras"
+    # поиск лопаток, выбивающихся из остальных лопаток диска (Махаланобис по признакам, во время сканирования)
+    OUTLIER_DETECTION: bool = True
+    OUTLIER_ALPHA: float = 0.001  # уровень значимости: доля ложных срабатываний на нормальных лопатках
+    OUTLIER_MIN_BLADES: int = 8  # лопаток диска до начала оценки
+    # размер очереди перед каждой стадией конвейера сканирования (запись/признаки/предсказание/сохранение)
+    PIPELINE_QUEUE_SIZE: int = 4
+    # отложенная запись лопаток: локальный журнал + пакетная вставка в БД
+    BLADE_JOURNAL_DIR: str = "blade_journal"
+    BLADE_WRITE_BATCH: int = 16
+    BLADE_FLUSH_INTERVAL: float = 1.0  # с, максимальная задержка неполной пачки
+    BLADE_FLUSH_TIMEOUT: float = 10.0  # с, ожидание записи лопаток в БД по окончании сканирования
+    # каталог записи сканирований (обмен с установкой и звук) для воспроизведения без установки; None — не записывать
+    SCAN_RECORD_DIR: Optional[str] = None
+    # экспортировать ли квантованный TFLite-вариант при сохранении модели
+    EXPORT_TFLITE: bool = True
+    # полное обучение keras-модели: ранняя остановка по val_loss вместо фиксированного числа эпох
+    MAX_EPOCHS: int = 300
+    VALIDATION_SPLIT: float = 0.2
+    EARLY_STOPPING_PATIENCE: int = 15
+    # аугментация сигналов при полном обучении (генерируются на лету, в БД не сохраняются)
+    AUGMENTATION: bool = False
+    AUGMENT_FACTOR: int = 4  # сколько искажённых вариантов каждой лопатки в эпохе
+    AUGMENT_WORKERS: int = 4  # потоки извлечения признаков
+    AUGMENT_QUEUE_SIZE: int = 10  # батчей в очереди предвыборки
+    # дообучение текущей модели на новых размеченных лопатках
+    INCREMENTAL_EPOCHS: int = 5
+    INCREMENTAL_REPLAY_RATIO: float = 1.0  # доля старых лопаток относительно новых
+    # автоматическое дообучение в простое при накоплении новой разметки
+    AUTO_RETRAIN: bool = False
+    AUTO_RETRAIN_THRESHOLD: int = 50  # новых размеченных лопаток с момента последней модели
+    AUTO_RETRAIN_INTERVAL: int = 300  # период проверки, с
+    # подбор гиперпараметров с k-fold кросс-валидацией
+    SEARCH_TRIALS: int = 12
+    SEARCH_FOLDS: int = 5
+    SEARCH_WORKERS: Optional[int] = None  # None — по числу ядер
 
     class Config:
         env_file = ".env"
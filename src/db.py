@@ -1,3 +1,5 @@
+import datetime
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
@@ -9,3 +11,8 @@ engine = create_engine(settings.DB_URL)
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+
+def utcnow():
+    """Значение по умолчанию для created_at: время вставки строки (UTC), а не время импорта модуля"""
+    return datetime.datetime.now(datetime.UTC)
@@ -1,9 +1,9 @@
 import datetime
 from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, LargeBinary, cast, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 
 from src.config import settings
-from src.db import Base
+from src.db import Base, utcnow
 
 
 
@@ -15,10 +15,12 @@ class DiskScan(Base):
     name = Column(String, nullable=False)
     disk_type_id = Column(Integer, ForeignKey(f'{settings.DB_SCHEMA}.disk_type.id', ondelete='CASCADE'), nullable=False)
     is_training = Column(Boolean, nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+    created_at = Column(DateTime, default=utcnow)
 
     disk_type = relationship("DiskType", back_populates="disk_scans")
     blades = relationship("Blade", back_populates="disk_scan", cascade="all, delete", passive_deletes=True)
+    session = relationship("ScanSession", back_populates="disk_scan", uselist=False, cascade="all, delete",
+                           passive_deletes=True)
 
 
 
@@ -32,7 +34,7 @@ class DiskType(Base):
     diameter = Column(Integer, nullable=False, default=0)
     blade_distance = Column(Integer, nullable=False, default=0)
     blade_force = Column(Integer, nullable=False, default=0)  # Значение по умолчанию
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+    created_at = Column(DateTime, default=utcnow)
 
     disk_scans = relationship("DiskScan", back_populates="disk_type", cascade="all, delete", passive_deletes=True)
     models = relationship("DiskTypeModel", back_populates="disk_type", cascade="all, delete", passive_deletes=True)
@@ -51,7 +53,10 @@ class Blade(Base):
     # scan = Column(String, nullable=False)
     scan = Column(LargeBinary, nullable=False)
     prediction = Column(Boolean, nullable=True)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+    created_at = Column(DateTime, default=utcnow)
+    labeled_at = Column(DateTime, nullable=True)  # когда оператор последний раз подтвердил/изменил разметку
+    uid = Column(String(36), unique=True, nullable=True)  # идентификатор записи журнала BladeWriter (повторная вставка пропускается)
+    base_position = Column(Integer, nullable=True)  # положение базы при записи лопатки, шаги от начала сканирования
 
     disk_scan = relationship("DiskScan", back_populates="blades")
 
@@ -62,9 +67,33 @@ class DiskTypeModel(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     disk_type_id = Column(Integer, ForeignKey(f'{settings.DB_SCHEMA}.disk_type.id', ondelete='CASCADE'), nullable=False)
-    model = Column(Text, nullable=False)
+    model = deferred(Column(Text, nullable=False))  # артефакт загружается только при явном обращении
+    model_type = Column(String, nullable=False, default="keras")  # формат артефакта: keras / sklearn / numpy
     is_current = Column(Boolean, nullable=False)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.UTC))
+    created_at = Column(DateTime, default=utcnow)
+
+    # метаданные модели: по ним вкладка обучения строит список моделей, не загружая сам артефакт
+    feature_version = Column(String, nullable=True)  # версия алгоритма извлечения признаков
+    input_dim = Column(Integer, nullable=True)
+    train_samples = Column(Integer, nullable=True)
+    history = Column(Text, nullable=True)  # JSON с историей accuracy/loss по эпохам
+    artifact_size = Column(Integer, nullable=True)  # размер артефакта модели в байтах
+    train_duration = Column(Float, nullable=True)  # длительность обучения в секундах
+
+    # квантованный TFLite-вариант модели (base64), используется бэкендом инференса "tflite"
+    tflite_model = deferred(Column(Text, nullable=True))
+    tflite_size = Column(Integer, nullable=True)
+
+    # происхождение модели: полное обучение или дообучение (warm start) от родительской модели
+    training_mode = Column(String, nullable=True)  # "full" / "incremental"
+    parent_model_id = Column(Integer, ForeignKey(f'{settings.DB_SCHEMA}.disk_type_model.id', ondelete='SET NULL'), nullable=True)
+    data_since = Column(DateTime, nullable=True)  # окно данных, на которых модель дообучалась
+    data_until = Column(DateTime, nullable=True)
+    replay_samples = Column(Integer, nullable=True)  # сколько старых лопаток подмешано против забывания
+
+    # результаты подбора гиперпараметров: параметры лучшей модели и метрики k-fold кросс-валидации (JSON)
+    hyperparams = Column(Text, nullable=True)
+    cv_metrics = Column(Text, nullable=True)
 
     disk_type = relationship("DiskType", back_populates="models")
 
@@ -75,6 +104,11 @@ class DeviceConfig(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
+    # на одном ПК может работать несколько установок (станция), у каждой своя строка настроек
+    name = Column(String, default="", nullable=True)
+    audio_device = Column(String, nullable=True)  # часть имени аудиоинтерфейса установки; None — устройство по умолчанию
+    audio_channel = Column(Integer, default=0, nullable=True)  # входной канал микрофона установки
+
     operating_port = Column(String, default="")
     SerialBaudRate = Column(Integer, default=115200)
 
@@ -98,3 +132,59 @@ class DeviceConfig(Base):
     recording_time = Column(Integer, default = 4000, nullable=True)
     force_to_find = Column(Integer, default = 50,nullable=True)
 
+
+class BladePhaseTiming(Base):
+    """Длительности фаз цикла лопатки при сканировании, мс (см. src/scan/telemetry.PHASES)"""
+    __tablename__ = 'blade_phase_timing'
+    __table_args__ = {'schema': settings.DB_SCHEMA}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    disk_scan_id = Column(Integer, ForeignKey(f'{settings.DB_SCHEMA}.disk_scan.id', ondelete='CASCADE'), nullable=False)
+    blade_num = Column(Integer, nullable=False)
+
+    # фазы установки (по переходам состояний сканирования)
+    search = Column(Float, nullable=True)
+    pull = Column(Float, nullable=True)
+    ding_command = Column(Float, nullable=True)
+    ding = Column(Float, nullable=True)
+    next_blade = Column(Float, nullable=True)
+    # стадии конвейера обработки
+    capture_wait = Column(Float, nullable=True)
+    capture = Column(Float, nullable=True)
+    features = Column(Float, nullable=True)
+    predict = Column(Float, nullable=True)
+    persist = Column(Float, nullable=True)
+
+
+class ShadowPrediction(Base):
+    """Предсказания моделей-кандидатов, полученные в теневом режиме во время сканирования"""
+    __tablename__ = 'shadow_prediction'
+    __table_args__ = {'schema': settings.DB_SCHEMA}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    disk_scan_id = Column(Integer, ForeignKey(f'{settings.DB_SCHEMA}.disk_scan.id', ondelete='CASCADE'), nullable=False)
+    blade_num = Column(Integer, nullable=False)
+    model_id = Column(Integer, ForeignKey(f'{settings.DB_SCHEMA}.disk_type_model.id', ondelete='CASCADE'), nullable=False)
+    score = Column(Float, nullable=False)
+    prediction = Column(Boolean, nullable=False)
+    created_at = Column(DateTime, default=utcnow)
+
+
+class ScanSession(Base):
+    """
+    Состояние сканирования диска для продолжения после обрыва связи с установкой или аварийного завершения.
+    status: running — идёт (или приложение упало во время сканирования), interrupted — связь потеряна,
+    finished — диск завершён, abandoned — оператор отказался продолжать.
+    """
+    __tablename__ = 'scan_session'
+    __table_args__ = {'schema': settings.DB_SCHEMA}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    disk_scan_id = Column(Integer, ForeignKey(f'{settings.DB_SCHEMA}.disk_scan.id', ondelete='CASCADE'), nullable=False,
+                          unique=True)
+    status = Column(String(16), nullable=False, default="running")
+    last_blade_num = Column(Integer, nullable=False, default=0)  # последняя лопатка, сохранённая в журнал BladeWriter
+    base_position = Column(Integer, nullable=True)  # положение базы на этой лопатке, шаги от начала сканирования
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+    disk_scan = relationship("DiskScan", back_populates="session")
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from enum import Enum
 from venv import logger
 import json
 import logging
@@ -14,20 +15,27 @@ from collections import deque
 
 import io
 import wave
-import pyaudio
 
 from PyQt5.QtCore import QObject, pyqtSlot, pyqtSignal
-from tensorflow.python.tools.saved_model_cli import command_required_flags
 
 # from PyQt5.QtSql import record
 
 from src.arduino.arduino_controller import ArduinoController
 from src.arduino.arduino_worker import ArduinoWorker
+from src.arduino.protocol import RigState
 
 from src.db import Session as DatabaseSession, Session
 from src.models import DeviceConfig, DiskScan, Blade, DiskType
 from src.scan.recording import MicrophoneManagerSingleton
-from src.scan.ml_predict import load_model_from_db, extract_features
+from src.scan.features import extract_features
+from src.scan.model_backends import load_inference_model
+from src.scan.pipeline import BladeJob, ScanPipeline
+from src.scan.blade_writer import BladeWriter
+from src.scan.telemetry import ScanTelemetry, format_summary
+from src.scan.series import SeriesScheduler, format_disk, format_series
+from src.scan import scan_session
+from src.scan.outliers import OnlineOutlierDetector
+from src.config import settings
 
 logging.basicConfig(
     level=logging.DEBUG,  # Установить уровень логирования
@@ -38,19 +46,54 @@ logging.basicConfig(
     ]
 )
 
+class ScanState(Enum):
+    UNKNOWN = "unknown"  # снимков статуса ещё не было
+    HEAD_UP = "head_up"  # сканирование не идёт, головка поднята
+    IDLE = "idle"  # сканирование не идёт, головка опущена
+    SEARCHING = "searching"  # база вращается в поиске лопатки
+    BLADE_FOUND = "blade_found"
+    PULLING = "pulling"  # натягивание лопатки до давления blade_force
+    PRESSURE_REACHED = "pressure_reached"
+    DING = "ding"  # медиатор отпускает лопатку, идёт запись
+    PREPARING = "preparing"  # ожидание окончания записи и переход к следующей лопатке
+    RETURNING = "returning"  # возврат базы в начальное положение
+    REPOSITIONING = "repositioning"  # продолжение прерванного сканирования: переход базы к следующей лопатке
+    FINISHED = "finished"
+
+
+# ожидаемые переходы; неожиданный переход логируется, но выполняется (установка — источник истины)
+TRANSITIONS = {
+    ScanState.UNKNOWN: set(ScanState) - {ScanState.UNKNOWN},
+    ScanState.HEAD_UP: {ScanState.IDLE, ScanState.SEARCHING, ScanState.RETURNING, ScanState.REPOSITIONING},
+    ScanState.IDLE: {ScanState.HEAD_UP, ScanState.SEARCHING, ScanState.RETURNING, ScanState.REPOSITIONING},
+    ScanState.SEARCHING: {ScanState.BLADE_FOUND, ScanState.RETURNING},
+    ScanState.BLADE_FOUND: {ScanState.PULLING, ScanState.PRESSURE_REACHED, ScanState.RETURNING},
+    ScanState.PULLING: {ScanState.PRESSURE_REACHED, ScanState.RETURNING},
+    ScanState.PRESSURE_REACHED: {ScanState.DING, ScanState.PREPARING, ScanState.RETURNING},
+    ScanState.DING: {ScanState.PREPARING, ScanState.RETURNING},
+    ScanState.PREPARING: {ScanState.SEARCHING, ScanState.BLADE_FOUND, ScanState.RETURNING},
+    ScanState.RETURNING: {ScanState.HEAD_UP, ScanState.IDLE},
+    ScanState.REPOSITIONING: {ScanState.HEAD_UP, ScanState.IDLE, ScanState.SEARCHING, ScanState.RETURNING},
+}
+
+
 @dataclass  #дата класс для ленивой подгрузки последней найденной лопатки
 class LastBlade:
     disk_type_id : int
     disk_scan_id : int
     num : int
     prediction : bool
+    outlier : bool = False #выбивается из остальных лопаток диска
+    outlier_score : float = None
 
 
 class Scanning(QObject):
-    scanning_finished = pyqtSignal()
+    scanning_finished = pyqtSignal() #серия завершена (для одиночного сканирования — после единственного диска)
+    disk_finished = pyqtSignal(object) #DiskThroughput очередного диска серии
     blade_downloaded = pyqtSignal(object)
 
-    def __init__(self, disk_type_id,arduino_worker):
+    def __init__(self, disk_type_id,arduino_worker, blade_writer=None, microphone=None, repeats=1, resume=None,
+                 device_config_id=None, model_cache=None):
         super().__init__()
 
         self.lastFoundBlade = None #переменная для ленивой подгрузки последней найденной лопатки
@@ -58,11 +101,22 @@ class Scanning(QObject):
         self.stopped = None
         self.event_queue = deque()
         self.processing = False
-        self.recording_duration = None #присваиваем значение ниже в методе get_motors_settings_from_db или set_default_motor_settings
+        self.rig_state = RigState() #флаги установки, собранные из снимков статуса и событий-дельт
+        self.resync_requested = False #после пропуска события запрошен полный снимок, ответ ещё не пришёл
+        self.recording_duration = None #присваиваем значение ниже в методе push_motor_settings
+        self.series = SeriesScheduler(repeats) #repeats=None — бесконечная серия до остановки
+        self.resume = resume #прерванное сканирование, с которого начинается серия (scan_session.find_resumable)
         self.num = 0
-        self.blade_created = False
+        self.state = ScanState.UNKNOWN
+        self.previous_state = None
+        self.state_changed = False
+        self.state_entered_at = time.monotonic()
+        self.state_action_done = False #действие текущего состояния выполнено (команда подтверждена установкой)
+        self.telemetry = ScanTelemetry() #длительности фаз каждой лопатки
         self.data_updated = False
         self.base_returning = None
+        self.base_repositioning = None
+        self.base_position = None #положение базы из последнего снимка статуса, шаги от начала сканирования
         self.preparing_for_new_blade = None
         self.making_ding = None
         self.pressure_reached = None
@@ -74,9 +128,18 @@ class Scanning(QObject):
         self.blade_force = None
         self.disk_scan_id = None
         self.disk_type_id = disk_type_id
+        self.device_config_id = device_config_id #строка DeviceConfig установки станции; None — первая (одна установка)
         self.is_running = False
 
         self.ml_model = None #если модель не загружена, то сканирование просто собирает дата сет без предсказаний
+        self.ml_predict = None #функция предсказания по вектору признаков для выбранного бэкенда
+        self.model_cache = model_cache #общий кэш моделей станции (InferenceModelCache); None — модель загружается сама
+        self.shadow_scorer = None #теневая оценка моделями-кандидатами, включается настройкой SHADOW_MODE
+        self.outlier_detector = None #статистика признаков текущего диска, пересоздаётся в start_disk
+        self.pipeline = None #конвейер запись -> признаки -> предсказание -> сохранение, создаётся в start_scan
+        self.blade_writer = blade_writer #общий писатель приложения; если не передан, создаётся свой на время сканирования
+        self.owns_blade_writer = blade_writer is None
+        self.microphone = microphone #источник записи (например FileMicrophone); None — MicrophoneManagerSingleton
         self.success_init_flag = True #флаг для отслеживания того что при инициализации сканирования все идет хорошо,
         #если хоть где-то при запуске что-то пошло не так, флаг переводится в False и сканирование дропается на старте
 
@@ -97,12 +160,23 @@ class Scanning(QObject):
             # Пытаемся разобрать строку как JSON
             json_data = json.loads(data)
             print(f"Получено от Arduino: {json_data}")
+            if not isinstance(json_data, dict) or "command" in json_data:
+                return #запоздавшее эхо команды (например, повторной отправки), а не статус
             # Обработка данных и обновление состояния интерфейса
             # self.update_status(json_data)
             # self.process_state()
-            self.event_queue.append(json_data)
+            #установка присылает изменения флагов (события с номером); в очередь кладётся собранный полный снимок
+            in_sync = self.rig_state.apply(json_data)
+            if "s" not in json_data:
+                self.resync_requested = False
+            elif not in_sync and not self.resync_requested:
+                self.resync_requested = True
+                self.status() #состояние могло разойтись с установкой — запрашиваем полный снимок
+            if not self.rig_state.synced:
+                return #до первого полного снимка флаги известны не все
+            self.event_queue.append(self.rig_state.snapshot())
             if not self.processing:
-                self.process_next_event()
+                self.process_events()
 
         except json.JSONDecodeError:
             print(f"Некорректные данные: {data}")
@@ -112,143 +186,199 @@ class Scanning(QObject):
         if connected:
             self.connection_established = True
         else:
-            self.stop_scan() #в случае отключения платы остановить
+            self.connection_established = False
             logger.error("Ошибка подключения к Arduino. Аварийная остановка")
+            self.interrupt_scan()
+
+    def interrupt_scan(self):
+        """
+        Связь с установкой потеряна: команду возврата базы отправить нельзя, поэтому сканирование
+        завершается на стороне приложения, а сессия помечается как прерванная — её можно продолжить
+        со следующей лопатки после переподключения (или перезапуска приложения).
+        """
+        if self.pipeline is None or self.stopped:
+            return
+        self.series.stop()
+        self.state = ScanState.FINISHED
+        self.stopped = True
+        self.event_queue.clear()
+        #уже записанные лопатки дообрабатываются и сохраняются, прогресс сессии доходит до последней из них
+        self.pipeline.wait_idle()
+        self.telemetry.save(self.disk_scan_id)
+        if not self.blade_writer.flush(settings.BLADE_FLUSH_TIMEOUT):
+            logger.warning("Не все лопатки успели записаться в БД, запись продолжится в фоне из журнала")
+        scan_session.set_status(self.disk_scan_id, "interrupted")
+        logger.warning(f"Сканирование {self.disk_scan_id} прервано на лопатке {self.num}, его можно продолжить")
+        self.finish_series()
 
     @pyqtSlot()
     def start_scan(self):
+        """
+        Запуск серии: модель, теневая оценка и конвейер готовятся один раз на всю серию,
+        затем сканируется первый диск (следующие запускает finish_scan).
+        """
         if self.connection_established:
-            session = DatabaseSession()
-            try:
-                new_disk_scan = DiskScan(
-                    name=f"{datetime.now()} New disc_scan",
-                    disk_type_id=self.disk_type_id,
-                    is_training=False
-                )
-                session.add(new_disk_scan)
-                session.commit()
-                logger.error(
-                    f"Создан DiskScan c id {new_disk_scan.id} относящийся к DiskType {new_disk_scan.disk_type_id}")
-                self.disk_scan_id = new_disk_scan.id
-
-                # Получаем blade_force из DiskType
-                disk_type = session.query(DiskType).get(self.disk_type_id)
-                if disk_type:
-                    self.blade_force = disk_type.blade_force
-                else:
-                    logger.error(f"DiskType с id {self.disk_type_id} не найден. Остановка сканирования:")
-                    self.success_init_flag = False
-            except Exception as e:
-                logger.error("Ошибка создания экземпляра сканирования или получения blade_force: %s", e, exc_info=True)
+            disk_config = self.series.next_config(self.load_disk_config)
+            if disk_config is None:
                 self.success_init_flag = False
-            finally:
-                session.close()
 
             #здесь пробуем подгрузить модель для диска если она есть:
-            self.ml_model = load_model_from_db(self.disk_type_id)
-            if self.ml_model is not None:
-                logger.info(f"для disk_type_id {self.disk_type_id} была загружена модель Keras")
-            else:
-                logger.info(f"Для disk_type_id {self.disk_type_id} нет ML модели, лопатки не будут оцениваться")
+            self.load_ml_model()
+
+            if settings.SHADOW_MODE:
+                from src.scan.shadow import ShadowScorer
+                self.shadow_scorer = ShadowScorer(self.disk_type_id, settings.SHADOW_MAX_CANDIDATES)
+                if not self.shadow_scorer.load():
+                    self.shadow_scorer = None
 
             if self.success_init_flag:
+                if self.owns_blade_writer:
+                    self.blade_writer = BladeWriter(settings.BLADE_JOURNAL_DIR, batch_size=settings.BLADE_WRITE_BATCH,
+                                                    flush_interval=settings.BLADE_FLUSH_INTERVAL)
+                    self.blade_writer.start()
+                self.pipeline = ScanPipeline([
+                    ("capture", self.capture_stage),
+                    ("features", self.features_stage),
+                    ("predict", self.predict_stage),
+                    ("persist", self.persist_stage),
+                ], maxsize=settings.PIPELINE_QUEUE_SIZE, on_done=self.on_blade_processed)
+                self.pipeline.start()
                 self.arduino_worker.data_received.connect(self.on_data_received)  # Подключаем обработчик данных
-                self.get_motors_settings_from_db()
-                self.start_base_motor()
-                self.status()
-                self.set_pressure(self.blade_force) #устанавливаем силу давления на плату
-                self.start_command() #здесь начинаем сканирование
+                resume, self.resume = self.resume, None
+                self.start_disk(disk_config, resume)
             else:
                 logger.error("Не удалось запустить сканирование, остановка процесса:")
+                self.series.close()
                 self.scanning_finished.emit()
                 return
         else:
             logger.error("Ошибка старта сканирования: устройство не подключено")
+            self.series.close()
             self.scanning_finished.emit()
             return
 
-
-    def process_next_event(self):
-        if self.stopped:
-            self.processing = False
+    def start_disk(self, disk_config, resume=None):
+        """
+        Сканирование очередного диска серии; настройки установки отправляются, только если они изменились.
+        resume — прерванное сканирование: тот же DiskScan, нумерация продолжается, установка начинает со следующей лопатки.
+        """
+        session = DatabaseSession()
+        try:
+            if resume is None:
+                new_disk_scan = DiskScan(
+                    name=f"{datetime.now()} New disc_scan",
+                    disk_type_id=self.disk_type_id,
+                    is_training=False
+                )
+                session.add(new_disk_scan)
+                session.commit()
+                logger.error(
+                    f"Создан DiskScan c id {new_disk_scan.id} относящийся к DiskType {new_disk_scan.disk_type_id}")
+                self.disk_scan_id = new_disk_scan.id
+                scan_session.create_session(self.disk_scan_id)
+            else:
+                self.disk_scan_id = resume["disk_scan_id"]
+                scan_session.set_status(self.disk_scan_id, "running")
+                logger.info(f"Продолжение сканирования {self.disk_scan_id} с лопатки {resume['last_blade_num'] + 1}")
+        except Exception as e:
+            logger.error("Ошибка создания экземпляра сканирования: %s", e, exc_info=True)
+            self.finish_series()
             return
-        if self.event_queue:
-            self.processing = True
-            json_data = self.event_queue.popleft()
-            self.update_status(json_data)
-            self.process_state()
+        finally:
+            session.close()
+
+        self.num = resume["last_blade_num"] if resume is not None else 0
+        self.stopping_flag = False
+        self.stopped = False
+        self.event_queue.clear()
+        self.state = ScanState.UNKNOWN
+        self.state_entered_at = time.monotonic()
+        self.state_action_done = False
+        self.telemetry = ScanTelemetry()
+        if settings.OUTLIER_DETECTION:
+            #лопатки прошлого диска уже обработаны (finish_scan ждёт конвейер), поэтому статистику можно заменить
+            self.outlier_detector = OnlineOutlierDetector(settings.OUTLIER_ALPHA, settings.OUTLIER_MIN_BLADES)
+        self.blade_force = disk_config["blade_force"]
+        self.push_motor_settings(disk_config)
+        #пока сканируется этот диск, конфигурация следующего читается из БД в фоне
+        self.series.start_disk(self.load_disk_config)
+
+        self.status()
+        if resume is not None and resume["base_position"] is not None:
+            self.resume_command(resume["base_position"])
         else:
-            self.processing = False
+            self.start_command() #здесь начинаем сканирование
+
+    def load_ml_model(self):
+        """
+        Загружает установленную модель типа диска (keras / scikit-learn / NumPy — по полю model_type).
+        Для keras-моделей настройка INFERENCE_BACKEND выбирает полную модель или TFLite-вариант.
+        """
+        if self.model_cache is not None:
+            self.ml_model = self.model_cache.get(self.disk_type_id, keras_backend=settings.INFERENCE_BACKEND)
+        else:
+            self.ml_model = load_inference_model(self.disk_type_id, keras_backend=settings.INFERENCE_BACKEND)
+        self.ml_predict = self.ml_model.predict if self.ml_model is not None else None
 
-    def get_motors_settings_from_db(self):
-        print("get_motors_settings_from_db")
+        if self.ml_model is not None:
+            logger.info(f"для disk_type_id {self.disk_type_id} была загружена модель ({type(self.ml_model).__name__})")
+        else:
+            logger.info(f"Для disk_type_id {self.disk_type_id} нет ML модели, лопатки не будут оцениваться")
+
+    def load_disk_config(self):
+        """
+        Читает из БД всё, что нужно для запуска диска: blade_force типа диска и настройки установки для set_config.
+        Вызывается и из потока предзагрузки серии, поэтому работает со своей сессией и ничего не отправляет.
+        None — тип диска не найден или БД недоступна.
+        """
         session = DatabaseSession()
         try:
-            config = session.query(DeviceConfig).first()
-            if config:
-                start_speed_head = config.head_motor_speed
-                accel_head = config.head_motor_accel
-                MaxSpeed_head = config.head_motor_MaxSpeed
-
-                start_speed_base = config.base_motor_speed
-                accel_base = config.base_motor_accel
-                MaxSpeed_base = config.base_motor_MaxSpeed
-
-                circle_in_steps = config.circle_in_steps
-                searching_time = config.searching_time
-                recording_time = config.recording_time
-                force_to_find = config.force_to_find
-                blade_distance = DiskType().blade_distance
-
-                try:
-                    disk_type = session.query(DiskType).get(self.disk_type_id)
-                    if disk_type:
-                        blade_distance  = disk_type.blade_distance
-                    else:
-                        logger.error(f"DiskType с id {self.disk_type_id} не найден.")
-                except Exception as e:
-                    logger.error("Ошибка получения DiskType: %s", e,
-                                 exc_info=True)
-
-                self.recording_duration = recording_time
-
-                #ниже происходит залив на плату конфигурационных данных, сделал отдельно для стабильности работы
-                command = {"command": "set_head_settings", "speed": start_speed_head, "accel": accel_head, "MaxSpeed": MaxSpeed_head}
-                self.arduino_worker.send_command(command)
-
-                command = {"command": "set_base_settings", "speed": start_speed_base, "accel": accel_base,
-                           "MaxSpeed": MaxSpeed_base}
-                time.sleep(0.1) #БЕЗ ЗАДЕРКИ ВЕСЬ ПАРСИНГ С АРДУИНО СЫПЕТСЯ (перенес в воркер, для подстраховки оставил и здесь)
-
-                self.arduino_worker.send_command(command)
-
-                command = {"command": "set_searching_time", "searching_time": searching_time}
-
-                self.arduino_worker.send_command(command)
-
-                command = {"command": "set_circle", "circle_in_steps": circle_in_steps}
-
-                self.arduino_worker.send_command(command)
-                print(circle_in_steps)
-
-                command = {"command": "set_recording_time", "recording_time": recording_time}
-
-                self.arduino_worker.send_command(command)
-
-                command = {"command": "set_force_to_find", "force_to_find": force_to_find}
-
-                self.arduino_worker.send_command(command)
-
-                command = {"command": "set_blade_width", "blade_width": blade_distance}
-
-                self.arduino_worker.send_command(command)
-
+            disk_type = session.query(DiskType).get(self.disk_type_id)
+            if disk_type is None:
+                logger.error(f"DiskType с id {self.disk_type_id} не найден. Остановка сканирования:")
+                return None
+            if self.device_config_id is not None:
+                config = session.query(DeviceConfig).get(self.device_config_id)
             else:
-               self.set_default_motor_settings()
-
+                config = session.query(DeviceConfig).first()
+            if config is None:
+                logger.warning("Нет настроек установки в БД, используются значения по умолчанию")
+
+            def value(name):
+                #без строки DeviceConfig берётся значение по умолчанию колонки (у несохранённого объекта атрибуты None)
+                if config is not None and getattr(config, name) is not None:
+                    return getattr(config, name)
+                return DeviceConfig.__table__.c[name].default.arg
+
+            #прошивка принимает целые значения, поэтому Float-колонки приводятся к int
+            device_config = {
+                "head": [int(value("head_motor_speed")), int(value("head_motor_accel")), int(value("head_motor_MaxSpeed"))],
+                "base": [int(value("base_motor_speed")), int(value("base_motor_accel")), int(value("base_motor_MaxSpeed"))],
+                "searching_time": value("searching_time"),
+                "circle_in_steps": value("circle_in_steps"),
+                "recording_time": value("recording_time"),
+                "force_to_find": value("force_to_find"),
+                "blade_width": disk_type.blade_distance,
+                "pressure": disk_type.blade_force,
+                "motor_on": True,
+            }
+            return {"blade_force": disk_type.blade_force, "recording_time": device_config["recording_time"],
+                    "config": device_config}
+        except Exception as e:
+            logger.error("Ошибка получения конфигурации диска: %s", e, exc_info=True)
+            return None
         finally:
             session.close()
 
+    def push_motor_settings(self, disk_config):
+        """
+        Все настройки установки (моторы, тайминги, ширина лопатки, давление) одним сообщением set_config.
+        ArduinoWorker помнит конфигурацию, уже применённую в текущем подключении, и повторно её не отправляет.
+        """
+        self.recording_duration = disk_config["recording_time"]
+        if not self.arduino_worker.apply_config(disk_config["config"]):
+            logger.error("Установка не подтвердила настройки set_config")
+
     def update_status(self, data):
         self.scan_in_progress = data.get("scan_in_progress", "unknown")
         self.blade_found = data.get("blade_found", "unknown")
@@ -258,6 +388,8 @@ class Scanning(QObject):
         self.making_ding = data.get("making_ding", "unknown")
         self.preparing_for_new_blade = data.get("prepearing_for_new_blade", "unknown")
         self.base_returning = data.get("base_returning", "unknown")
+        self.base_repositioning = data.get("base_repositioning", False) #старые версии скетча поля не отправляют
+        self.base_position = data.get("base_position")
         self.data_updated = True
         logger.info("Scanning process: Данные обновлены")
         #8.03.25 фикс логики возвращения базы
@@ -267,45 +399,6 @@ class Scanning(QObject):
 
 
 
-    def set_default_motor_settings(self):
-        defaults = DeviceConfig()
-        default_blade_distance = DiskType().blade_distance
-
-        self.recording_duration = defaults.recording_time
-
-        command = {"command": "set_head_settings", "speed": defaults.head_motor_speed, "accel": defaults.head_motor_accel,
-                   "MaxSpeed": defaults.head_motor_MaxSpeed}
-        self.arduino_worker.send_command(command)
-
-        command = {"command": "set_base_settings", "speed": defaults.base_motor_speed, "accel": defaults.base_motor_accel,
-                   "MaxSpeed": defaults.base_motor_MaxSpeed}
-        self.arduino_worker.send_command(command)
-        time.sleep(
-            0.1)  # БЕЗ ЗАДЕРКИ ВЕСЬ ПАРСИНГ С АРДУИНО СЫПЕТСЯ (перенес в воркер, для подстраховки оставил и здесь)
-
-        self.arduino_worker.send_command(command)
-
-        command = {"command": "set_searching_time", "searching_time": defaults.searching_time}
-
-        self.arduino_worker.send_command(command)
-
-        command = {"command": "set_circle", "circle_in_steps": defaults.circle_in_steps}
-
-        self.arduino_worker.send_command(command)
-        print(circle_in_steps)
-
-        command = {"command": "set_recording_time", "recording_time": defaults.recording_time}
-
-        self.arduino_worker.send_command(command)
-
-        command = {"command": "set_force_to_find", "force_to_find": defaults.force_to_find}
-
-        self.arduino_worker.send_command(command)
-
-        command = {"command": "set_blade_width", "blade_width": blade_distance}
-
-        self.arduino_worker.send_command(command)
-
     def start_base_motor(self):
         command = {"command": "set_motor_on", "state": True}
         self.arduino_worker.send_command(command)
@@ -319,12 +412,16 @@ class Scanning(QObject):
 
     def move_head_down(self, blade_force):
         command = {"command": "move_head_down", "pressure": blade_force}  # Например, установить порог давления
-        self.arduino_worker.send_command(command)
+        return self.arduino_worker.send_command(command)
 
     def start_command(self):
         command = {"command": "start_scan"}
         self.arduino_worker.send_command(command)
 
+    def resume_command(self, base_position):
+        command = {"command": "resume_scan", "position": base_position}
+        return self.arduino_worker.send_command(command)
+
     def return_base(self):
 
         command = {"command": "return_base"}
@@ -333,12 +430,12 @@ class Scanning(QObject):
     def ding(self):
         logger.info("Scanning: Выполняется команда ding")
         command = {"command": "ding"}
-        self.arduino_worker.send_command(command)
+        return self.arduino_worker.send_command(command)
 
     def pull(self):
         logger.info("Scanning:выполняется команда pull")
         command = {"command": "pull_blade"}
-        self.arduino_worker.send_command(command)
+        return self.arduino_worker.send_command(command)
 
     def status(self):
         logger.info("Scanning:выполняется команда status")
@@ -353,89 +450,216 @@ class Scanning(QObject):
         self.arduino_worker.send_command(command)
 
 
-    def process_state(self):
-        if self.stopped:
-            self.processing = False
-            return
+    def process_events(self):
+        """
+        Обрабатывает накопившиеся события установки в цикле (без рекурсии).
+        Все сообщения установки — полные снимки флагов, поэтому из пачки событий
+        достаточно последнего: промежуточные снимки отбрасываются.
+        """
+        self.processing = True
         try:
-            if not self.scan_in_progress and not self.base_returning:
-                if self.head_position == "up":
-                    print(f"BLADE FORCE{self.blade_force}")
-                    self.move_head_down(self.blade_force)
-                else:
-                    if not self.base_returning and self.stopping_flag == True:
-                        self.stopped = True
-                        self.event_queue.clear()
-                        self.scanning_finished.emit()
-                        return
+            while self.event_queue and not self.stopped:
+                json_data = self.event_queue.pop()
+                coalesced = len(self.event_queue)
+                self.event_queue.clear()
+                if coalesced:
+                    logger.debug(f"Пропущено {coalesced} устаревших снимков статуса")
+                try:
+                    self.update_status(json_data)
+                    self.process_state()
+                except Exception as e:
+                    logger.error("Ошибка обработки события: %s", e, exc_info=True)
+        finally:
+            self.processing = False
 
+    def classify_state(self):
+        """Состояние сканирования по последнему снимку флагов установки"""
+        if self.base_returning:
+            return ScanState.RETURNING
+        if self.base_repositioning:
+            return ScanState.REPOSITIONING
+        if not self.scan_in_progress:
+            return ScanState.HEAD_UP if self.head_position == "up" else ScanState.IDLE
+        if self.preparing_for_new_blade:
+            return ScanState.PREPARING
+        if not self.blade_found:
+            return ScanState.SEARCHING
+        if self.making_ding:
+            return ScanState.DING
+        if self.pressure_reached:
+            return ScanState.PRESSURE_REACHED
+        if self.pulling_blade:
+            return ScanState.PULLING
+        return ScanState.BLADE_FOUND
 
-            else:
-                if not self.preparing_for_new_blade:
-                    if self.blade_found:
-                        if not self.blade_created:
-                            self.blade_created = True
-                            self.num += 1
-                        if not self.pressure_reached:
-                            if not self.pulling_blade:
-                                self.pull()
-                        else:
-                            if not self.making_ding:
-                                self.ding()
-                                wav_data = MicrophoneManagerSingleton().stripped_record(self.recording_duration)
-                                if wav_data:
-                                    if self.ml_model is not None:
-                                        try:
-                                            logger.info("Запуск предсказания по лопатке")
-                                            features =extract_features(wav_data)
-                                            input_data = np.array([features], dtype=np.float32)
-                                            raw_prediction = self.ml_model.predict(input_data)[0][0]
-                                            if raw_prediction is not None:
-                                                if raw_prediction > 0.5:
-                                                    current_blade_prediction = True
-                                                else:
-                                                    current_blade_prediction = False
-                                            else:
-                                                logger.error(f"Ошибка в получении предсказания от ML, статус лопатки переходит в: Не оценено")
-                                                current_blade_prediction = None
-
-                                        except Exception as e:
-                                            logger.error(f"Ошибка в предсказании статуса лопатки: {e}")
-                                    else:
-                                        current_blade_prediction = None
-                                    new_blade = Blade(
-                                        disk_scan_id=self.disk_scan_id,
-                                        num=self.num,
-                                        scan=wav_data,
-                                        prediction=current_blade_prediction  #Нужно протестировать можно ли записывать None если поле в орм Nulable
-                                    )
-                                    with Session() as session:
-                                        session.add(new_blade)
-                                        session.commit()
-
-                                        #датакласс для ленивой подгрузки последней найдетной лопатки
-                                        self.lastFoundBlade = LastBlade(
-                                            disk_type_id= new_blade.disk_scan.disk_type_id,
-                                            disk_scan_id=new_blade.disk_scan_id,
-                                            num = new_blade.num,
-                                            prediction=new_blade.prediction
-                                        )
-
-                                    self.blade_created = False
-                                    self.blade_downloaded.emit(self.lastFoundBlade)
-
-                                else:
-                                    logger.error("!!!Ошибка записи файла в БД")
-
-
-            if self.stopped:
-                self.processing = False
+    def process_state(self):
+        """
+        Переход по таблице TRANSITIONS. Действие состояния (STATE_ACTIONS) выполняется при входе в него;
+        повторный снимок того же состояния действие не повторяет, если оно уже успешно выполнено.
+        """
+        new_state = self.classify_state()
+        self.state_changed = new_state != self.state
+        if not self.state_changed:
+            if self.state_action_done:
                 return
-            self.process_next_event()
-        except Exception as e:
-            logger.error("Ошибка обработки события: %s", e, exc_info=True)
-            # Переходим к следующему событию даже в случае ошибки
-            self.process_next_event()
+        else:
+            now = time.monotonic()
+            if new_state not in TRANSITIONS.get(self.state, ()):
+                logger.warning(f"Неожиданный переход состояния: {self.state.value} -> {new_state.value}")
+            logger.info(f"Состояние: {self.state.value} -> {new_state.value} "
+                        f"(в состоянии {self.state.value} {(now - self.state_entered_at) * 1000:.0f} мс)")
+            self.record_phase(self.state, new_state, now - self.state_entered_at)
+            self.previous_state, self.state = self.state, new_state
+            self.state_entered_at = now
+
+        action = STATE_ACTIONS.get(new_state)
+        #действие без команды установке (или None) считается выполненным; False — команда не подтверждена
+        self.state_action_done = action is None or action(self) is not False
+
+    def record_phase(self, old_state, new_state, duration):
+        """Длительность покинутого состояния записывается как фаза лопатки"""
+        phase = PHASE_BY_STATE.get(old_state)
+        if phase is None:
+            return
+        if old_state == ScanState.SEARCHING:
+            #поиск относится к следующей лопатке, и только если она найдена (а не истекло время поиска)
+            if new_state == ScanState.BLADE_FOUND:
+                self.telemetry.add(self.num + 1, phase, duration)
+            return
+        self.telemetry.add(self.num, phase, duration)
+
+    def on_blade_processed(self, job):
+        """Лопатка прошла все стадии конвейера (вызывается из потока последней стадии)"""
+        for stage, duration in job.timings.items():
+            self.telemetry.add(job.num, stage, duration)
+
+    def on_head_up(self):
+        return self.move_head_down(self.blade_force)
+
+    def on_idle(self):
+        if self.stopping_flag:
+            self.finish_scan()
+
+    def on_blade_found(self):
+        if self.state_changed:  #повтор неподтверждённой команды pull не создаёт новую лопатку
+            self.num += 1
+        return self.pull()
+
+    def on_pressure_reached(self):
+        if not self.ding():
+            return False
+        #запись, признаки, предсказание и сохранение идут в стадиях конвейера,
+        #а поток сканирования сразу возвращается к событиям установки
+        self.pipeline.submit(BladeJob(disk_scan_id=self.disk_scan_id, num=self.num, base_position=self.base_position))
+
+    def finish_scan(self):
+        """Диск отсканирован и база вернулась: итоги диска, затем следующий диск серии или завершение серии"""
+        self.state = ScanState.FINISHED
+        self.stopped = True
+        self.event_queue.clear()
+        #дожидаемся обработки уже записанных лопаток, потоки конвейера остаются для следующего диска
+        self.pipeline.wait_idle()
+        self.telemetry.save(self.disk_scan_id)
+        logger.info(f"Сканирование {self.disk_scan_id}, фазы цикла лопатки:\n{format_summary(self.telemetry.summary())}")
+        if not self.blade_writer.flush(settings.BLADE_FLUSH_TIMEOUT):
+            logger.warning("Не все лопатки успели записаться в БД, запись продолжится в фоне из журнала")
+        scan_session.set_status(self.disk_scan_id, "finished")
+
+        result = self.series.finish_disk(self.disk_scan_id, self.num)
+        logger.info(f"Серийное сканирование: {format_disk(result)}")
+        self.disk_finished.emit(result)
+
+        if self.series.has_next():
+            disk_config = self.series.next_config(self.load_disk_config)
+            if disk_config is not None:
+                self.start_disk(disk_config)
+                return
+            logger.error("Не удалось получить конфигурацию следующего диска, серия остановлена")
+        self.finish_series()
+
+    def finish_series(self):
+        self.state = ScanState.FINISHED
+        self.stopped = True
+        self.pipeline.drain()
+        if self.owns_blade_writer:
+            self.blade_writer.close(settings.BLADE_FLUSH_TIMEOUT)
+        if self.shadow_scorer is not None:
+            self.shadow_scorer.close()
+        self.series.close()
+        logger.info(f"Серийное сканирование завершено, {format_series(self.series.summary())}")
+        self.scanning_finished.emit()
+
+    def capture_stage(self, job):
+        """Стадия конвейера: запись звука лопатки после ding"""
+        delay = time.perf_counter() - job.submitted_at
+        job.timings["capture_wait"] = delay
+        if delay > 0.1:
+            #запись должна начаться сразу после ding, иначе звук лопатки будет потерян
+            logger.warning(f"Лопатка {job.num}: запись начата с задержкой {delay * 1000:.0f} мс, конвейер перегружен")
+        microphone = self.microphone if self.microphone is not None else MicrophoneManagerSingleton()
+        job.wav_data = microphone.stripped_record(self.recording_duration)
+        if not job.wav_data:
+            logger.error(f"!!!Ошибка записи звука лопатки {job.num}")
+            return None
+        return job
+
+    def features_stage(self, job):
+        """
+        Стадия конвейера: признаки считаются один раз и используются текущей моделью, теневыми кандидатами
+        и поиском выбросов внутри диска
+        """
+        if self.ml_model is not None or self.shadow_scorer is not None or self.outlier_detector is not None:
+            try:
+                job.features = extract_features(job.wav_data)
+            except Exception as e:
+                logger.error(f"Ошибка извлечения признаков лопатки: {e}")
+        return job
+
+    def predict_stage(self, job):
+        """Стадия конвейера: оценка лопатки текущей моделью (и теневыми кандидатами), сравнение с остальными лопатками диска"""
+        if self.ml_model is not None and job.features is not None:
+            try:
+                logger.info("Запуск предсказания по лопатке")
+                inference_start = time.perf_counter()
+                raw_prediction = self.ml_predict(job.features)
+                logger.info(f"Лопатка {job.num}: инференс занял "
+                            f"{(time.perf_counter() - inference_start) * 1000:.2f} мс")
+                if raw_prediction is not None:
+                    job.score = raw_prediction
+                    job.prediction = raw_prediction > 0.5
+                else:
+                    logger.error(f"Ошибка в получении предсказания от ML, статус лопатки переходит в: Не оценено")
+            except Exception as e:
+                logger.error(f"Ошибка в предсказании статуса лопатки: {e}")
+        if self.shadow_scorer is not None and job.features is not None:
+            self.shadow_scorer.submit(job.disk_scan_id, job.num, job.features)
+        if self.outlier_detector is not None and job.features is not None:
+            #стадии — по одному потоку, лопатки идут по порядку: статистика диска не требует блокировки
+            job.outlier, job.outlier_score = self.outlier_detector.add(job.features)
+            if job.outlier:
+                logger.warning(f"Лопатка {job.num} выбивается из остальных лопаток диска "
+                               f"(D² = {job.outlier_score:.1f})")
+        return job
+
+    def persist_stage(self, job):
+        """
+        Стадия конвейера: лопатка пишется в журнал BladeWriter (в БД — пачками в фоне), интерфейс уведомляется сразу
+        """
+        #прогресс сессии сканирования BladeWriter обновляет в той же транзакции, что и пачку лопаток
+        self.blade_writer.append(job.disk_scan_id, job.num, job.wav_data, job.prediction, job.base_position)
+
+        #датакласс для ленивой подгрузки последней найдетной лопатки (без запроса к БД: тип диска известен)
+        self.lastFoundBlade = LastBlade(
+            disk_type_id=self.disk_type_id,
+            disk_scan_id=job.disk_scan_id,
+            num=job.num,
+            prediction=job.prediction,
+            outlier=job.outlier,
+            outlier_score=job.outlier_score
+        )
+
+        self.blade_downloaded.emit(self.lastFoundBlade)
+        return job
 
     def start_recording(self):
         # Инициализируем запись аудио
@@ -485,12 +709,30 @@ class Scanning(QObject):
 
     @pyqtSlot()
     def stop_scan(self):
+        self.series.stop() #текущий диск завершается возвратом базы, следующие диски серии не запускаются
         self.return_base()
         # self.stopped = True #перенес остановку для того чтобы она корректно отрабатывала в логике
         # self.event_queue.clear()
-        #сигнал о завершении сканирования подается в process_state после того как база подаст сигнал о том что она вернулась
+        #сигнал о завершении сканирования подается в finish_scan после того как база подаст сигнал о том что она вернулась
         # self.scanning_finished.emit()
 
 
-
-
+# фаза цикла лопатки, которой соответствует время, проведённое в состоянии (для телеметрии)
+PHASE_BY_STATE = {
+    ScanState.SEARCHING: "search",
+    ScanState.BLADE_FOUND: "pull",
+    ScanState.PULLING: "pull",
+    ScanState.PRESSURE_REACHED: "ding_command",
+    ScanState.DING: "ding",
+    ScanState.PREPARING: "next_blade",
+}
+
+
+# действия при входе в состояние; метод возвращает False, если команда не подтверждена установкой,
+# тогда действие повторяется при следующем снимке того же состояния
+STATE_ACTIONS = {
+    ScanState.HEAD_UP: Scanning.on_head_up,
+    ScanState.IDLE: Scanning.on_idle,
+    ScanState.BLADE_FOUND: Scanning.on_blade_found,
+    ScanState.PRESSURE_REACHED: Scanning.on_pressure_reached,
+}
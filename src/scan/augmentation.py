@@ -0,0 +1,107 @@
+import logging
+
+import keras
+import numpy as np
+
+from src.scan.features import decode_wav, extract_features_from_array
+
+logger = logging.getLogger(__name__)
+
+# диапазоны случайных искажений сигнала
+MAX_SHIFT_S = 0.05  # сдвиг по времени, с (освободившийся участок заполняется тишиной)
+GAIN_DB = (-6.0, 6.0)  # усиление/ослабление
+SNR_DB = (20.0, 40.0)  # отношение сигнал/шум добавляемого белого шума
+RESAMPLE_FACTOR = (0.98, 1.02)  # растяжение/сжатие сигнала (сдвигает спектр на ±2 %)
+
+
+def augment_signal(audio: np.ndarray, sr: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Возвращает искажённую копию сигнала: сдвиг по времени, изменение громкости,
+    белый шум с заданным SNR и небольшой ресемплинг. Исходный массив не изменяется.
+    """
+    # ресемплинг линейной интерполяцией: при неизменной sr частоты умножаются на factor
+    factor = rng.uniform(*RESAMPLE_FACTOR)
+    length = max(int(len(audio) / factor), 1)
+    augmented = np.interp(np.arange(length) * factor, np.arange(len(audio)), audio).astype(np.float32)
+
+    shift = int(rng.uniform(-MAX_SHIFT_S, MAX_SHIFT_S) * sr)
+    if shift > 0:
+        augmented = np.concatenate([np.zeros(shift, dtype=np.float32), augmented[:-shift]])
+    elif shift < 0:
+        augmented = np.concatenate([augmented[-shift:], np.zeros(-shift, dtype=np.float32)])
+
+    augmented *= np.float32(10 ** (rng.uniform(*GAIN_DB) / 20))
+
+    signal_power = float(np.mean(augmented ** 2))
+    if signal_power > 0:
+        noise_power = signal_power / 10 ** (rng.uniform(*SNR_DB) / 10)
+        augmented += rng.normal(0.0, np.sqrt(noise_power), size=len(augmented)).astype(np.float32)
+    return augmented
+
+
+class AugmentedBladeDataset(keras.utils.PyDataset):
+    """
+    Источник данных для model.fit: батчи признаков аугментированных сигналов, генерируемые на лету.
+    В памяти хранятся только исходные WAV-байты; искажённые сигналы живут лишь внутри __getitem__.
+    Батчи готовятся в workers потоках keras с ограниченной очередью предвыборки max_queue_size,
+    поэтому обучение не ждёт извлечения признаков и память не растёт.
+    За эпоху каждая лопатка встречается augment_factor раз (с разными искажениями); при balance=True
+    лопатки редкого класса повторяются чаще, чтобы классы в эпохе были представлены поровну.
+    """
+
+    def __init__(self, signals, labels, batch_size=8, augment_factor=4, balance=True, seed=None,
+                 workers=4, max_queue_size=10):
+        super().__init__(workers=workers, use_multiprocessing=False, max_queue_size=max_queue_size)
+        self.signals = signals
+        self.labels = np.asarray(labels, dtype=np.float32)
+        self.batch_size = batch_size
+        self.augment_factor = augment_factor
+        self.balance = balance
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.epoch = 0
+        self.order = self._epoch_order()
+
+    def _epoch_order(self):
+        rng = np.random.default_rng((self.seed, self.epoch))
+        indices = np.arange(len(self.labels))
+        if self.balance:
+            classes = [indices[self.labels == label] for label in np.unique(self.labels)]
+            largest = max(len(members) for members in classes)
+            indices = np.concatenate([rng.choice(members, size=largest, replace=len(members) < largest)
+                                      if len(members) < largest else members for members in classes])
+        order = np.tile(indices, self.augment_factor)
+        rng.shuffle(order)
+        return order
+
+    def __len__(self):
+        return int(np.ceil(len(self.order) / self.batch_size))
+
+    def __getitem__(self, idx):
+        # генератор зависит только от (seed, эпоха, батч): результат не зависит от порядка работы потоков
+        rng = np.random.default_rng((self.seed, self.epoch, idx))
+        batch = self.order[idx * self.batch_size:(idx + 1) * self.batch_size]
+        X = []
+        for index in batch:
+            audio, sr = decode_wav(self.signals[index])
+            X.append(extract_features_from_array(augment_signal(audio, sr, rng), sr))
+        return np.asarray(X, dtype=np.float32), self.labels[batch]
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self.order = self._epoch_order()
+
+
+def split_validation(labels, validation_split, seed=None):
+    """
+    Стратифицированное разбиение индексов на обучающие и валидационные (валидация без аугментации).
+    Возвращает (train_idx, val_idx).
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.asarray(labels)
+    train_idx, val_idx = [], []
+    for label in np.unique(labels):
+        members = rng.permutation(np.flatnonzero(labels == label))
+        n_val = int(round(len(members) * validation_split))
+        val_idx.append(members[:n_val])
+        train_idx.append(members[n_val:])
+    return np.sort(np.concatenate(train_idx)), np.sort(np.concatenate(val_idx))
@@ -0,0 +1,351 @@
+import datetime
+import glob
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import uuid
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.db import Session
+from src.models import Blade
+from src.scan import scan_session
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<II")  # длина JSON-заголовка записи и длина WAV-данных
+_JOURNAL_SUFFIX = ".journal"
+_OWNER_SUFFIX = ".owner"  # файл-блокировка каталога журналов процесса, заблокирован, пока процесс жив
+_DIR_LOCK = ".lock"  # блокировка общего каталога на время захвата каталогов процессов
+
+
+def _encode_record(record: dict) -> bytes:
+    header = json.dumps({key: value for key, value in record.items() if key != "scan"}).encode("utf-8")
+    return _HEADER.pack(len(header), len(record["scan"])) + header + record["scan"]
+
+
+def _fsync_dir(path: str):
+    """Сбрасывает на диск запись каталога (новый файл иначе может пропасть при сбое питания). Только POSIX."""
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _lock_file(f, blocking: bool = False) -> bool:
+    """Исключительная блокировка открытого файла; False — файл заблокирован другим процессом (только blocking=False)"""
+    try:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except OSError:
+        if blocking:
+            raise
+        return False
+    return True
+
+
+def _unlock_file(f):
+    """Снимает блокировку и закрывает файл"""
+    try:
+        if os.name == "nt":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    finally:
+        f.close()
+
+
+def read_journal(path: str) -> list[dict]:
+    """
+    Читает записи файла журнала. Недописанная последняя запись (сбой во время записи) отбрасывается.
+    """
+    records = []
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        header_len, scan_len = _HEADER.unpack_from(data, offset)
+        end = offset + _HEADER.size + header_len + scan_len
+        if end > len(data):
+            logger.warning(f"Журнал {path}: недописанная запись в конце файла отброшена")
+            break
+        record = json.loads(data[offset + _HEADER.size:offset + _HEADER.size + header_len])
+        record["scan"] = data[offset + _HEADER.size + header_len:end]
+        records.append(record)
+        offset = end
+    return records
+
+
+def insert_blades(records: list[dict]):
+    """
+    Пакетная вставка лопаток одним INSERT; уже записанные (по uid) пропускаются,
+    поэтому повторная отправка записей журнала безопасна.
+    В той же транзакции обновляется прогресс сессий сканирования (последняя лопатка каждого диска в пачке).
+    """
+    rows = [{
+        "uid": record["uid"],
+        "disk_scan_id": record["disk_scan_id"],
+        "num": record["num"],
+        "scan": record["scan"],
+        "prediction": record["prediction"],
+        "base_position": record.get("base_position"),  # в журналах старых версий поля нет
+        "created_at": datetime.datetime.fromisoformat(record["created_at"]),
+    } for record in records]
+    last_blades = {}
+    for record in records:
+        last = last_blades.get(record["disk_scan_id"])
+        if last is None or record["num"] > last["num"]:
+            last_blades[record["disk_scan_id"]] = record
+    with Session() as session:
+        session.execute(pg_insert(Blade.__table__).values(rows).on_conflict_do_nothing(index_elements=["uid"]))
+        for record in last_blades.values():
+            session.execute(scan_session.progress_update(record["disk_scan_id"], record["num"],
+                                                         record.get("base_position")))
+        session.commit()
+
+
+class BladeWriter:
+    """
+    Отложенная запись лопаток в БД (write-behind).
+    append() синхронно дописывает лопатку (WAV и предсказание) в локальный журнал и делает fsync записи
+    (а для нового журнала — и каталога): когда append() вернул управление, лопатка переживёт сбой приложения
+    или питания. Фоновый поток отправляет лопатки в Postgres пачками до batch_size одним INSERT.
+    Журнал удаляется, когда все его записи сохранены в БД. Если БД недоступна, записи остаются
+    в журнале и отправляются повторно, а после перезапуска приложения — из replay_pending() в фоновом потоке.
+    Один экземпляр может обслуживать несколько сканирований (общий писатель приложения).
+
+    Каталог журналов общий для процессов (приложение и консольное сканирование), поэтому каждый писатель
+    ведёт журналы в своём подкаталоге <pid>_<время> и держит заблокированным файл <подкаталог>.owner.
+    replay_pending() восстанавливает только подкаталоги, чей владелец завершился (блокировка свободна).
+    """
+
+    def __init__(self, journal_dir: str, batch_size: int = 16, flush_interval: float = 1.0,
+                 retry_interval: float = 5.0):
+        self.journal_dir = journal_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        os.makedirs(journal_dir, exist_ok=True)
+
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.all_flushed = threading.Condition(self.lock)
+        self.owner_dir = None  # подкаталог журналов этого процесса
+        self.owner_lock = None  # открытый и заблокированный файл владельца подкаталога
+        self.journal = None
+        self.journal_path = None
+        self.unflushed = 0  # записи текущего журнала, ещё не сохранённые в БД
+        self.flushed_total = 0
+        self.stopping = False
+        self.replayed = False  # журналы прошлых запусков уже в БД (flush() ждёт и их)
+        self.thread = threading.Thread(target=self._run, name="blade-writer", daemon=True)
+
+    def start(self):
+        with self.lock:
+            self._claim_owner_dir()
+        self.thread.start()
+
+    def _open_dir_lock(self):
+        """Блокирует общий каталог журналов (захват и освобождение подкаталогов процессов)"""
+        dir_lock = open(os.path.join(self.journal_dir, _DIR_LOCK), "ab")
+        try:
+            _lock_file(dir_lock, blocking=True)
+        except OSError:
+            dir_lock.close()
+            raise
+        return dir_lock
+
+    def _claim_owner_dir(self):
+        """Создаёт подкаталог журналов этого процесса; файл владельца блокируется до создания подкаталога"""
+        if self.owner_dir is not None:
+            return
+        name = f"{os.getpid()}_{time.time_ns()}"
+        owner_dir = os.path.join(self.journal_dir, name)
+        dir_lock = self._open_dir_lock()
+        try:
+            owner_lock = open(owner_dir + _OWNER_SUFFIX, "ab")
+            _lock_file(owner_lock, blocking=True)
+            os.makedirs(owner_dir)
+            _fsync_dir(self.journal_dir)
+        finally:
+            _unlock_file(dir_lock)
+        self.owner_dir, self.owner_lock = owner_dir, owner_lock
+
+    def _release_owner_dir(self, owner_dir: str, owner_lock):
+        """Удаляет подкаталог без журналов и его файл владельца; с журналами — только снимает блокировку"""
+        dir_lock = self._open_dir_lock()
+        try:
+            try:
+                os.rmdir(owner_dir)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                #в подкаталоге остались журналы: их восстановит следующий запуск
+                _unlock_file(owner_lock)
+                return
+            _unlock_file(owner_lock)
+            try:
+                os.remove(owner_dir + _OWNER_SUFFIX)
+            except FileNotFoundError:
+                pass
+        finally:
+            _unlock_file(dir_lock)
+
+    def _claim_orphans(self) -> list[tuple]:
+        """Захватывает подкаталоги завершившихся процессов: (подкаталог, заблокированный файл владельца)"""
+        claimed = []
+        dir_lock = self._open_dir_lock()
+        try:
+            for path in sorted(glob.glob(os.path.join(self.journal_dir, f"*{_OWNER_SUFFIX}"))):
+                owner_dir = path[:-len(_OWNER_SUFFIX)]
+                if owner_dir == self.owner_dir:
+                    continue
+                owner_lock = open(path, "ab")
+                if _lock_file(owner_lock):
+                    claimed.append((owner_dir, owner_lock))
+                else:
+                    owner_lock.close()  # владелец жив
+        finally:
+            _unlock_file(dir_lock)
+        return claimed
+
+    def _replay_journal(self, path: str) -> bool:
+        try:
+            records = read_journal(path)
+            for start in range(0, len(records), self.batch_size):
+                insert_blades(records[start:start + self.batch_size])
+            os.remove(path)
+            logger.info(f"Журнал {path}: восстановлено {len(records)} лопаток")
+            return True
+        except Exception as e:
+            logger.error(f"Не удалось восстановить лопатки из журнала {path}: {e}", exc_info=True)
+            return False
+
+    def replay_pending(self) -> bool:
+        """
+        Отправляет в БД записи журналов, оставшиеся после аварийного завершения, и удаляет эти журналы.
+        Журналы работающих процессов не трогаются. Журналы прежних версий (в самом каталоге) восстанавливаются всегда.
+        False — часть журналов не восстановлена (они остаются на месте, фоновый поток повторит попытку).
+        """
+        ok = True
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, f"*{_JOURNAL_SUFFIX}"))):
+            ok = self._replay_journal(path) and ok
+        for owner_dir, owner_lock in self._claim_orphans():
+            for path in sorted(glob.glob(os.path.join(owner_dir, f"*{_JOURNAL_SUFFIX}"))):
+                ok = self._replay_journal(path) and ok
+            self._release_owner_dir(owner_dir, owner_lock)
+        if ok:
+            with self.lock:
+                self.replayed = True
+                self.all_flushed.notify_all()
+        return ok
+
+    def append(self, disk_scan_id: int, num: int, wav_data: bytes, prediction, base_position: int = None) -> str:
+        """Сохраняет лопатку в журнал и ставит её в очередь на запись в БД; возвращает uid лопатки"""
+        record = {
+            "uid": str(uuid.uuid4()),
+            "disk_scan_id": disk_scan_id,
+            "num": num,
+            "prediction": prediction,
+            "base_position": base_position,
+            "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            "scan": wav_data,
+        }
+        with self.lock:
+            if self.journal is None:
+                self._claim_owner_dir()
+                self.journal_path = os.path.join(self.owner_dir, f"{time.time_ns()}{_JOURNAL_SUFFIX}")
+                self.journal = open(self.journal_path, "ab")
+                _fsync_dir(self.owner_dir)
+            self.journal.write(_encode_record(record))
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.unflushed += 1
+        self.queue.put(record)
+        return record["uid"]
+
+    def _run(self):
+        #журналы прошлых запусков восстанавливаются здесь, а не в start(): медленная или недоступная БД
+        #не задерживает запуск приложения, а неудавшееся восстановление повторяется раз в retry_interval
+        replay_at = time.monotonic()
+        batch = []
+        while True:
+            if replay_at is not None and time.monotonic() >= replay_at:
+                replay_at = None if self.replay_pending() else time.monotonic() + self.retry_interval
+            timeout = self.flush_interval if batch else None
+            if replay_at is not None:
+                until_replay = max(0.0, replay_at - time.monotonic())
+                timeout = until_replay if timeout is None else min(timeout, until_replay)
+            try:
+                record = self.queue.get(timeout=timeout)
+                if record is not None:
+                    batch.append(record)
+                if len(batch) < self.batch_size and record is not None:
+                    continue
+            except queue.Empty:
+                pass
+            while batch and not self._flush(batch):
+                if self.stopping:
+                    logger.warning(f"{len(batch)} лопаток не сохранены в БД и остаются в журнале {self.journal_path}")
+                    return
+                time.sleep(self.retry_interval)
+            batch = []
+            if self.stopping and self.queue.empty():
+                return
+
+    def _flush(self, batch) -> bool:
+        try:
+            insert_blades(batch)
+        except Exception as e:
+            logger.error(f"Ошибка пакетной записи {len(batch)} лопаток в БД: {e}")
+            return False
+        with self.lock:
+            self.unflushed -= len(batch)
+            self.flushed_total += len(batch)
+            if self.unflushed == 0 and self.journal is not None:
+                #все записи журнала уже в БД — журнал больше не нужен, следующая лопатка начнёт новый
+                self.journal.close()
+                os.remove(self.journal_path)
+                self.journal = None
+                self.journal_path = None
+            self.all_flushed.notify_all()
+        logger.debug(f"В БД записано {len(batch)} лопаток")
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Ждёт сохранения в БД всех переданных лопаток и журналов прошлых запусков (по ним сверяется продолжение
+        прерванного сканирования); False — не успели за timeout (записи остаются в журнале)
+        """
+        self.queue.put(None)  # не ждать накопления полной пачки
+        with self.lock:
+            return self.all_flushed.wait_for(lambda: self.unflushed == 0 and self.replayed, timeout)
+
+    def close(self, timeout: float = None):
+        self.stopping = True
+        self.queue.put(None)
+        self.thread.join(timeout)
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            if self.owner_dir is not None:
+                owner_dir, owner_lock = self.owner_dir, self.owner_lock
+                self.owner_dir = self.owner_lock = None
+                self._release_owner_dir(owner_dir, owner_lock)
@@ -0,0 +1,112 @@
+import io
+
+import numpy as np
+import scipy.signal as sg
+import soundfile as sf
+
+# модуль намеренно не зависит от keras/tensorflow: он используется и при обучении,
+# и в облегчённом рантайме сканирования (TFLite)
+
+# версия алгоритма извлечения признаков (extract_features); сохраняется вместе с моделью,
+# при изменении признаков версию нужно поднять, чтобы не путать несовместимые модели
+FEATURE_VERSION = "spectrum-argmax-v1"
+
+
+def decode_wav(wav_data: bytes) -> tuple[np.ndarray, int]:
+    """
+    Декодирует байты WAV-файла в float32-сигнал; у стерео берётся левый канал.
+    Возвращает (audio, sample_rate).
+    """
+    audio, sr = sf.read(io.BytesIO(wav_data), dtype='float32')
+    if audio.ndim > 1:
+        audio = audio[:, 0]
+    return audio, sr
+
+
+def extract_features(wav_data: bytes, nfft: int = 4096) -> list[float]:
+    """
+    Извлекает пять значений из суммарного спектра.
+    wav_data — байты WAV-файла (моно или стерео).
+    nfft — размер окна (NFFT) для sg.spectrogram.
+
+    Возвращает список из пяти float-чисел.
+    """
+    # 1. Считываем WAV-байты как float32
+    audio, sr = decode_wav(wav_data)
+    return extract_features_from_array(audio, sr, nfft=nfft)
+
+
+def extract_features_from_array(audio: np.ndarray, sr: int, nfft: int = 4096) -> list[float]:
+    """
+    То же, что extract_features, но для уже декодированного моно-сигнала
+    (используется аугментацией, чтобы не кодировать сигнал обратно в WAV).
+    """
+    # 2. Считаем спектр
+    frequencies, times, spectrogram = sg.spectrogram(audio, sr, nfft=nfft)
+
+    # 3. Превращаем спектр в "одномерный" путём суммирования по временной оси
+    spectrogram_1d = np.sum(spectrogram, axis=1)  # shape: (num_freq_bins,)
+
+    # 4. Подфункция для безопасного поиска argmax в заданном диапазоне
+    def safe_argmax_in_range(arr: np.ndarray, start: int, end: int) -> float:
+        """
+        Возвращает argmax на подмассиве arr[start:end] как float,
+        если этот подмассив не пустой; иначе 0.0
+        """
+        if start >= len(arr):  # выходим за границы
+            return 0.0
+        subarr = arr[start:end]
+        if subarr.size == 0:
+            return 0.0
+        local_idx = np.argmax(subarr)
+        return float(local_idx)
+
+    # 5. Извлекаем пять значений
+    #    (по сути индексы локального argmax в заданных диапазонах)
+    value1 = safe_argmax_in_range(spectrogram_1d, 0, 200)
+    value2 = safe_argmax_in_range(spectrogram_1d, 300, 500)
+    value3 = safe_argmax_in_range(spectrogram_1d, 600, 1000)
+    value4 = safe_argmax_in_range(spectrogram_1d, 1100, 1500)
+    value5 = safe_argmax_in_range(spectrogram_1d, 1600, 2000)
+
+    return [value1, value2, value3, value4, value5]
+
+
+class FeatureMatrixBuilder:
+    """
+    Инкрементально собирает матрицу признаков X и вектор меток y.
+    Память выделяется блоками с удвоением ёмкости, поэтому добавление одной строки
+    стоит O(1) амортизированно и не требует хранить промежуточные python-списки.
+    """
+
+    def __init__(self, initial_capacity: int = 256):
+        self._X = None
+        self._y = np.empty(initial_capacity, dtype=np.float32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, features, label):
+        features = np.asarray(features, dtype=np.float32)
+        if self._X is None:
+            self._X = np.empty((len(self._y), features.shape[0]), dtype=np.float32)
+        if self._size == len(self._y):
+            self._grow()
+        self._X[self._size] = features
+        self._y[self._size] = label
+        self._size += 1
+
+    def _grow(self):
+        capacity = len(self._y) * 2
+        X = np.empty((capacity, self._X.shape[1]), dtype=np.float32)
+        X[:self._size] = self._X[:self._size]
+        y = np.empty(capacity, dtype=np.float32)
+        y[:self._size] = self._y[:self._size]
+        self._X, self._y = X, y
+
+    def build(self):
+        """Возвращает (X, y) без лишней ёмкости"""
+        if self._X is None:
+            return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.float32)
+        return self._X[:self._size].copy(), self._y[:self._size].copy()
@@ -0,0 +1,179 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+
+logger = logging.getLogger(__name__)
+
+# пространство поиска по умолчанию; hidden_layers — пары (units, activation), как в build_model
+DEFAULT_SEARCH_SPACE = {
+    "hidden_layers": [
+        [[16, "relu"], [32, "tanh"]],
+        [[32, "relu"], [32, "relu"]],
+        [[64, "relu"], [32, "relu"], [16, "relu"]],
+        [[8, "relu"]],
+    ],
+    "optimizer": ["sgd", "adam"],
+    "learning_rate": [0.001, 0.01],
+    "epochs": [15, 40],
+    "batch_size": [8, 16],
+}
+
+# параметры, которые передаются в build_model (остальные — в model.fit)
+BUILD_PARAMS = ("hidden_layers", "optimizer", "learning_rate", "momentum")
+
+# состояние процесса-воркера: общая матрица признаков и разбиение на фолды
+_worker_state = {}
+
+
+def sample_trials(space=None, n_trials=None, seed=None):
+    """
+    Формирует список наборов гиперпараметров: полная сетка,
+    либо случайная выборка из неё размером n_trials.
+    """
+    space = space or DEFAULT_SEARCH_SPACE
+    keys = list(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+    if n_trials is not None and n_trials < len(grid):
+        grid = random.Random(seed).sample(grid, n_trials)
+    return grid
+
+
+def make_folds(y, k_folds, seed=None):
+    """
+    Стратифицированное разбиение на k фолдов. Количество фолдов уменьшается,
+    если в одном из классов меньше примеров, чем k.
+    """
+    class_counts = np.bincount(y.astype(int))
+    k = min(k_folds, int(class_counts[class_counts > 0].min()))
+    if k < 2 or np.count_nonzero(class_counts) < 2:
+        raise ValueError("Для кросс-валидации нужно минимум по 2 примера каждого класса")
+    if k < k_folds:
+        logger.warning(f"Количество фолдов уменьшено до {k}: мало примеров одного из классов")
+    splitter = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+    return [(train_idx, val_idx) for train_idx, val_idx in splitter.split(np.zeros(len(y)), y)]
+
+
+def _init_worker(x_name, x_shape, y_name, y_shape, folds, stop_event):
+    """
+    Инициализация процесса пула: подключение к общей памяти с матрицей признаков
+    (данные не копируются в каждую задачу) и ограничение потоков TF, чтобы процессы не конкурировали.
+    stop_event — событие отмены поиска, проверяется идущим испытанием после каждой эпохи и между фолдами.
+    """
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    x_shm = shared_memory.SharedMemory(name=x_name)
+    y_shm = shared_memory.SharedMemory(name=y_name)
+    _worker_state["shm"] = (x_shm, y_shm)
+    _worker_state["X"] = np.ndarray(x_shape, dtype=np.float32, buffer=x_shm.buf)
+    _worker_state["y"] = np.ndarray(y_shape, dtype=np.float32, buffer=y_shm.buf)
+    _worker_state["folds"] = folds
+    _worker_state["stop"] = stop_event
+
+
+def _run_trial(trial_id, params):
+    """Обучает и оценивает модель с параметрами params на каждом фолде; None — поиск отменён"""
+    import keras
+    from src.scan.ml_predict import build_model
+
+    X, y, folds, stop_event = _worker_state["X"], _worker_state["y"], _worker_state["folds"], _worker_state["stop"]
+    build_kwargs = {key: value for key, value in params.items() if key in BUILD_PARAMS}
+    val_accuracy, val_loss = [], []
+    for train_idx, val_idx in folds:
+        if stop_event.is_set():
+            return None
+        model = build_model(input_dim=X.shape[1], normalization_data=X[train_idx], **build_kwargs)
+        stop_callback = keras.callbacks.LambdaCallback(
+            on_epoch_end=lambda epoch, logs: setattr(model, "stop_training", stop_event.is_set()))
+        model.fit(X[train_idx], y[train_idx], epochs=params.get("epochs", 15),
+                  batch_size=params.get("batch_size", 8), verbose=0, callbacks=[stop_callback])
+        if stop_event.is_set():
+            return None
+        loss, accuracy = model.evaluate(X[val_idx], y[val_idx], verbose=0)
+        val_loss.append(float(loss))
+        val_accuracy.append(float(accuracy))
+    return {
+        "trial": trial_id,
+        "params": params,
+        "val_accuracy_mean": float(np.mean(val_accuracy)),
+        "val_accuracy_std": float(np.std(val_accuracy)),
+        "val_loss_mean": float(np.mean(val_loss)),
+        "val_loss_std": float(np.std(val_loss)),
+        "folds": len(folds),
+    }
+
+
+def run_search(X, y, trials, k_folds=5, max_workers=None, seed=None, progress_callback=None, should_stop=None):
+    """
+    Параллельный подбор гиперпараметров с k-fold кросс-валидацией.
+    Матрица признаков размещается в общей памяти один раз и используется всеми процессами пула.
+
+    :param trials: список наборов параметров (см. sample_trials)
+    :param progress_callback: функция (done, total, result), вызывается после каждого испытания
+    :param should_stop: функция без аргументов, опрашивается каждые полсекунды; если вернёт True, оставшиеся
+        испытания отменяются, а идущие останавливаются после текущей эпохи — run_search их не ждёт
+    :return: таблица лидеров — список результатов, отсортированный по val_accuracy_mean (убыв.)
+             и val_loss_mean (возр.)
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.ascontiguousarray(y, dtype=np.float32)
+    folds = make_folds(y, k_folds, seed)
+
+    x_shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+    y_shm = shared_memory.SharedMemory(create=True, size=max(y.nbytes, 1))
+    leaderboard = []
+    try:
+        np.ndarray(X.shape, dtype=np.float32, buffer=x_shm.buf)[:] = X
+        np.ndarray(y.shape, dtype=np.float32, buffer=y_shm.buf)[:] = y
+
+        # spawn: tensorflow не переносит fork из многопоточного процесса
+        context = multiprocessing.get_context("spawn")
+        stop_event = context.Event()
+        executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), mp_context=context,
+                                       initializer=_init_worker,
+                                       initargs=(x_shm.name, X.shape, y_shm.name, y.shape, folds, stop_event))
+        completed = False
+        try:
+            pending = {executor.submit(_run_trial, trial_id, params) for trial_id, params in enumerate(trials)}
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Ошибка испытания гиперпараметров: {e}", exc_info=True)
+                        continue
+                    if result is None:
+                        continue
+                    leaderboard.append(result)
+                    logger.info(f"Испытание {result['trial']}: accuracy {result['val_accuracy_mean']:.3f} "
+                                f"± {result['val_accuracy_std']:.3f}, параметры {result['params']}")
+                    if progress_callback is not None:
+                        progress_callback(len(leaderboard), len(trials), result)
+                if should_stop is not None and should_stop():
+                    logger.info("Подбор гиперпараметров прерван")
+                    break
+            else:
+                completed = True
+        finally:
+            if not completed:
+                #отмена (или ошибка): идущие испытания останавливаются по событию, их результат не ждём
+                stop_event.set()
+            executor.shutdown(wait=completed, cancel_futures=True)
+    finally:
+        x_shm.close()
+        x_shm.unlink()
+        y_shm.close()
+        y_shm.unlink()
+
+    leaderboard.sort(key=lambda result: (-result["val_accuracy_mean"], result["val_loss_mean"]))
+    return leaderboard
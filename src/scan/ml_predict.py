@@ -1,27 +1,36 @@
 import io
+import json
 import logging
 import math
 
 import keras
-import soundfile as sf
-import scipy.signal as sg
 import base64
 import numpy as np
 import tempfile
+import time
 
-from keras.api.optimizers import SGD
+import tensorflow as tf
+from keras.api.optimizers import SGD, Adam, RMSprop
 from keras.src.metrics.accuracy_metrics import accuracy
 
+from sqlalchemy import func
+
+from src.config import settings
 from src.db import Session
 from src.models import DiskTypeModel, DiskType, DiskScan, Blade
+from src.scan.features import extract_features, FEATURE_VERSION, FeatureMatrixBuilder
+from src.scan.model_backends import MODEL_TYPE_KERAS, serialize_artifact, deserialize_artifact, artifact_input_dim
 
 logger = logging.getLogger(__name__)
 
+# момент, с которого лопатка считается размеченной: ручная разметка или запись (предсказание модели)
+LABEL_TIME = func.coalesce(Blade.labeled_at, Blade.created_at)
 
 def load_model_from_db(disk_type_id):
     """
-    Извлекает последнюю сохранённую модель для заданного типа диска из таблицы DiskTypeModel
-    и возвращает десериализованный объект tf.keras.Model.
+    Извлекает установленную модель для заданного типа диска из таблицы DiskTypeModel
+    и возвращает десериализованный объект в зависимости от model_type:
+    keras.Model (прогретая), конвейер scikit-learn или NumpyLogisticModel.
     """
     session = Session()
     try:
@@ -46,87 +55,147 @@ def load_model_from_db(disk_type_id):
             #     logger.warning(f"Нет моделей для disk_type_id={disk_type_id}")
             #     return
 
-        encoded_model = model_row.model
-        model_bytes = base64.b64decode(encoded_model)
-        with tempfile.NamedTemporaryFile(suffix=".keras", delete=True) as tmp_file:
-            tmp_file.write(model_bytes)
-            tmp_file.flush()
-            loaded_model = keras.models.load_model(tmp_file.name)
+        return _load_model_row(model_row)
+
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке модели из БД: {e}", exc_info=True)
+        return None
+    finally:
+        session.close()
 
-        # model_buffer = io.BytesIO(model_bytes)
-        # loaded_model = keras.models.load_model(model_buffer)
 
-        return loaded_model
+def load_model_by_id(model_id):
+    """
+    Загружает модель DiskTypeModel по её id (без учёта флага is_current);
+    keras-модели прогреваются.
+    """
+    session = Session()
+    try:
+        model_row = session.query(DiskTypeModel).get(model_id)
+        if not model_row:
+            logger.warning(f"Модель с id={model_id} не найдена")
+            return None
+
+        return _load_model_row(model_row)
 
     except Exception as e:
-        logger.error(f"Ошибка при загрузке модели из БД: {e}", exc_info=True)
+        logger.error(f"Ошибка при загрузке модели id={model_id} из БД: {e}", exc_info=True)
         return None
     finally:
         session.close()
 
 
-def extract_features(wav_data: bytes, nfft: int = 4096) -> list[float]:
+def _load_model_row(model_row):
+    """Десериализует артефакт строки DiskTypeModel с учётом её model_type"""
+    model_type = model_row.model_type or MODEL_TYPE_KERAS
+    if model_type != MODEL_TYPE_KERAS:
+        return deserialize_artifact(model_type, model_row.model)
+    loaded_model = deserialize_model(model_row.model)
+    warm_up_model(loaded_model)
+    return loaded_model
+
+
+def deserialize_model(encoded_model):
     """
-    Извлекает пять значений из суммарного спектра.
-    wav_data — байты WAV-файла (моно или стерео).
-    nfft — размер окна (NFFT) для sg.spectrogram.
+    Превращает base64-строку из DiskTypeModel.model обратно в объект keras.Model.
+    """
+    model_bytes = base64.b64decode(encoded_model)
+    with tempfile.NamedTemporaryFile(suffix=".keras", delete=True) as tmp_file:
+        tmp_file.write(model_bytes)
+        tmp_file.flush()
+        loaded_model = keras.models.load_model(tmp_file.name)
+
+    # model_buffer = io.BytesIO(model_bytes)
+    # loaded_model = keras.models.load_model(model_buffer)
+    return loaded_model
+
 
-    Возвращает список из пяти float-чисел.
+def make_inference_fn(model):
     """
-    # 1. Считываем WAV-байты как float32
-    audio, sr = sf.read(io.BytesIO(wav_data), dtype='float32')
-    # Если стерео — берём только левый канал
-    if audio.ndim > 1:
-        audio = audio[:, 0]
+    Возвращает скомпилированную функцию инференса для одиночных образцов.
+    Вместо model.predict() (который на каждый вызов строит служебный пайплайн данных)
+    используется прямой вызов model(x, training=False), обёрнутый в tf.function
+    с фиксированной сигнатурой входа — граф трассируется один раз.
+    Результат кешируется на самой модели.
+    """
+    infer = getattr(model, "_soundscan_infer", None)
+    if infer is not None:
+        return infer
+
+    input_dim = model.input_shape[-1]
+    infer = tf.function(
+        lambda x: model(x, training=False),
+        input_signature=[tf.TensorSpec(shape=(None, input_dim), dtype=tf.float32)],
+    )
+    model._soundscan_infer = infer
+    return infer
+
 
-    # 2. Считаем спектр
-    frequencies, times, spectrogram = sg.spectrogram(audio, sr, nfft=nfft)
+def warm_up_model(model):
+    """
+    Прогревает модель на фиктивном векторе признаков: трассировка графа и выделение памяти
+    происходят при загрузке, а не на первой лопатке сканирования.
+    """
+    infer = make_inference_fn(model)
+    dummy = np.zeros((1, model.input_shape[-1]), dtype=np.float32)
+    start = time.perf_counter()
+    infer(dummy)
+    logger.info(f"Прогрев модели выполнен за {(time.perf_counter() - start) * 1000:.1f} мс")
+    return infer
 
-    # 3. Превращаем спектр в "одномерный" путём суммирования по временной оси
-    spectrogram_1d = np.sum(spectrogram, axis=1)  # shape: (num_freq_bins,)
 
-    # 4. Подфункция для безопасного поиска argmax в заданном диапазоне
-    def safe_argmax_in_range(arr: np.ndarray, start: int, end: int) -> float:
-        """
-        Возвращает argmax на подмассиве arr[start:end] как float,
-        если этот подмассив не пустой; иначе 0.0
-        """
-        if start >= len(arr):  # выходим за границы
-            return 0.0
-        subarr = arr[start:end]
-        if subarr.size == 0:
-            return 0.0
-        local_idx = np.argmax(subarr)
-        return float(local_idx)
+def predict_blade(model, features) -> float:
+    """
+    Предсказание по одной лопатке через скомпилированную функцию инференса.
+    Возвращает «сырое» значение выхода модели (вероятность класса "Годен").
+    """
+    infer = make_inference_fn(model)
+    input_data = np.array([features], dtype=np.float32)
+    return float(np.asarray(infer(input_data))[0][0])
 
-    # 5. Извлекаем пять значений
-    #    (по сути индексы локального argmax в заданных диапазонах)
-    value1 = safe_argmax_in_range(spectrogram_1d, 0, 200)
-    value2 = safe_argmax_in_range(spectrogram_1d, 300, 500)
-    value3 = safe_argmax_in_range(spectrogram_1d, 600, 1000)
-    value4 = safe_argmax_in_range(spectrogram_1d, 1100, 1500)
-    value5 = safe_argmax_in_range(spectrogram_1d, 1600, 2000)
 
-    return [value1, value2, value3, value4, value5]
+# архитектура по умолчанию: пары (число нейронов, активация) скрытых слоёв
+DEFAULT_HIDDEN_LAYERS = ((16, 'relu'), (32, 'tanh'))
 
 
-def build_model(input_dim, output_dim=1):
+def build_model(input_dim, output_dim=1, hidden_layers=DEFAULT_HIDDEN_LAYERS, optimizer='sgd',
+                learning_rate=0.001, momentum=0.5, normalization_data=None):
     """
-    Создаёт и компилирует Keras-модель для регрессии (активация 'tanh' в выходном слое).
+    Создаёт и компилирует Keras-модель бинарной классификации (активация 'sigmoid' в выходном слое).
+    Параметры по умолчанию соответствуют исходной архитектуре; остальные значения
+    используются подбором гиперпараметров (hyperparam_search).
 
     :param input_dim: размерность входных данных (количество признаков)
     :param output_dim: размерность выхода (в данном примере = 1)
+    :param hidden_layers: последовательность пар (units, activation) скрытых слоёв
+    :param optimizer: 'sgd', 'adam' или 'rmsprop'
+    :param learning_rate: скорость обучения
+    :param momentum: момент для SGD
+    :param normalization_data: обучающая матрица признаков; если передана, первым слоем добавляется
+                               keras.layers.Normalization, адаптированный на этих данных. Статистики
+                               (среднее/дисперсия) сохраняются внутри модели, поэтому при инференсе
+                               признаки подаются как есть
     :return: скомпилированная модель
     """
     model = keras.Sequential()
-    model.add(keras.layers.Dense(16, input_dim=input_dim, activation='relu'))
-    model.add(keras.layers.Dense(32, activation='tanh'))
+    model.add(keras.Input(shape=(input_dim,)))
+    if normalization_data is not None:
+        #признаки — номера бинов спектра (сотни-тысячи), без нормализации SGD сходится очень медленно
+        normalization = keras.layers.Normalization(axis=-1)
+        normalization.adapt(np.asarray(normalization_data, dtype=np.float32))
+        model.add(normalization)
+    for units, activation in hidden_layers:
+        model.add(keras.layers.Dense(units, activation=activation))
     # model.add(keras.layers.Dense(output_dim, activation='tanh'))
     #Пробую изменить выходной слой чтобы на выходе получать бинарную классификацию для однозначной оценки True или False
     model.add(keras.layers.Dense(1, activation='sigmoid'))
 
-
-    optimizer = SGD(learning_rate=0.001, momentum=0.5, nesterov=True)
+    if optimizer == 'adam':
+        optimizer = Adam(learning_rate=learning_rate)
+    elif optimizer == 'rmsprop':
+        optimizer = RMSprop(learning_rate=learning_rate)
+    else:
+        optimizer = SGD(learning_rate=learning_rate, momentum=momentum, nesterov=True)
     # model.compile(loss='mean_squared_error', optimizer=optimizer, metrics=['accuracy'])
     model.compile(loss='binary_crossentropy', optimizer=optimizer, metrics=['accuracy'])
 
@@ -156,54 +225,211 @@ def calc_correlation(y_true, y_pred):
         return 0
     return sum1 / denominator
 
-def get_training_dataset(selected_item):
+def _training_blades_query(session, disk_type_id, created_after=None, created_before=None):
+    """Размеченные лопатки обучающих измерений типа диска: (id, scan, prediction)"""
+    query = session.query(Blade.id, Blade.scan, Blade.prediction) \
+        .join(DiskScan, Blade.disk_scan_id == DiskScan.id) \
+        .filter(DiskScan.disk_type_id == disk_type_id,
+                DiskScan.is_training == True,
+                Blade.prediction.isnot(None))
+    if created_after is not None:
+        query = query.filter(LABEL_TIME > created_after)
+    if created_before is not None:
+        query = query.filter(LABEL_TIME <= created_before)
+    return query
+
+
+def get_training_dataset(selected_item, should_stop=None, batch_size=64,
+                         created_after=None, created_before=None, limit=None, random_sample=False):
+    """
+    Собирает обучающую выборку для типа диска одним запросом blade -> disk_scan
+    (только обучающие измерения и размеченные лопатки). Строки читаются потоково
+    через yield_per, признаки сразу складываются в FeatureMatrixBuilder,
+    поэтому в памяти одновременно находится не больше batch_size WAV-записей.
+
+    :param selected_item: имя типа диска
+    :param should_stop: функция без аргументов; если вернёт True, сбор прерывается
+    :param created_after: брать только лопатки, размеченные (или записанные) после этого момента
+    :param created_before: брать только лопатки, размеченные (или записанные) не позже этого момента
+    :param limit: максимальное количество лопаток
+    :param random_sample: выбирать лопатки в случайном порядке (для replay-выборки)
+    :return: (X, y) или False, если данных нет или сбор прерван
+    """
+    session = Session()
+    builder = FeatureMatrixBuilder()
+
+    try:
+        disk_type_id = session.query(DiskType.id).filter_by(name=selected_item).scalar()
+        if disk_type_id is None:
+            logger.error(f"Ошибка: тип диска '{selected_item}' не найден")
+            return False
+
+        query = _training_blades_query(session, disk_type_id, created_after, created_before)
+        query = query.order_by(func.random() if random_sample else Blade.id)
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.yield_per(batch_size)
+
+        for row in rows:
+            if should_stop is not None and should_stop():
+                logger.info("Сбор обучающей выборки прерван")
+                return False
+            builder.append(extract_features(row.scan), 1 if row.prediction is True else 0)
+
+    finally:
+        session.close()
+
+    if not len(builder):
+        logger.error("Ошибка: не выбраны данные")
+        return False
+
+    logger.info(f"Обучающая выборка собрана: {len(builder)} лопаток")
+    return builder.build()
+
+
+def get_training_signals(selected_item, should_stop=None, batch_size=64):
+    """
+    Как get_training_dataset, но дополнительно возвращает исходные WAV-байты лопаток —
+    для обучения с аугментацией (сигналы искажаются на лету и заново проходят через признаки).
+    :return: (signals, X, y) или False, если данных нет или сбор прерван
+    """
     session = Session()
-    X, y = [], []
+    builder = FeatureMatrixBuilder()
+    signals = []
 
     try:
-        disk_type = session.query(DiskType).filter_by(name=selected_item).first()
-        training_scans = session.query(DiskScan).filter(DiskScan.disk_type_id == disk_type.id, DiskScan.is_training==True).all()
-        if training_scans:
-
-            for scan in training_scans:
-                blades = session.query(Blade).filter_by(disk_scan_id=scan.id).all()
-            for blade in blades:
-                if blade.prediction is None:
-                    continue
-                wav_data = blade.scan
-                features = extract_features(wav_data)
-                X.append(features)
-                y.append(1 if blade.prediction is True else 0)
-        else:
-            logger.error("Ошибка: не выбраны данные")
+        disk_type_id = session.query(DiskType.id).filter_by(name=selected_item).scalar()
+        if disk_type_id is None:
+            logger.error(f"Ошибка: тип диска '{selected_item}' не найден")
             return False
 
+        rows = _training_blades_query(session, disk_type_id).order_by(Blade.id).yield_per(batch_size)
+        for row in rows:
+            if should_stop is not None and should_stop():
+                logger.info("Сбор обучающей выборки прерван")
+                return False
+            signals.append(row.scan)
+            builder.append(extract_features(row.scan), 1 if row.prediction is True else 0)
+
+    finally:
+        session.close()
+
+    if not signals:
+        logger.error("Ошибка: не выбраны данные")
+        return False
+
+    logger.info(f"Обучающие сигналы собраны: {len(signals)} лопаток")
+    X, y = builder.build()
+    return signals, X, y
+
+
+def get_current_model_info(disk_type_id):
+    """
+    Возвращает (id, created_at, model_type) установленной модели для типа диска или None.
+    Сам артефакт модели не загружается.
+    """
+    session = Session()
+    try:
+        return session.query(DiskTypeModel.id, DiskTypeModel.created_at, DiskTypeModel.model_type) \
+            .filter(DiskTypeModel.disk_type_id == disk_type_id, DiskTypeModel.is_current == True) \
+            .first()
+    finally:
+        session.close()
+
+
+def count_new_labels(disk_type_id, since=None):
+    """
+    Количество размеченных лопаток обучающих измерений типа диска,
+    появившихся после момента since (None — все размеченные лопатки).
+    """
+    session = Session()
+    try:
+        query = session.query(func.count(Blade.id)) \
+            .join(DiskScan, Blade.disk_scan_id == DiskScan.id) \
+            .filter(DiskScan.disk_type_id == disk_type_id,
+                    DiskScan.is_training == True,
+                    Blade.prediction.isnot(None))
+        if since is not None:
+            query = query.filter(LABEL_TIME > since)
+        return query.scalar()
+    finally:
+        session.close()
+
+
+def get_latest_model_time(disk_type_id):
+    """Время создания самой свежей модели типа диска (установленной или кандидата) или None"""
+    session = Session()
+    try:
+        return session.query(func.max(DiskTypeModel.created_at)) \
+            .filter(DiskTypeModel.disk_type_id == disk_type_id) \
+            .scalar()
     finally:
         session.close()
 
-    return np.array(X, dtype=np.float32), np.array(y, dtype=np.float32)
+
+def get_disk_type_id(disk_type_name):
+    session = Session()
+    try:
+        return session.query(DiskType.id).filter_by(name=disk_type_name).scalar()
+    finally:
+        session.close()
 
 
-def save_model_to_db(model, selected_item):
+def save_model_to_db(model, selected_item, history=None, train_samples=None, train_duration=None,
+                     representative_data=None, model_type=MODEL_TYPE_KERAS, **metadata):
+    """
+    Сохраняет модель в DiskTypeModel вместе с метаданными.
+    Для keras-моделей при включенной настройке EXPORT_TFLITE рядом сохраняется квантованный TFLite-вариант.
+
+    :param history: словарь history.history из model.fit (accuracy/loss по эпохам)
+    :param train_samples: количество обучающих примеров
+    :param train_duration: длительность обучения в секундах
+    :param representative_data: матрица признаков для калибровки int8-квантования
+    :param model_type: тип артефакта (MODEL_TYPE_KERAS / MODEL_TYPE_SKLEARN / MODEL_TYPE_NUMPY)
+    :param metadata: дополнительные поля DiskTypeModel (training_mode, parent_model_id, ...)
+    :return: id сохранённой модели или False
+    """
     session = Session()
     if selected_item:
         try:
             disk_type = session.query(DiskType).filter_by(name=selected_item).first()
 
-            with tempfile.NamedTemporaryFile(suffix=".keras", delete=True) as tmp_file:
-                model.save(tmp_file.name)
-                tmp_file.seek(0)
-                model_bytes = tmp_file.read()
+            if model_type == MODEL_TYPE_KERAS:
+                with tempfile.NamedTemporaryFile(suffix=".keras", delete=True) as tmp_file:
+                    model.save(tmp_file.name)
+                    tmp_file.seek(0)
+                    model_bytes = tmp_file.read()
+            else:
+                model_bytes = serialize_artifact(model_type, model)
 
             encoded_model = base64.b64encode(model_bytes).decode('utf-8')
+
+            tflite_bytes = None
+            if settings.EXPORT_TFLITE and model_type == MODEL_TYPE_KERAS:
+                try:
+                    tflite_bytes = export_tflite(model, representative_data)
+                except Exception as e:
+                    logger.error(f"Ошибка экспорта модели в TFLite: {e}", exc_info=True)
+
             new_model = DiskTypeModel(
                 disk_type_id=disk_type.id,
                 model=encoded_model,
-                is_current=False
+                is_current=False,
+                model_type=model_type,
+                feature_version=FEATURE_VERSION,
+                input_dim=artifact_input_dim(model_type, model),
+                train_samples=train_samples,
+                history=json.dumps(_history_to_json(history)) if history else None,
+                artifact_size=len(model_bytes),
+                train_duration=train_duration,
+                tflite_model=base64.b64encode(tflite_bytes).decode('utf-8') if tflite_bytes else None,
+                tflite_size=len(tflite_bytes) if tflite_bytes else None,
+                **metadata
             )
             session.add(new_model)
             session.commit()
             logger.info("Модель сохранена в базу данных")
+            return new_model.id
         finally:
             session.close()
 
@@ -211,5 +437,82 @@ def save_model_to_db(model, selected_item):
         logger.error("Ошибка, не найден disk_type")
         return False
 
-    return True
 
+def export_tflite(model, representative_data=None) -> bytes:
+    """
+    Конвертирует keras-модель в TFLite flatbuffer с квантованием весов.
+    Если передана матрица признаков representative_data, выполняется полное int8-квантование
+    с калибровкой диапазонов активаций (вход и выход остаются float32).
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if representative_data is not None and len(representative_data):
+        samples = np.asarray(representative_data, dtype=np.float32)[:200]
+
+        def representative_dataset():
+            for sample in samples:
+                yield [sample.reshape(1, -1)]
+
+        converter.representative_dataset = representative_dataset
+    tflite_bytes = converter.convert()
+    logger.info(f"Модель экспортирована в TFLite: {len(tflite_bytes)} байт")
+    return tflite_bytes
+
+
+def check_tflite_parity(model_id, limit=200, tolerance=0.05):
+    """
+    Сравнивает предсказания keras-модели и её TFLite-варианта на сохранённых лопатках
+    того же типа диска (последние limit записей).
+
+    :return: словарь с количеством лопаток, максимальным и средним расхождением выхода
+             и долей совпавших решений (порог 0.5); None, если сравнить не удалось
+    """
+    from src.scan.tflite_backend import TFLiteModel
+
+    session = Session()
+    try:
+        model_row = session.query(DiskTypeModel).get(model_id)
+        if not model_row or not model_row.tflite_model:
+            logger.warning(f"Модель ID {model_id} не найдена или не имеет TFLite-варианта")
+            return None
+        keras_model = deserialize_model(model_row.model)
+        tflite_model = TFLiteModel(base64.b64decode(model_row.tflite_model))
+
+        blades = session.query(Blade.scan) \
+            .join(DiskScan, Blade.disk_scan_id == DiskScan.id) \
+            .filter(DiskScan.disk_type_id == model_row.disk_type_id) \
+            .order_by(Blade.id.desc()) \
+            .limit(limit) \
+            .all()
+    finally:
+        session.close()
+
+    if not blades:
+        logger.warning(f"Нет сохранённых лопаток для проверки TFLite-модели ID {model_id}")
+        return None
+
+    diffs = []
+    agreements = 0
+    for blade in blades:
+        features = extract_features(blade.scan)
+        keras_output = predict_blade(keras_model, features)
+        tflite_output = tflite_model.predict(features)
+        diffs.append(abs(keras_output - tflite_output))
+        agreements += (keras_output > 0.5) == (tflite_output > 0.5)
+
+    report = {
+        "blades": len(blades),
+        "max_abs_diff": float(np.max(diffs)),
+        "mean_abs_diff": float(np.mean(diffs)),
+        "agreement": agreements / len(blades),
+    }
+    if report["max_abs_diff"] > tolerance:
+        logger.warning(f"TFLite-модель ID {model_id} расходится с keras-моделью: {report}")
+    else:
+        logger.info(f"Проверка TFLite-модели ID {model_id}: {report}")
+    return report
+
+
+def _history_to_json(history):
+    """Приводит history.history (списки numpy-чисел) к JSON-совместимому виду"""
+    return {key: [float(value) for value in values] for key, values in history.items()}
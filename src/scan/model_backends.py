@@ -0,0 +1,243 @@
+import base64
+import io
+import logging
+import threading
+import time
+
+import numpy as np
+
+from src.db import Session
+from src.models import DiskTypeModel
+
+# модуль не импортирует keras/tensorflow на верхнем уровне: модели scikit-learn и NumPy
+# загружаются и работают без TF, keras-модели обрабатываются через ml_predict/tflite_backend
+
+logger = logging.getLogger(__name__)
+
+# тип артефакта, хранящегося в DiskTypeModel.model (поле model_type)
+MODEL_TYPE_KERAS = "keras"
+MODEL_TYPE_SKLEARN = "sklearn"
+MODEL_TYPE_NUMPY = "numpy"
+
+# классические модели scikit-learn, доступные для обучения
+SKLEARN_LOGREG = "logreg"
+SKLEARN_HGB = "hgb"
+
+
+def build_sklearn_pipeline(kind=SKLEARN_LOGREG):
+    """
+    Создаёт конвейер scikit-learn: масштабирование признаков + классификатор.
+
+    :param kind: SKLEARN_LOGREG (логистическая регрессия) или SKLEARN_HGB (градиентный бустинг)
+    """
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if kind == SKLEARN_HGB:
+        classifier = HistGradientBoostingClassifier(max_iter=200, early_stopping="auto")
+    else:
+        classifier = LogisticRegression(max_iter=1000, class_weight="balanced")
+    return make_pipeline(StandardScaler(), classifier)
+
+
+def serialize_artifact(model_type, model) -> bytes:
+    """Сериализует модель scikit-learn или NumPy в байты для хранения в DiskTypeModel.model"""
+    if model_type == MODEL_TYPE_SKLEARN:
+        import joblib
+        buffer = io.BytesIO()
+        joblib.dump(model, buffer)
+        return buffer.getvalue()
+    if model_type == MODEL_TYPE_NUMPY:
+        return model.to_bytes()
+    raise ValueError(f"Неподдерживаемый тип модели для сериализации: {model_type}")
+
+
+def deserialize_artifact(model_type, encoded_model):
+    """Восстанавливает модель scikit-learn или NumPy из base64-строки DiskTypeModel.model"""
+    model_bytes = base64.b64decode(encoded_model)
+    if model_type == MODEL_TYPE_SKLEARN:
+        import joblib
+        return joblib.load(io.BytesIO(model_bytes))
+    if model_type == MODEL_TYPE_NUMPY:
+        return NumpyLogisticModel.from_bytes(model_bytes)
+    raise ValueError(f"Неподдерживаемый тип модели для десериализации: {model_type}")
+
+
+def artifact_input_dim(model_type, model):
+    if model_type == MODEL_TYPE_SKLEARN:
+        return int(model.n_features_in_)
+    if model_type == MODEL_TYPE_NUMPY:
+        return int(model.coef.shape[0])
+    return int(model.input_shape[-1])
+
+
+class NumpyLogisticModel:
+    """
+    Логистическая регрессия в виде набора массивов NumPy (среднее/масштаб признаков, веса, смещение).
+    Инференс — одно скалярное произведение, без scikit-learn и tensorflow.
+    """
+
+    def __init__(self, mean, scale, coef, intercept):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    @classmethod
+    def from_sklearn(cls, pipeline):
+        """Экспорт обученного конвейера StandardScaler + LogisticRegression"""
+        scaler, classifier = pipeline[0], pipeline[-1]
+        return cls(scaler.mean_, scaler.scale_, classifier.coef_[0], classifier.intercept_[0])
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(arrays["mean"], arrays["scale"], arrays["coef"], arrays["intercept"])
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, mean=self.mean, scale=self.scale, coef=self.coef, intercept=np.array(self.intercept))
+        return buffer.getvalue()
+
+    def predict(self, features) -> float:
+        z = float(np.dot((np.asarray(features, dtype=np.float64) - self.mean) / self.scale, self.coef)) + self.intercept
+        return float(1.0 / (1.0 + np.exp(-z)))
+
+
+class SklearnInferenceModel:
+    """Обёртка конвейера scikit-learn с единым интерфейсом predict(features) -> float"""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def predict(self, features) -> float:
+        return float(self.pipeline.predict_proba(np.asarray([features], dtype=np.float64))[0][1])
+
+
+class KerasInferenceModel:
+    """Обёртка keras-модели: предсказание через скомпилированную функцию инференса (ml_predict.predict_blade)"""
+
+    def __init__(self, model):
+        from src.scan.ml_predict import predict_blade
+        self.model = model
+        self._predict_blade = predict_blade
+
+    def predict(self, features) -> float:
+        return self._predict_blade(self.model, features)
+
+
+def wrap_inference_model(model_type, model):
+    """Приводит загруженную модель любого типа к интерфейсу predict(features) -> float"""
+    if model_type == MODEL_TYPE_SKLEARN:
+        return SklearnInferenceModel(model)
+    if model_type == MODEL_TYPE_NUMPY:
+        return model
+    return KerasInferenceModel(model)
+
+
+def load_inference_model(disk_type_id, keras_backend="keras"):
+    """
+    Загружает установленную модель типа диска и возвращает объект с методом predict(features) -> float.
+    Выбор способа загрузки зависит от поля model_type; для keras-моделей keras_backend
+    определяет, используется ли полная keras-модель или её TFLite-вариант.
+    """
+    session = Session()
+    try:
+        model_row = session.query(DiskTypeModel.id, DiskTypeModel.model_type) \
+            .filter(DiskTypeModel.disk_type_id == disk_type_id, DiskTypeModel.is_current == True) \
+            .first()
+    finally:
+        session.close()
+    if not model_row:
+        logger.warning(f"Нет установленной модели для disk_type_id={disk_type_id}")
+        return None
+
+    model_type = model_row.model_type or MODEL_TYPE_KERAS
+    start = time.perf_counter()
+    if model_type == MODEL_TYPE_KERAS:
+        if keras_backend == "tflite":
+            from src.scan.tflite_backend import load_tflite_model_from_db
+            tflite_model = load_tflite_model_from_db(disk_type_id)
+            if tflite_model is not None:
+                return tflite_model
+            #модели, сохранённые до экспорта TFLite (или с EXPORT_TFLITE=False / неудачной конвертацией),
+            #варианта не имеют — сканирование не должно остаться без предсказаний
+            logger.warning(f"Нет TFLite-варианта модели ID {model_row.id}, используется полная keras-модель")
+        from src.scan.ml_predict import load_model_from_db
+        model = load_model_from_db(disk_type_id)
+        return KerasInferenceModel(model) if model is not None else None
+
+    model = load_artifact_by_id(model_row.id)
+    if model is None:
+        return None
+    inference_model = wrap_inference_model(model_type, model)
+    logger.info(f"Модель ID {model_row.id} ({model_type}) загружена за {(time.perf_counter() - start) * 1000:.1f} мс")
+    return inference_model
+
+
+class SharedInferenceModel:
+    """Модель из InferenceModelCache: её используют конвейеры нескольких установок, поэтому predict() под блокировкой"""
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()  # интерпретатор TFLite не допускает одновременных вызовов из разных потоков
+
+    def predict(self, features) -> float:
+        with self.lock:
+            return self.model.predict(features)
+
+
+class InferenceModelCache:
+    """
+    Загруженные модели сканирования, общие для всех установок станции: тип диска, который сканируется
+    на нескольких установках, загружается один раз. Ключ — id установленной модели, поэтому новая текущая
+    модель (например, после дообучения) подхватывается при следующем запуске серии, а старая выгружается.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models = {}  # (disk_type_id, keras_backend) -> (id модели, SharedInferenceModel)
+
+    def get(self, disk_type_id, keras_backend="keras"):
+        session = Session()
+        try:
+            model_row = session.query(DiskTypeModel.id) \
+                .filter(DiskTypeModel.disk_type_id == disk_type_id, DiskTypeModel.is_current == True) \
+                .first()
+        finally:
+            session.close()
+        if not model_row:
+            logger.warning(f"Нет установленной модели для disk_type_id={disk_type_id}")
+            return None
+
+        key = (disk_type_id, keras_backend)
+        #загрузка под общей блокировкой: установки, одновременно начавшие один тип диска, ждут одну загрузку
+        with self.lock:
+            cached = self.models.get(key)
+            if cached is not None and cached[0] == model_row.id:
+                return cached[1]
+            model = load_inference_model(disk_type_id, keras_backend=keras_backend)
+            if model is None:
+                return None
+            shared = SharedInferenceModel(model)
+            self.models[key] = (model_row.id, shared)
+            logger.info(f"Модель ID {model_row.id} добавлена в общий кэш станции")
+            return shared
+
+
+def load_artifact_by_id(model_id):
+    """Загружает модель scikit-learn или NumPy по id (для keras-моделей см. ml_predict.load_model_by_id)"""
+    session = Session()
+    try:
+        model_row = session.query(DiskTypeModel).get(model_id)
+        if not model_row:
+            logger.warning(f"Модель с id={model_id} не найдена")
+            return None
+        return deserialize_artifact(model_row.model_type, model_row.model)
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке модели id={model_id} из БД: {e}", exc_info=True)
+        return None
+    finally:
+        session.close()
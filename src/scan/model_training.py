@@ -0,0 +1,367 @@
+import datetime
+import json
+import logging
+import math
+import time
+
+import keras
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+from sklearn.metrics import log_loss
+
+from src.config import settings
+from src.scan.ml_predict import build_model, get_training_dataset, save_model_to_db, check_tflite_parity, \
+    get_current_model_info, get_disk_type_id, load_model_by_id, get_training_signals
+from src.scan.augmentation import AugmentedBladeDataset, split_validation
+from src.scan.hyperparam_search import sample_trials, run_search, BUILD_PARAMS
+from src.scan.model_backends import MODEL_TYPE_KERAS, MODEL_TYPE_SKLEARN, MODEL_TYPE_NUMPY, SKLEARN_LOGREG, \
+    SKLEARN_HGB, NumpyLogisticModel, build_sklearn_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingProgressCallback(keras.callbacks.Callback):
+    """
+    Keras-callback, передающий прогресс обучения (loss, accuracy, ETA) в TrainingWorker
+    и останавливающий обучение после запроса отмены.
+    """
+
+    def __init__(self, worker, epochs):
+        super().__init__()
+        self.worker = worker
+        self.epochs = epochs
+        self.start_time = None
+
+    def on_train_begin(self, logs=None):
+        self.start_time = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        elapsed = time.perf_counter() - self.start_time
+        done = epoch + 1
+        eta = elapsed / done * (self.epochs - done)
+        self.worker.progress.emit({
+            "epoch": done,
+            "epochs": self.epochs,
+            "loss": float(logs.get("loss", 0.0)),
+            "accuracy": float(logs.get("accuracy", 0.0)),
+            "val_loss": float(logs["val_loss"]) if "val_loss" in logs else None,
+            "eta": eta,
+        })
+        if self.worker.cancel_requested:
+            logger.info(f"Обучение остановлено по запросу после эпохи {done}")
+            self.model.stop_training = True
+
+
+class TrainingWorker(QObject):
+    """
+    Обучение модели в отдельном потоке (moveToThread + QThread, как Scanning).
+    Режимы:
+        MODE_FULL — новая модель с нуля на всех обучающих данных;
+        MODE_INCREMENTAL — дообучение текущей модели на лопатках, записанных после её создания,
+                           с подмешиванием случайной выборки старых лопаток (replay);
+        MODE_SEARCH — подбор гиперпараметров с k-fold кросс-валидацией, лучшая конфигурация
+                      дообучается на всех данных и сохраняется вместе с метриками CV.
+    Тип модели (model_kind): KIND_KERAS — нейросеть keras (все режимы), KIND_SKLEARN_LOGREG /
+    KIND_SKLEARN_HGB — конвейеры scikit-learn, KIND_NUMPY_LOGREG — логистическая регрессия,
+    сохранённая как массивы NumPy; классические модели обучаются только в режиме MODE_FULL.
+    Сигналы:
+        progress(dict) — прогресс по эпохам;
+        finished(dict) — итог обучения (история, id сохранённой модели, проверка TFLite);
+        failed(str) — ошибка/нет данных;
+        cancelled() — обучение отменено, модель не сохраняется.
+    """
+    MODE_FULL = "full"
+    MODE_INCREMENTAL = "incremental"
+    MODE_SEARCH = "search"
+
+    KIND_KERAS = "keras"
+    KIND_SKLEARN_LOGREG = "sklearn_logreg"
+    KIND_SKLEARN_HGB = "sklearn_hgb"
+    KIND_NUMPY_LOGREG = "numpy_logreg"
+
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, disk_type_name, mode=MODE_FULL, model_kind=KIND_KERAS, epochs=15, batch_size=8):
+        super().__init__()
+        self.disk_type_name = disk_type_name
+        self.mode = mode
+        self.model_kind = model_kind
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.cancel_requested = False
+
+    def cancel(self):
+        """Запрос отмены; вызывается из GUI-потока, обучение остановится в конце текущей эпохи"""
+        self.cancel_requested = True
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            if self.model_kind != self.KIND_KERAS:
+                self._train_classical()
+                return
+            if self.mode == self.MODE_INCREMENTAL:
+                prepared = self._prepare_incremental()
+            elif self.mode == self.MODE_SEARCH:
+                prepared = self._prepare_search()
+            else:
+                prepared = self._prepare_full()
+            if self.cancel_requested:
+                self.cancelled.emit()
+                return
+            if prepared is None:
+                return
+            model, X, y, fit_params, metadata = prepared
+            leaderboard = metadata.pop("leaderboard", None)
+
+            callbacks = [TrainingProgressCallback(self, fit_params["epochs"])]
+            early_stopping = None
+            if fit_params.get("validation_split") or "validation_data" in fit_params:
+                early_stopping = keras.callbacks.EarlyStopping(monitor="val_loss",
+                                                               patience=settings.EARLY_STOPPING_PATIENCE,
+                                                               restore_best_weights=True)
+                callbacks.append(early_stopping)
+
+            train_start = time.perf_counter()
+            if "dataset" in fit_params:
+                history = model.fit(fit_params["dataset"], epochs=fit_params["epochs"], verbose=0,
+                                    validation_data=fit_params["validation_data"], callbacks=callbacks)
+            else:
+                history = model.fit(X, y, epochs=fit_params["epochs"], batch_size=fit_params["batch_size"],
+                                    verbose=0, validation_split=fit_params.get("validation_split", 0.0),
+                                    callbacks=callbacks)
+            train_duration = time.perf_counter() - train_start
+            convergence = self._convergence_report(history.history, early_stopping)
+            if self.cancel_requested:
+                self.cancelled.emit()
+                return
+
+            model_id = save_model_to_db(model, self.disk_type_name, history=history.history, train_samples=len(X),
+                                        train_duration=train_duration, representative_data=X, **metadata)
+            if not model_id:
+                self.failed.emit("Не удалось сохранить модель")
+                return
+
+            parity = check_tflite_parity(model_id) if settings.EXPORT_TFLITE else None
+            self.finished.emit({
+                "model_id": model_id,
+                "mode": self.mode,
+                "history": history.history,
+                "train_duration": train_duration,
+                "train_samples": len(X),
+                "parity": parity,
+                "leaderboard": leaderboard,
+                "convergence": convergence,
+            })
+        except Exception as e:
+            logger.error(f"Ошибка обучения модели: {e}", exc_info=True)
+            self.failed.emit(f"Ошибка обучения модели: {e}")
+
+    def _train_classical(self):
+        """Обучение модели scikit-learn / NumPy: одна подгонка без эпох, доли миллисекунды на инференс"""
+        data = get_training_dataset(self.disk_type_name, should_stop=self._should_stop)
+        if self.cancel_requested:
+            self.cancelled.emit()
+            return
+        if not data:
+            self.failed.emit("Обучение не совершено, нет данных")
+            return
+        X, y = data
+        if len(np.unique(y)) < 2:
+            self.failed.emit("Для обучения нужны лопатки обоих классов")
+            return
+
+        estimator = SKLEARN_HGB if self.model_kind == self.KIND_SKLEARN_HGB else SKLEARN_LOGREG
+        pipeline = build_sklearn_pipeline(estimator)
+        train_start = time.perf_counter()
+        pipeline.fit(X, y)
+        train_duration = time.perf_counter() - train_start
+
+        probabilities = pipeline.predict_proba(X)[:, 1]
+        history = {
+            "accuracy": [float(pipeline.score(X, y))],
+            "loss": [float(log_loss(y, probabilities, labels=[0, 1]))],
+        }
+
+        if self.model_kind == self.KIND_NUMPY_LOGREG:
+            model, model_type = NumpyLogisticModel.from_sklearn(pipeline), MODEL_TYPE_NUMPY
+        else:
+            model, model_type = pipeline, MODEL_TYPE_SKLEARN
+
+        model_id = save_model_to_db(model, self.disk_type_name, history=history, train_samples=len(X),
+                                    train_duration=train_duration, model_type=model_type,
+                                    training_mode=self.MODE_FULL, hyperparams=json.dumps({"estimator": estimator}))
+        if not model_id:
+            self.failed.emit("Не удалось сохранить модель")
+            return
+        logger.info(f"Модель {self.model_kind} обучена за {train_duration * 1000:.1f} мс")
+        self.finished.emit({
+            "model_id": model_id,
+            "mode": self.MODE_FULL,
+            "history": history,
+            "train_duration": train_duration,
+            "train_samples": len(X),
+            "parity": None,
+            "leaderboard": None,
+            "convergence": None,
+        })
+
+    @staticmethod
+    def _convergence_report(history, early_stopping):
+        """
+        Сводка сходимости: сколько эпох прошло, на какой эпохе был лучший val_loss
+        и сработала ли ранняя остановка.
+        """
+        epochs_trained = len(history.get("loss", []))
+        report = {"epochs_trained": epochs_trained, "early_stopped": False, "best_epoch": epochs_trained}
+        if early_stopping is not None and history.get("val_loss"):
+            report["best_epoch"] = int(np.argmin(history["val_loss"])) + 1
+            report["best_val_loss"] = float(np.min(history["val_loss"]))
+            report["early_stopped"] = early_stopping.stopped_epoch > 0
+        return report
+
+    def _should_stop(self):
+        return self.cancel_requested
+
+    def _prepare_full(self):
+        if settings.AUGMENTATION:
+            return self._prepare_augmented()
+        data = get_training_dataset(self.disk_type_name, should_stop=self._should_stop)
+        if not data:
+            if not self.cancel_requested:
+                self.failed.emit("Обучение не совершено, нет данных")
+            return None
+        X, y = data
+        # перемешиваем: validation_split берёт последние примеры, а выборка упорядочена по времени записи
+        order = np.random.default_rng().permutation(len(X))
+        X, y = X[order], y[order]
+        model = build_model(input_dim=X.shape[1], normalization_data=X)
+        fit_params = {"epochs": self.epochs, "batch_size": self.batch_size}
+        if len(X) * settings.VALIDATION_SPLIT >= 2:
+            fit_params.update(epochs=settings.MAX_EPOCHS, validation_split=settings.VALIDATION_SPLIT)
+        else:
+            logger.warning(f"Мало данных для валидации ({len(X)} лопаток), обучение на {self.epochs} эпохах")
+        return model, X, y, fit_params, {"training_mode": self.MODE_FULL}
+
+    def _prepare_augmented(self):
+        """
+        Полное обучение на аугментированных данных: модель учится на AugmentedBladeDataset,
+        валидация (и ранняя остановка) — на неискажённых отложенных лопатках.
+        """
+        data = get_training_signals(self.disk_type_name, should_stop=self._should_stop)
+        if not data:
+            if not self.cancel_requested:
+                self.failed.emit("Обучение не совершено, нет данных")
+            return None
+        signals, X, y = data
+        train_idx, val_idx = split_validation(y, settings.VALIDATION_SPLIT)
+        if len(val_idx) < 2 or len(train_idx) == 0:
+            self.failed.emit(f"Мало данных для обучения с аугментацией ({len(X)} лопаток)")
+            return None
+
+        dataset = AugmentedBladeDataset([signals[i] for i in train_idx], y[train_idx], batch_size=self.batch_size,
+                                        augment_factor=settings.AUGMENT_FACTOR, workers=settings.AUGMENT_WORKERS,
+                                        max_queue_size=settings.AUGMENT_QUEUE_SIZE)
+        logger.info(f"Обучение с аугментацией: {len(train_idx)} лопаток × {settings.AUGMENT_FACTOR}, "
+                    f"{len(dataset)} батчей за эпоху, валидация на {len(val_idx)} лопатках")
+        model = build_model(input_dim=X.shape[1], normalization_data=X[train_idx])
+        return model, X[train_idx], y[train_idx], {
+            "epochs": settings.MAX_EPOCHS,
+            "batch_size": self.batch_size,
+            "dataset": dataset,
+            "validation_data": (X[val_idx], y[val_idx]),
+        }, {"training_mode": self.MODE_FULL, "hyperparams": json.dumps({"augment_factor": settings.AUGMENT_FACTOR})}
+
+    def _prepare_incremental(self):
+        disk_type_id = get_disk_type_id(self.disk_type_name)
+        current = get_current_model_info(disk_type_id) if disk_type_id is not None else None
+        if current is None:
+            self.failed.emit("Нет установленной модели для дообучения")
+            return None
+        if (current.model_type or MODEL_TYPE_KERAS) != MODEL_TYPE_KERAS:
+            self.failed.emit("Дообучение доступно только для keras-моделей")
+            return None
+
+        data_until = datetime.datetime.now(datetime.UTC)
+        new_data = get_training_dataset(self.disk_type_name, should_stop=self._should_stop,
+                                        created_after=current.created_at, created_before=data_until)
+        if not new_data:
+            if not self.cancel_requested:
+                self.failed.emit("Нет новых размеченных лопаток с момента обучения текущей модели")
+            return None
+        X_new, y_new = new_data
+
+        replay_limit = int(math.ceil(len(X_new) * settings.INCREMENTAL_REPLAY_RATIO))
+        replay_data = None
+        if replay_limit > 0:
+            replay_data = get_training_dataset(self.disk_type_name, should_stop=self._should_stop,
+                                               created_before=current.created_at, limit=replay_limit,
+                                               random_sample=True)
+        if replay_data:
+            X = np.concatenate([X_new, replay_data[0]])
+            y = np.concatenate([y_new, replay_data[1]])
+            replay_samples = len(replay_data[0])
+        else:
+            X, y = X_new, y_new
+            replay_samples = 0
+
+        model = load_model_by_id(current.id)
+        if model is None:
+            self.failed.emit(f"Не удалось загрузить текущую модель ID {current.id}")
+            return None
+        logger.info(f"Дообучение модели ID {current.id}: {len(X_new)} новых лопаток, {replay_samples} из replay")
+
+        return model, X, y, {"epochs": settings.INCREMENTAL_EPOCHS, "batch_size": self.batch_size}, {
+            "training_mode": self.MODE_INCREMENTAL,
+            "parent_model_id": current.id,
+            "data_since": current.created_at,
+            "data_until": data_until,
+            "replay_samples": replay_samples,
+        }
+
+    def _prepare_search(self):
+        data = get_training_dataset(self.disk_type_name, should_stop=self._should_stop)
+        if not data:
+            if not self.cancel_requested:
+                self.failed.emit("Обучение не совершено, нет данных")
+            return None
+        X, y = data
+
+        trials = sample_trials(n_trials=settings.SEARCH_TRIALS)
+        logger.info(f"Подбор гиперпараметров: {len(trials)} испытаний, {settings.SEARCH_FOLDS} фолдов")
+
+        def on_trial_done(done, total, result):
+            self.progress.emit({
+                "trial": done,
+                "trials": total,
+                "val_accuracy": result["val_accuracy_mean"],
+            })
+
+        try:
+            leaderboard = run_search(X, y, trials, k_folds=settings.SEARCH_FOLDS, max_workers=settings.SEARCH_WORKERS,
+                                     progress_callback=on_trial_done, should_stop=self._should_stop)
+        except ValueError as e:
+            self.failed.emit(str(e))
+            return None
+        if self.cancel_requested:
+            return None
+        if not leaderboard:
+            self.failed.emit("Подбор гиперпараметров не дал ни одного результата")
+            return None
+
+        best = leaderboard[0]
+        params = best["params"]
+        model = build_model(input_dim=X.shape[1], normalization_data=X,
+                            **{key: value for key, value in params.items() if key in BUILD_PARAMS})
+        cv_metrics = {key: value for key, value in best.items() if key not in ("params", "trial")}
+        return model, X, y, {"epochs": params.get("epochs", self.epochs),
+                             "batch_size": params.get("batch_size", self.batch_size)}, {
+            "training_mode": self.MODE_SEARCH,
+            "hyperparams": json.dumps(params),
+            "cv_metrics": json.dumps(cv_metrics),
+            "leaderboard": leaderboard,
+        }
@@ -0,0 +1,67 @@
+from typing import Optional
+
+import numpy as np
+from scipy.stats import f as f_dist
+
+
+class OnlineOutlierDetector:
+    """
+    Поиск лопаток, выбивающихся из остальных лопаток того же диска, по мере их записи.
+    Среднее и матрица сумм отклонений M2 признаков обновляются методом Уэлфорда, обратная к M2 — формулой
+    Шермана — Моррисона, поэтому одна лопатка стоит O(признаков²) и история лопаток не хранится.
+    Новая лопатка сравнивается с уже принятыми по расстоянию Махаланобиса. Ковариация оценена по небольшому
+    числу лопаток, поэтому порог берётся не из хи-квадрат, а из распределения Фишера для нового наблюдения
+    (T² Хотеллинга): D² > порога с уровнем значимости alpha — выброс. Выбросы в статистику не добавляются, чтобы не размывать её.
+    M2 начинается с variance_floor·I: признак, почти не меняющийся между лопатками, не даёт деления на ноль,
+    а отличие на доли variance_floor не считается выбросом.
+    """
+
+    def __init__(self, alpha: float = 0.001, min_blades: int = 8, variance_floor: float = 1.0):
+        self.alpha = alpha
+        self.min_blades = min_blades  # до этого числа принятых лопаток статистика копится без оценки
+        self.variance_floor = variance_floor
+        self.n = 0
+        self.mean = None
+        self.m2_inv = None
+
+    def _init(self, dim: int):
+        self.mean = np.zeros(dim)
+        self.m2_inv = np.eye(dim) / self.variance_floor
+        self.min_blades = max(self.min_blades, dim + 2)  # для порога нужно n > числа признаков
+
+    def threshold(self) -> float:
+        """Порог D² для нового наблюдения при n принятых: (n+1)(n-1)p / (n(n-p)) · F(p, n-p)"""
+        n, p = self.n, len(self.mean)
+        return (n + 1) * (n - 1) * p / (n * (n - p)) * float(f_dist.isf(self.alpha, p, n - p))
+
+    def distance(self, x) -> float:
+        """Квадрат расстояния Махаланобиса от x до принятых лопаток (ковариация M2 / (n - 1))"""
+        d = x - self.mean
+        return float(max(self.n - 1, 1) * d @ self.m2_inv @ d)
+
+    def update(self, x):
+        """Добавляет лопатку в статистику: M2 += (n-1)/n · d·dᵀ, обратная матрица — обновлением ранга 1"""
+        self.n += 1
+        d = x - self.mean
+        self.mean = self.mean + d / self.n
+        c = (self.n - 1) / self.n
+        if c > 0:
+            u = self.m2_inv @ d
+            self.m2_inv = self.m2_inv - np.outer(u, u) * (c / (1 + c * (d @ u)))
+
+    def add(self, features) -> tuple[bool, Optional[float]]:
+        """
+        Оценивает лопатку и учитывает её в статистике диска.
+        Возвращает (выброс ли, D²); пока лопаток меньше min_blades — (False, None).
+        """
+        x = np.asarray(features, dtype=np.float64)
+        if self.mean is None:
+            self._init(x.shape[0])
+        if self.n < self.min_blades:
+            self.update(x)
+            return False, None
+        score = self.distance(x)
+        is_outlier = score > self.threshold()
+        if not is_outlier:
+            self.update(x)
+        return is_outlier, score
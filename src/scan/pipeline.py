@@ -0,0 +1,146 @@
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # маркер завершения, проходит через все стадии вслед за последней лопаткой
+
+
+@dataclass
+class BladeJob:
+    """Лопатка, проходящая через стадии конвейера сканирования"""
+    disk_scan_id: int
+    num: int
+    wav_data: Optional[bytes] = None
+    features: Optional[list] = None
+    prediction: Optional[bool] = None
+    score: Optional[float] = None
+    outlier: bool = False  # выбивается из остальных лопаток диска (src/scan/outliers.py)
+    outlier_score: Optional[float] = None  # квадрат расстояния Махаланобиса до остальных лопаток
+    base_position: Optional[int] = None  # положение базы установки на лопатке (для продолжения сканирования)
+    timings: dict = field(default_factory=dict)  # длительность каждой стадии, с
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+class PipelineStage:
+    """
+    Стадия конвейера: свой поток, входная очередь ограниченного размера и функция обработки.
+    Функция получает BladeJob и возвращает его (или None — лопатка дальше не передаётся).
+    Если очередь следующей стадии заполнена, поток ждёт (backpressure), время ожидания учитывается в метриках.
+    """
+
+    def __init__(self, name: str, func: Callable[[BladeJob], Optional[BladeJob]], maxsize: int):
+        self.name = name
+        self.func = func
+        self.on_done = None  # для последней стадии: вызывается с лопаткой, прошедшей все стадии
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.next_stage = None
+        self.thread = threading.Thread(target=self._run, name=f"scan-{name}", daemon=True)
+
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0  # суммарное время обработки
+        self.blocked_time = 0.0  # суммарное ожидание места в очереди следующей стадии
+        self.max_depth = 0  # максимальная наблюдавшаяся длина входной очереди
+
+    def put(self, item):
+        self.queue.put(item)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is _STOP:
+                    if self.next_stage is not None:
+                        self.next_stage.put(_STOP)
+                    return
+                self._process(job)
+            finally:
+                #лопатка уже передана следующей стадии, поэтому queue.join() стадий по порядку ждёт весь конвейер
+                self.queue.task_done()
+
+    def _process(self, job):
+        start = time.perf_counter()
+        try:
+            job = self.func(job)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Конвейер, стадия '{self.name}': ошибка обработки лопатки: {e}", exc_info=True)
+            job = None
+        elapsed = time.perf_counter() - start
+        self.busy_time += elapsed
+        self.processed += 1
+        if job is None:
+            return
+        job.timings[self.name] = elapsed
+        if self.next_stage is not None:
+            wait_start = time.perf_counter()
+            self.next_stage.put(job)
+            self.blocked_time += time.perf_counter() - wait_start
+        elif self.on_done is not None:
+            self.on_done(job)
+
+    def metrics(self) -> dict:
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "avg_time": self.busy_time / self.processed if self.processed else 0.0,
+            "busy_time": self.busy_time,
+            "blocked_time": self.blocked_time,
+            "max_depth": self.max_depth,
+            "queued": self.queue.qsize(),
+        }
+
+
+class ScanPipeline:
+    """
+    Конвейер обработки лопаток из последовательных стадий (например, запись -> признаки -> предсказание -> запись в БД).
+    Поток сканирования только кладёт лопатку в первую стадию и сразу возвращается к событиям установки,
+    поэтому движение к следующей лопатке идёт параллельно с анализом и сохранением предыдущей.
+    """
+
+    def __init__(self, stages: list[tuple[str, Callable[[BladeJob], Optional[BladeJob]]]], maxsize: int = 4,
+                 on_done: Optional[Callable[[BladeJob], None]] = None):
+        self.stages = [PipelineStage(name, func, maxsize) for name, func in stages]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        self.stages[-1].on_done = on_done
+        self.submitted = 0
+        self.submit_blocked_time = 0.0
+        self.closed = False
+
+    def start(self):
+        for stage in self.stages:
+            stage.thread.start()
+
+    def submit(self, job: BladeJob):
+        """Передаёт лопатку в первую стадию; блокируется, если конвейер не успевает"""
+        wait_start = time.perf_counter()
+        self.stages[0].put(job)
+        self.submit_blocked_time += time.perf_counter() - wait_start
+        self.submitted += 1
+
+    def wait_idle(self):
+        """Дожидается обработки всех переданных лопаток, не останавливая потоки стадий (между дисками серии)"""
+        for stage in self.stages:
+            stage.queue.join()
+
+    def drain(self, timeout: Optional[float] = None):
+        """Дожидается обработки всех переданных лопаток и останавливает потоки стадий"""
+        if self.closed:
+            return
+        self.closed = True
+        self.stages[0].put(_STOP)
+        for stage in self.stages:
+            stage.thread.join(timeout)
+        logger.info(f"Конвейер сканирования остановлен: {self.submitted} лопаток, метрики {self.metrics()}")
+
+    def metrics(self) -> dict:
+        metrics = {stage.name: stage.metrics() for stage in self.stages}
+        metrics["submit_blocked_time"] = self.submit_blocked_time
+        return metrics
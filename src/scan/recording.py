@@ -1,15 +1,11 @@
 import io
 import logging
 import os
-import shutil
+import time
 
 import sounddevice as sd
 import soundfile as sf
 import numpy as np
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
-import scipy.signal as sg
 
 logger = logging.getLogger(__name__)
 
@@ -191,3 +187,70 @@ class MicrophoneManagerSingleton:
             if preferred_name in dev['name'] and dev['max_input_channels'] >= min_input_channels:
                 return i
         return None
+
+
+class DeviceMicrophone:
+    """
+    Микрофон одной установки станции: свой аудиоинтерфейс и входной канал (DeviceConfig.audio_device/audio_channel).
+    В отличие от MicrophoneManagerSingleton не меняет устройство по умолчанию и не использует sd.rec/sd.wait
+    (они работают с одним глобальным потоком и прерывают друг друга), а открывает свой поток записи,
+    поэтому несколько установок записывают лопатки одновременно.
+    Интерфейс совпадает с MicrophoneManagerSingleton.stripped_record.
+    """
+
+    def __init__(self, device_name: str, channel: int = 0, sample_rate: int = 192000):
+        self.device_name = device_name
+        self.channel = channel
+        self.sample_rate = sample_rate
+        self.device = MicrophoneManagerSingleton._get_device_index(device_name, min_input_channels=channel + 1)
+        if self.device is None:
+            logger.warning(f"Устройство '{device_name}' с каналом {channel} не найдено. "
+                           "Используется системное устройство по умолчанию.")
+        else:
+            logger.info(f"Микрофон установки: {sd.query_devices(self.device)['name']}, канал {channel}")
+
+    def stripped_record(self, duration: float, channel_idx: int = None, subtype: str = "PCM_24") -> bytes:
+        channel = self.channel if channel_idx is None else channel_idx
+        frames = int(duration / 1000 * self.sample_rate)
+        with sd.InputStream(device=self.device, samplerate=self.sample_rate, channels=channel + 1,
+                            dtype='float32') as stream:
+            audio_data, overflowed = stream.read(frames)
+        if overflowed:
+            logger.warning(f"Переполнение буфера записи ('{self.device_name}', канал {channel})")
+        trimmed_audio = MicrophoneManagerSingleton._trim_keep_peaks(audio_data[:, channel], self.sample_rate,
+                                                                    post_margin_s=0.3, threshold_ratio=0.1)
+        output_io = io.BytesIO()
+        sf.write(output_io, trimmed_audio, self.sample_rate, format='WAV', subtype=subtype)
+        return output_io.getvalue()
+
+
+class FileMicrophone:
+    """
+    Микрофон, отдающий заранее записанные WAV-файлы вместо записи с аудиоинтерфейса
+    (для прогонов сканирования с виртуальной установкой). Файлы берутся по кругу.
+    Интерфейс совпадает с MicrophoneManagerSingleton.stripped_record.
+    """
+
+    def __init__(self, paths, realtime: bool = True):
+        """
+        :param paths: список WAV-файлов или каталог с ними
+        :param realtime: ждать длительность записи, как настоящий микрофон
+        """
+        if isinstance(paths, str) and os.path.isdir(paths):
+            paths = sorted(os.path.join(paths, name) for name in os.listdir(paths) if name.lower().endswith(".wav"))
+        if not paths:
+            raise ValueError("FileMicrophone: не найдено ни одного WAV-файла")
+        self.recordings = []
+        for path in paths:
+            with open(path, "rb") as f:
+                self.recordings.append(f.read())
+        self.realtime = realtime
+        self.index = 0
+        logger.info(f"FileMicrophone: загружено {len(self.recordings)} записей")
+
+    def stripped_record(self, duration: float, channel_idx: int = 0, subtype: str = "PCM_24") -> bytes:
+        if self.realtime:
+            time.sleep(duration / 1000)
+        wav_data = self.recordings[self.index % len(self.recordings)]
+        self.index += 1
+        return wav_data
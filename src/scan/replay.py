@@ -0,0 +1,281 @@
+import argparse
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from PyQt5.QtCore import QObject, QThread, Qt, pyqtSignal, pyqtSlot
+
+logger = logging.getLogger(__name__)
+
+EVENTS_FILE = "events.jsonl"
+
+
+class ScanRecorder:
+    """
+    Запись сканирования для последующего воспроизведения (каталог на одно сканирование):
+    events.jsonl — по строке на событие с временем от начала записи "t" (с) и типом:
+      meta — параметры запуска; rx — строка, пришедшая от установки; tx — команда приложения и подтверждена ли она;
+      conn — подключение/отключение платы; audio — запись лопатки (файл audio_NNNN.wav рядом).
+    События приходят из разных потоков (ArduinoWorker, сканирование, стадия записи), поэтому запись под блокировкой.
+    """
+
+    def __init__(self, directory: str, meta: dict = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.file = open(os.path.join(directory, EVENTS_FILE), "w", encoding="utf-8")
+        self.started = time.monotonic()
+        self.audio_count = 0
+        self.write({"type": "meta", "started_at": datetime.now().isoformat(), **(meta or {})})
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def write(self, event: dict, t: float = None):
+        event = {"t": round(self.elapsed() if t is None else t, 6), **event}
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            self.file.flush()
+
+    def audio(self, wav_data: bytes, duration):
+        with self.lock:
+            self.audio_count += 1
+            name = f"audio_{self.audio_count:04d}.wav"
+        with open(os.path.join(self.directory, name), "wb") as f:
+            f.write(wav_data or b"")
+        self.write({"type": "audio", "file": name, "duration": duration})
+
+    def wrap_worker(self, worker) -> "RecordingArduinoWorker":
+        return RecordingArduinoWorker(worker, self)
+
+    def wrap_microphone(self, microphone=None) -> "RecordingMicrophone":
+        return RecordingMicrophone(microphone, self)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        logger.info(f"Запись сканирования сохранена в {self.directory}")
+
+
+class RecordingArduinoWorker(QObject):
+    """
+    Прослойка между ArduinoWorker и Scanning с тем же интерфейсом (сигналы data_received/connection_established,
+    send_command, apply_config), записывающая весь обмен с установкой.
+    Сигналы платы пишутся в потоке ArduinoWorker (DirectConnection) — с временем прихода строки, а не обработки.
+    """
+    data_received = pyqtSignal(str)
+    connection_established = pyqtSignal(bool)
+
+    def __init__(self, worker, recorder: ScanRecorder):
+        super().__init__()
+        self.worker = worker
+        self.recorder = recorder
+        worker.data_received.connect(self.on_data_received, Qt.DirectConnection)
+        worker.connection_established.connect(self.on_connection_established, Qt.DirectConnection)
+
+    @pyqtSlot(str)
+    def on_data_received(self, line):
+        self.recorder.write({"type": "rx", "line": line})
+        self.data_received.emit(line)
+
+    @pyqtSlot(bool)
+    def on_connection_established(self, connected):
+        self.recorder.write({"type": "conn", "connected": connected})
+        self.connection_established.emit(connected)
+
+    def send_command(self, command, retries=3, timeout=5):
+        #время — момент отправки: ответы установки, пришедшие во время ожидания эха, идут после команды
+        sent_at = self.recorder.elapsed()
+        ok = self.worker.send_command(command, retries, timeout)
+        self.recorder.write({"type": "tx", "command": command, "ok": ok}, t=sent_at)
+        return ok
+
+    def apply_config(self, config):
+        sent_at = self.recorder.elapsed()
+        ok = self.worker.apply_config(config)
+        self.recorder.write({"type": "tx", "command": {"command": "apply_config", "config": config}, "ok": ok},
+                            t=sent_at)
+        return ok
+
+    def close(self):
+        self.worker.data_received.disconnect(self.on_data_received)
+        self.worker.connection_established.disconnect(self.on_connection_established)
+
+
+class RecordingMicrophone:
+    """Микрофон-обёртка: сохраняет каждую запись лопатки в каталог записи сканирования"""
+
+    def __init__(self, microphone, recorder: ScanRecorder):
+        self.microphone = microphone  # None — MicrophoneManagerSingleton, как в Scanning
+        self.recorder = recorder
+
+    def stripped_record(self, duration: float, channel_idx: int = 0, subtype: str = "PCM_24") -> bytes:
+        microphone = self.microphone
+        if microphone is None:
+            from src.scan.recording import MicrophoneManagerSingleton
+            microphone = MicrophoneManagerSingleton()
+        wav_data = microphone.stripped_record(duration, channel_idx=channel_idx, subtype=subtype)
+        self.recorder.audio(wav_data, duration)
+        return wav_data
+
+
+def load_events(directory: str) -> list[dict]:
+    with open(os.path.join(directory, EVENTS_FILE), encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    #tx пишется после подтверждения с временем отправки, поэтому порядок в файле восстанавливается по t
+    return sorted(events, key=lambda event: event["t"])
+
+
+class ReplayArduinoWorker(QThread):
+    """
+    Воспроизведение записанного обмена с установкой вместо ArduinoWorker.
+    Строки установки привязаны к предшествующей им команде приложения: когда Scanning отправляет
+    очередную команду, строки, пришедшие в записи после неё, выдаются с теми же задержками относительно
+    отправки (делёнными на speed; speed=0 — без задержек). Так причинность сохраняется при любой скорости,
+    а порядок строк всегда совпадает с записью. Команда, отличающаяся от записанной, считается расхождением.
+    """
+    data_received = pyqtSignal(str)
+    connection_established = pyqtSignal(bool)
+    replay_finished = pyqtSignal()
+
+    def __init__(self, directory: str, speed: float = 1.0):
+        super().__init__()
+        self.speed = speed
+        self.meta = {}
+        self.prefix = []  # строки до первой команды: (время от начала, событие)
+        self.segments = []  # команда, ответ и строки после неё: (задержка от команды, событие)
+        for event in load_events(directory):
+            if event["type"] == "meta":
+                self.meta = event
+            elif event["type"] == "tx":
+                self.segments.append({"t": event["t"], "command": event["command"], "ok": event["ok"], "lines": []})
+            elif event["type"] in ("rx", "conn"):
+                if self.segments:
+                    self.segments[-1]["lines"].append((event["t"] - self.segments[-1]["t"], event))
+                else:
+                    self.prefix.append((event["t"], event))
+        self.next_segment = 0
+        self.divergences = 0
+        self.pending = collections.deque()  # (время выдачи, событие) в порядке записи
+        self.last_due = 0.0
+        self.condition = threading.Condition()
+        self.is_running = True
+
+    def _schedule(self, lines, base):
+        for offset, event in lines:
+            due = base + (offset / self.speed if self.speed > 0 else 0.0)
+            self.last_due = max(self.last_due, due)  # строки не обгоняют друг друга
+            self.pending.append((self.last_due, event))
+        self.condition.notify()
+
+    def run(self):
+        self.connection_established.emit(True)
+        with self.condition:
+            self._schedule(self.prefix, time.monotonic())
+        while self.is_running:
+            with self.condition:
+                if not self.pending:
+                    if self.next_segment >= len(self.segments):
+                        break
+                    self.condition.wait(0.1)
+                    continue
+                due, event = self.pending[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                self.pending.popleft()
+            if event["type"] == "rx":
+                self.data_received.emit(event["line"])
+            else:
+                self.connection_established.emit(event["connected"])
+        logger.info(f"Воспроизведение обмена завершено, расхождений команд: {self.divergences}")
+        self.replay_finished.emit()
+
+    def send_command(self, command, retries=3, timeout=5):
+        with self.condition:
+            if self.next_segment >= len(self.segments):
+                self.divergences += 1
+                logger.warning(f"Воспроизведение: команда {command} сверх записанных")
+                return False
+            segment = self.segments[self.next_segment]
+            self.next_segment += 1
+            if segment["command"] != command:
+                self.divergences += 1
+                logger.warning(f"Воспроизведение: расхождение, отправлено {command}, в записи {segment['command']}")
+            self._schedule(segment["lines"], time.monotonic())
+        return segment["ok"]
+
+    def apply_config(self, config):
+        return self.send_command({"command": "apply_config", "config": config})
+
+    def stop(self):
+        self.is_running = False
+        with self.condition:
+            self.condition.notify()
+
+
+class ReplayMicrophone:
+    """Записи лопаток из каталога записи сканирования в исходном порядке; speed — как у ReplayArduinoWorker"""
+
+    def __init__(self, directory: str, speed: float = 1.0):
+        self.directory = directory
+        self.speed = speed
+        self.files = [event["file"] for event in load_events(directory) if event["type"] == "audio"]
+        self.index = 0
+        self.lock = threading.Lock()
+
+    def stripped_record(self, duration: float, channel_idx: int = 0, subtype: str = "PCM_24") -> bytes:
+        if self.speed > 0:
+            time.sleep(duration / 1000 / self.speed)
+        with self.lock:
+            if self.index >= len(self.files):
+                logger.error("Воспроизведение: записи лопаток закончились")
+                return b""
+            name = self.files[self.index]
+            self.index += 1
+        with open(os.path.join(self.directory, name), "rb") as f:
+            return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанного сканирования без установки")
+    parser.add_argument("directory", help="каталог записи (SCAN_RECORD_DIR/<время>)")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение времени; 0 — без задержек")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="сколько ждать завершения сканирования после конца записи, с")
+    args = parser.parse_args()
+
+    from PyQt5.QtCore import QCoreApplication, QTimer
+    from src.scan.Scanning import Scanning
+
+    app = QCoreApplication([])
+    worker = ReplayArduinoWorker(args.directory, args.speed)
+    microphone = ReplayMicrophone(args.directory, args.speed)
+    #сканирование пишет в БД из DB_URL, поэтому воспроизведение стоит запускать на отдельной базе
+    scan = Scanning(worker.meta["disk_type_id"], worker, microphone=microphone, repeats=worker.meta.get("repeats", 1))
+    thread = QThread()
+    scan.moveToThread(thread)
+    thread.started.connect(scan.start_scan)
+    scan.scanning_finished.connect(app.quit)
+    worker.replay_finished.connect(lambda: QTimer.singleShot(int(args.timeout * 1000), app.quit))
+
+    started = time.perf_counter()
+    worker.start()
+    QTimer.singleShot(0, thread.start)  # после connection_established(True) от воспроизведения
+    app.exec_()
+    worker.stop()
+    thread.quit()
+    thread.wait()
+    print(f"Воспроизведение: {time.perf_counter() - started:.1f} с, команд {worker.next_segment} из "
+          f"{len(worker.segments)}, расхождений {worker.divergences}, лопаток {microphone.index}")
+
+
+if __name__ == "__main__":
+    main()
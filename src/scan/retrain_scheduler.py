@@ -0,0 +1,159 @@
+import logging
+import time
+
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+
+from src.config import settings
+from src.db import Session
+from src.models import DiskType
+from src.scan.ml_predict import count_new_labels, get_current_model_info, get_latest_model_time
+from src.scan.model_backends import MODEL_TYPE_KERAS
+from src.scan.model_training import TrainingWorker
+
+logger = logging.getLogger(__name__)
+
+
+class RetrainScheduler(QObject):
+    """
+    Фоновое дообучение по мере появления новой разметки.
+    Раз в AUTO_RETRAIN_INTERVAL секунд для каждого типа диска считается, сколько размеченных лопаток
+    появилось после самой свежей модели; при достижении AUTO_RETRAIN_THRESHOLD запускается TrainingWorker
+    (дообучение установленной keras-модели или полное обучение, если её нет).
+    Обучение стартует только в простое (is_busy() == False), а начало сканирования его отменяет.
+    Из типов дисков, набравших порог, выбирается тот, у которого больше всего новой разметки. Тип, обучение
+    которого завершилось ошибкой (например, в разметке один класс), откладывается с экспоненциально
+    растущей паузой, чтобы не загораживать остальные типы.
+    Результат сохраняется кандидатом (is_current=False) — установить его оператор решает сам,
+    например после проверки в теневом режиме.
+    Сигналы:
+        candidate_registered(dict) — итог TrainingWorker с добавленным disk_type_name.
+    """
+    candidate_registered = pyqtSignal(object)
+
+    def __init__(self, is_busy, parent=None):
+        """
+        :param is_busy: функция без аргументов, True — идёт сканирование или ручное обучение
+        """
+        super().__init__(parent)
+        self.is_busy = is_busy
+        self.training_thread = None
+        self.training_worker = None
+        self.training_disk_type = None
+        self.failures = {}  # имя типа диска -> (число ошибок подряд, time.monotonic() следующей попытки)
+        self.timer = QTimer(self)
+        self.timer.setInterval(settings.AUTO_RETRAIN_INTERVAL * 1000)
+        self.timer.timeout.connect(self.check)
+
+    def start(self):
+        logger.info(f"Планировщик дообучения запущен: порог {settings.AUTO_RETRAIN_THRESHOLD} лопаток, "
+                    f"проверка раз в {settings.AUTO_RETRAIN_INTERVAL} с")
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.cancel_training()
+
+    def shutdown(self):
+        """
+        Закрытие приложения: обучение отменяется, и поток ждётся до конца (уничтожение работающего QThread
+        аварийно завершает процесс, а в режиме подбора отмена ещё и останавливает процессы пула).
+        quit() вызывается напрямую: слот quit, подключённый к сигналам обучения, не выполнится, пока GUI-поток ждёт.
+        """
+        self.stop()
+        if self.training_thread is not None:
+            self.training_thread.quit()
+            self.training_thread.wait()
+
+    def is_training(self):
+        return self.training_thread is not None
+
+    def cancel_training(self):
+        if self.training_worker is not None:
+            logger.info(f"Автоматическое обучение для '{self.training_disk_type}' отменено")
+            self.training_worker.cancel()
+
+    @pyqtSlot()
+    def on_scan_started(self):
+        """Сканированию нужны процессор и БД — фоновое обучение прерывается, повтор на следующей проверке"""
+        self.cancel_training()
+
+    @pyqtSlot()
+    def check(self):
+        if self.is_training() or self.is_busy():
+            return
+        try:
+            disk_type = self.find_due_disk_type()
+        except Exception as e:
+            logger.error(f"Ошибка проверки новой разметки: {e}", exc_info=True)
+            return
+        if disk_type is not None:
+            self.start_training(*disk_type)
+
+    def find_due_disk_type(self):
+        """
+        Возвращает (name, mode) типа диска с наибольшим числом новой разметки сверх порога или None.
+        Типы, отложенные после ошибки обучения, пропускаются до конца паузы.
+        """
+        session = Session()
+        try:
+            disk_types = session.query(DiskType.id, DiskType.name).all()
+        finally:
+            session.close()
+
+        now = time.monotonic()
+        due = []
+        for disk_type_id, name in disk_types:
+            if name in self.failures and now < self.failures[name][1]:
+                continue
+            new_labels = count_new_labels(disk_type_id, since=get_latest_model_time(disk_type_id))
+            if new_labels >= settings.AUTO_RETRAIN_THRESHOLD:
+                due.append((new_labels, disk_type_id, name))
+        if not due:
+            return None
+
+        new_labels, disk_type_id, name = max(due)
+        current = get_current_model_info(disk_type_id)
+        if current is not None and (current.model_type or MODEL_TYPE_KERAS) == MODEL_TYPE_KERAS:
+            mode = TrainingWorker.MODE_INCREMENTAL
+        else:
+            mode = TrainingWorker.MODE_FULL
+        logger.info(f"Тип диска '{name}': {new_labels} новых размеченных лопаток, запуск обучения ({mode})")
+        return name, mode
+
+    def start_training(self, disk_type_name, mode):
+        self.training_disk_type = disk_type_name
+        self.training_worker = TrainingWorker(disk_type_name, mode=mode)
+        self.training_thread = QThread()
+        self.training_worker.moveToThread(self.training_thread)
+        self.training_thread.started.connect(self.training_worker.run)
+        self.training_worker.finished.connect(self.on_training_finished)
+        self.training_worker.failed.connect(self.on_training_failed)
+        for signal in (self.training_worker.finished, self.training_worker.failed, self.training_worker.cancelled):
+            signal.connect(self.training_thread.quit)
+        self.training_thread.finished.connect(self.on_training_thread_finished)
+        self.training_thread.start()
+
+    @pyqtSlot(object)
+    def on_training_finished(self, result):
+        history = result.get("history") or {}
+        metrics = {key: values[-1] for key, values in history.items() if values}
+        logger.info(f"Автоматически обучена модель-кандидат ID {result['model_id']} для '{self.training_disk_type}' "
+                    f"на {result['train_samples']} лопатках за {result['train_duration']:.1f} с: {metrics}")
+        self.failures.pop(self.training_disk_type, None)
+        self.candidate_registered.emit(dict(result, disk_type_name=self.training_disk_type))
+
+    @pyqtSlot(str)
+    def on_training_failed(self, message):
+        count = self.failures.get(self.training_disk_type, (0, 0.0))[0] + 1
+        #пауза: 1, 2, 4, ... интервала проверки, не дольше суток
+        delay = min(settings.AUTO_RETRAIN_INTERVAL * 2 ** (count - 1), 24 * 3600)
+        self.failures[self.training_disk_type] = (count, time.monotonic() + delay)
+        logger.warning(f"Автоматическое обучение для '{self.training_disk_type}' не выполнено: {message}; "
+                       f"следующая попытка не раньше чем через {delay} с")
+
+    def on_training_thread_finished(self):
+        self.training_thread.deleteLater()
+        self.training_worker.deleteLater()
+        self.training_thread = None
+        self.training_worker = None
+        self.training_disk_type = None
@@ -0,0 +1,73 @@
+import logging
+from typing import Optional
+
+from sqlalchemy import update
+
+from src.db import Session
+from src.models import Blade, DiskScan, ScanSession
+
+logger = logging.getLogger(__name__)
+
+RESUMABLE_STATUSES = ("running", "interrupted")  # running без активного сканирования — приложение упало
+
+
+def create_session(disk_scan_id: int):
+    with Session() as session:
+        session.add(ScanSession(disk_scan_id=disk_scan_id, status="running", last_blade_num=0))
+        session.commit()
+
+
+def set_status(disk_scan_id: int, status: str):
+    try:
+        with Session() as session:
+            session.execute(update(ScanSession).where(ScanSession.disk_scan_id == disk_scan_id).values(status=status))
+            session.commit()
+    except Exception as e:
+        logger.error(f"Не удалось сохранить статус '{status}' сканирования {disk_scan_id}: {e}")
+
+
+def progress_update(disk_scan_id: int, blade_num: int, base_position: Optional[int]):
+    """
+    UPDATE последней сохранённой лопатки сессии и положения базы на ней. Выполняется BladeWriter в транзакции
+    вставки пачки лопаток, поэтому прогресс не отстаёт от таблицы blade и не добавляет запросов на пути сканирования.
+    """
+    return update(ScanSession) \
+        .where(ScanSession.disk_scan_id == disk_scan_id, ScanSession.last_blade_num < blade_num) \
+        .values(last_blade_num=blade_num, base_position=base_position)
+
+
+def find_resumable(disk_type_id: int, exclude=()) -> Optional[dict]:
+    """
+    Последнее незавершённое сканирование типа диска, которое можно продолжить, или None.
+    Лопатки в БД сверяются с сессией (прогресс пишется вместе с лопатками, но сверка страхует, например,
+    сессии, созданные до этого): продолжение идёт от последней лопатки в БД, чтобы она не была записана повторно.
+    Сканирование без известного положения базы продолжить нельзя (кроме случая, когда лопаток ещё нет).
+    exclude — id сканирований, которые сейчас идут на других установках станции (их статус тоже running).
+    """
+    with Session() as session:
+        scan_session = session.query(ScanSession) \
+            .join(DiskScan, DiskScan.id == ScanSession.disk_scan_id) \
+            .filter(DiskScan.disk_type_id == disk_type_id, ScanSession.status.in_(RESUMABLE_STATUSES),
+                    ScanSession.disk_scan_id.notin_(exclude)) \
+            .order_by(ScanSession.updated_at.desc()) \
+            .first()
+        if scan_session is None:
+            return None
+        resume = {
+            "disk_scan_id": scan_session.disk_scan_id,
+            "last_blade_num": scan_session.last_blade_num,
+            "base_position": scan_session.base_position,
+            "updated_at": scan_session.updated_at,
+        }
+        last_blade = session.query(Blade.num, Blade.base_position) \
+            .filter(Blade.disk_scan_id == scan_session.disk_scan_id) \
+            .order_by(Blade.num.desc()) \
+            .first()
+    if last_blade is not None and last_blade.num > resume["last_blade_num"]:
+        resume["last_blade_num"] = last_blade.num
+        resume["base_position"] = last_blade.base_position
+    if resume["last_blade_num"] > 0 and resume["base_position"] is None:
+        logger.warning(f"Сканирование {resume['disk_scan_id']}: положение базы неизвестно, продолжение невозможно")
+        set_status(resume["disk_scan_id"], "abandoned")
+        return None
+    return resume
@@ -0,0 +1,94 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DiskThroughput:
+    """Итог одного диска серии"""
+    disk_scan_id: int
+    index: int  # порядковый номер диска в серии, с 1
+    blades: int
+    duration: float  # от старта диска до возврата базы, с
+
+    @property
+    def blades_per_hour(self) -> float:
+        return self.blades / self.duration * 3600 if self.duration > 0 else 0.0
+
+
+class SeriesScheduler:
+    """
+    План серии дисков одного типа для одного экземпляра Scanning.
+    Между дисками поток сканирования, загруженная модель и конвейер сохраняются, а конфигурация
+    следующего диска (тип диска и DeviceConfig) читается из БД в фоне, пока сканируется текущий.
+    Заодно считается производительность: по каждому диску и по серии в целом, включая паузы между дисками.
+    """
+
+    def __init__(self, repeats: Optional[int] = 1):
+        self.repeats = repeats  # None — бесконечная серия (до остановки оператором)
+        self.stopped = False
+        self.started_at = None
+        self.disk_started_at = None
+        self.disks: list[DiskThroughput] = []
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="series-prefetch")
+        self.prefetched = None  # Future с конфигурацией следующего диска
+
+    def stop(self):
+        """Текущий диск дорабатывается, следующие не запускаются"""
+        self.stopped = True
+
+    def has_next(self) -> bool:
+        return not self.stopped and (self.repeats is None or len(self.disks) < self.repeats)
+
+    def start_disk(self, loader: Callable[[], Optional[dict]]):
+        """Отмечает старт диска и, если после него будет ещё один, запускает предзагрузку его конфигурации"""
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now
+        self.disk_started_at = now
+        if self.repeats is None or len(self.disks) + 1 < self.repeats:
+            self.prefetched = self.executor.submit(loader)
+
+    def next_config(self, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """Конфигурация очередного диска: предзагруженная, а если её нет или загрузка упала — прочитанная сейчас"""
+        future, self.prefetched = self.prefetched, None
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                logger.error(f"Ошибка предзагрузки конфигурации следующего диска: {e}", exc_info=True)
+        return loader()
+
+    def finish_disk(self, disk_scan_id: int, blades: int) -> DiskThroughput:
+        result = DiskThroughput(disk_scan_id=disk_scan_id, index=len(self.disks) + 1, blades=blades,
+                                duration=time.monotonic() - self.disk_started_at)
+        self.disks.append(result)
+        return result
+
+    def summary(self) -> dict:
+        duration = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+        blades = sum(disk.blades for disk in self.disks)
+        return {
+            "disks": len(self.disks),
+            "blades": blades,
+            "duration": duration,
+            "disks_per_hour": len(self.disks) / duration * 3600 if duration > 0 else 0.0,
+            "blades_per_hour": blades / duration * 3600 if duration > 0 else 0.0,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def format_disk(result: DiskThroughput) -> str:
+    return (f"диск {result.index} (сканирование {result.disk_scan_id}): {result.blades} лопаток "
+            f"за {result.duration:.0f} с, {result.blades_per_hour:.0f} лопаток/ч")
+
+
+def format_series(summary: dict) -> str:
+    return (f"серия: {summary['disks']} дисков, {summary['blades']} лопаток за {summary['duration']:.0f} с, "
+            f"{summary['disks_per_hour']:.1f} дисков/ч, {summary['blades_per_hour']:.0f} лопаток/ч")
@@ -0,0 +1,126 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+
+from src.db import Session
+from src.models import DiskTypeModel, ShadowPrediction
+from src.scan.ml_predict import load_model_by_id, FEATURE_VERSION
+from src.scan.model_backends import MODEL_TYPE_KERAS, wrap_inference_model
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowScorer:
+    """
+    Теневая оценка лопаток моделями-кандидатами (is_current == False).
+    Вектор признаков считается один раз в Scanning, все keras-кандидаты оцениваются
+    одним скомпилированным вызовом (классические модели — напрямую, это дешевле),
+    а запись результатов в shadow_prediction выполняется в отдельном потоке,
+    поэтому время цикла сканирования не меняется.
+    """
+
+    def __init__(self, disk_type_id, max_candidates=3):
+        self.disk_type_id = disk_type_id
+        self.max_candidates = max_candidates
+        self.model_ids = []
+        self.models = []
+        self.classical_model_ids = []
+        self.classical_models = []
+        self.infer = None
+        self.executor = None
+
+    def load(self):
+        """
+        Загружает до max_candidates последних моделей-кандидатов для типа диска.
+        Возвращает True, если есть хотя бы один кандидат.
+        """
+        session = Session()
+        try:
+            candidates = session.query(DiskTypeModel.id, DiskTypeModel.feature_version, DiskTypeModel.model_type) \
+                .filter(DiskTypeModel.disk_type_id == self.disk_type_id, DiskTypeModel.is_current == False) \
+                .order_by(DiskTypeModel.created_at.desc(), DiskTypeModel.id.desc()) \
+                .limit(self.max_candidates) \
+                .all()
+        finally:
+            session.close()
+
+        input_dim = None
+        for candidate in candidates:
+            if candidate.feature_version not in (None, FEATURE_VERSION):
+                logger.warning(f"Теневой режим: модель ID {candidate.id} обучена на признаках "
+                               f"{candidate.feature_version}, пропускаем")
+                continue
+            model = load_model_by_id(candidate.id)
+            if model is None:
+                continue
+            model_type = candidate.model_type or MODEL_TYPE_KERAS
+            if model_type != MODEL_TYPE_KERAS:
+                self.classical_model_ids.append(candidate.id)
+                self.classical_models.append(wrap_inference_model(model_type, model))
+                continue
+            if input_dim is None:
+                input_dim = model.input_shape[-1]
+            elif model.input_shape[-1] != input_dim:
+                logger.warning(f"Теневой режим: у модели ID {candidate.id} другая размерность входа, пропускаем")
+                continue
+            self.model_ids.append(candidate.id)
+            self.models.append(model)
+
+        if not self.models and not self.classical_models:
+            logger.info(f"Теневой режим: для disk_type_id {self.disk_type_id} нет моделей-кандидатов")
+            return False
+
+        if self.models:
+            models = self.models
+            # все keras-кандидаты считаются одним графом: выходы складываются в один тензор (batch, n_candidates)
+            self.infer = tf.function(
+                lambda x: tf.concat([model(x, training=False) for model in models], axis=1),
+                input_signature=[tf.TensorSpec(shape=(None, input_dim), dtype=tf.float32)],
+            )
+            self.infer(np.zeros((1, input_dim), dtype=np.float32))  # прогрев
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow_scorer")
+        logger.info(f"Теневой режим: загружены модели-кандидаты {self.model_ids + self.classical_model_ids}")
+        return True
+
+    def submit(self, disk_scan_id, blade_num, features):
+        """Ставит лопатку в очередь на теневую оценку, не блокируя вызывающий поток"""
+        if self.executor is None:
+            return
+        self.executor.submit(self._score, disk_scan_id, blade_num, list(features))
+
+    def _score(self, disk_scan_id, blade_num, features):
+        try:
+            start = time.perf_counter()
+            scores = []
+            if self.infer is not None:
+                scores.extend(np.asarray(self.infer(np.array([features], dtype=np.float32)))[0])
+            scores.extend(model.predict(features) for model in self.classical_models)
+            model_ids = self.model_ids + self.classical_model_ids
+            session = Session()
+            try:
+                session.add_all([
+                    ShadowPrediction(
+                        disk_scan_id=disk_scan_id,
+                        blade_num=blade_num,
+                        model_id=model_id,
+                        score=float(score),
+                        prediction=bool(score > 0.5)
+                    )
+                    for model_id, score in zip(model_ids, scores)
+                ])
+                session.commit()
+            finally:
+                session.close()
+            logger.info(f"Теневой режим: лопатка {blade_num} оценена {len(model_ids)} кандидатами "
+                        f"за {(time.perf_counter() - start) * 1000:.2f} мс")
+        except Exception as e:
+            logger.error(f"Ошибка теневой оценки лопатки {blade_num}: {e}", exc_info=True)
+
+    def close(self):
+        """Завершает поток записи; уже поставленные в очередь лопатки будут дооценены"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
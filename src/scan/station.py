@@ -0,0 +1,166 @@
+import logging
+from functools import partial
+from typing import Optional
+
+from PyQt5.QtCore import QMetaObject, QObject, QThread, Qt, pyqtSignal
+
+from src.arduino.arduino_controller import ArduinoController
+from src.db import Session
+from src.models import DeviceConfig
+from src.scan.model_backends import InferenceModelCache
+from src.scan.recording import DeviceMicrophone
+
+logger = logging.getLogger(__name__)
+
+
+class Rig:
+    """Установка станции: строка DeviceConfig, плата, микрофон и текущая серия сканирования"""
+
+    def __init__(self, config_id, name, port, worker, microphone):
+        self.config_id = config_id  # None — единственная установка без строки настроек (берётся первая строка)
+        self.name = name
+        self.port = port
+        self.worker = worker
+        self.microphone = microphone  # None — MicrophoneManagerSingleton
+        self.connected = False
+        self.scan = None  # Scanning текущей серии
+        self.thread = None
+        self.disk_type_id = None
+        self.last_summary = None  # SeriesScheduler.summary() последней завершённой серии
+
+    @property
+    def busy(self) -> bool:
+        return self.scan is not None
+
+
+class Station(QObject):
+    """
+    Несколько установок на одном ПК. У каждой установки своя строка DeviceConfig (порт, аудиоинтерфейс и канал,
+    настройки моторов), свой ArduinoWorker, свой микрофон и свой Scanning в отдельном потоке.
+    Кэш моделей и писатель лопаток общие для всех установок.
+    """
+    rig_changed = pyqtSignal(object)  # Rig: подключение платы, очередной диск, начало и конец серии
+    scan_started = pyqtSignal(object)  # Rig, на которой запущена серия (вкладка, обзор станции или консоль)
+
+    def __init__(self, blade_writer, model_cache: InferenceModelCache = None):
+        super().__init__()
+        self.blade_writer = blade_writer
+        self.model_cache = model_cache if model_cache is not None else InferenceModelCache()
+        self.rigs: list[Rig] = []
+
+    def load(self, names=None, first_only=False):
+        """
+        Установки станции — строки DeviceConfig в порядке id; первая — основная (вкладка «Новое измерение»).
+        names — загрузить только установки с этими именами или id, first_only — только первую
+        (в обоих случаях платы остальных установок не открываются).
+        """
+        with Session() as session:
+            configs = [(config.id, config.name, config.audio_device, config.audio_channel)
+                       for config in session.query(DeviceConfig).order_by(DeviceConfig.id)]
+        if not configs:
+            configs = [(None, None, None, None)]  # ArduinoController создаст строку настроек по умолчанию
+        for index, (config_id, name, audio_device, audio_channel) in enumerate(configs):
+            name = name or f"Установка {index + 1}"
+            if names is not None and name not in names and str(config_id) not in names:
+                continue
+            if first_only and self.rigs:
+                break
+            controller = ArduinoController(config_id, auto_connect=len(configs) == 1)
+            microphone = DeviceMicrophone(audio_device, audio_channel or 0) if audio_device else None
+            if microphone is None and len(configs) > 1:
+                logger.warning(f"У установки {config_id} не задан аудиоинтерфейс (DeviceConfig.audio_device), "
+                               "запись идёт с устройства по умолчанию")
+            rig = Rig(config_id, name, controller.port_name,
+                      controller.create_worker(), microphone)
+            self.rigs.append(rig)
+        logger.info(f"Станция: {len(self.rigs)} установок")
+
+    def start(self, rigs=None):
+        """Запускает потоки плат; rigs — только эти установки (консольный запуск одной установки)"""
+        for rig in rigs if rigs is not None else self.rigs:
+            rig.worker.connection_established.connect(partial(self.on_connection_established, rig))
+            rig.worker.start()
+
+    def find(self, name: str) -> Optional[Rig]:
+        """Установка по имени или по id строки DeviceConfig"""
+        for rig in self.rigs:
+            if rig.name == name or str(rig.config_id) == name:
+                return rig
+        return None
+
+    def on_connection_established(self, rig, connected):
+        rig.connected = connected
+        self.rig_changed.emit(rig)
+
+    def create_scan(self, rig: Rig, disk_type_id, repeats=1, resume=None, arduino_worker=None, microphone=None):
+        """
+        Scanning установки в своём потоке; запускается run(), чтобы вызывающий успел подключить свои обработчики.
+        arduino_worker и microphone заменяют плату и микрофон установки (например, обёртки записи сканирования).
+        None — на установке уже идёт серия.
+        """
+        if rig.busy:
+            logger.warning(f"{rig.name}: сканирование уже идёт")
+            return None
+        from src.scan.Scanning import Scanning  # тяжёлый импорт (TF, аудио) — только при первом сканировании
+
+        scan = Scanning(disk_type_id, arduino_worker if arduino_worker is not None else rig.worker,
+                        blade_writer=self.blade_writer,
+                        microphone=microphone if microphone is not None else rig.microphone,
+                        repeats=repeats, resume=resume, device_config_id=rig.config_id,
+                        model_cache=self.model_cache)
+        thread = QThread()
+        scan.moveToThread(thread)
+        thread.started.connect(scan.start_scan)
+        scan.disk_finished.connect(partial(self.on_disk_finished, rig))
+        scan.scanning_finished.connect(thread.quit)
+        scan.scanning_finished.connect(partial(self.on_scanning_finished, rig))
+        scan.scanning_finished.connect(thread.deleteLater)
+        rig.scan, rig.thread, rig.disk_type_id = scan, thread, disk_type_id
+        return scan
+
+    def run(self, rig: Rig):
+        rig.thread.start()
+        self.scan_started.emit(rig)
+        self.rig_changed.emit(rig)
+
+    def stop_scan(self, rig: Rig):
+        """Текущий диск установки дорабатывается, серия останавливается"""
+        if rig.scan is not None:
+            QMetaObject.invokeMethod(rig.scan, 'stop_scan', Qt.QueuedConnection)
+
+    def active_disk_scans(self) -> list[int]:
+        """id сканирований, идущих сейчас на установках станции"""
+        return [rig.scan.disk_scan_id for rig in self.rigs
+                if rig.scan is not None and rig.scan.disk_scan_id is not None]
+
+    def on_disk_finished(self, rig, result):
+        logger.info(f"{rig.name}: диск {result.index} отсканирован, {result.blades} лопаток")
+        self.rig_changed.emit(rig)
+
+    def on_scanning_finished(self, rig):
+        rig.last_summary = rig.scan.series.summary()
+        rig.scan = None
+        rig.thread = None
+        self.rig_changed.emit(rig)
+
+    def overview(self) -> list[dict]:
+        """Состояние и производительность каждой установки: текущая серия или последняя завершённая"""
+        rows = []
+        for rig in self.rigs:
+            summary = rig.scan.series.summary() if rig.scan is not None else rig.last_summary
+            rows.append({
+                "name": rig.name,
+                "port": rig.port,
+                "connected": rig.connected,
+                "scanning": rig.busy,
+                "disk_type_id": rig.disk_type_id,
+                "disks": summary["disks"] if summary else 0,
+                "blades": summary["blades"] if summary else 0,
+                "blades_per_hour": summary["blades_per_hour"] if summary else 0.0,
+            })
+        return rows
+
+    def close(self):
+        for rig in self.rigs:
+            self.stop_scan(rig)
+            rig.worker.stop()
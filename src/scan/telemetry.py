@@ -0,0 +1,95 @@
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import insert
+
+from src.db import Session
+from src.models import BladePhaseTiming
+
+logger = logging.getLogger(__name__)
+
+# фазы цикла лопатки в порядке их следования; совпадают с колонками BladePhaseTiming
+PHASES = (
+    "search",  # поиск лопатки базой
+    "pull",  # натягивание до давления blade_force
+    "ding_command",  # от достижения давления до подтверждения ding
+    "ding",  # медиатор отпускает лопатку
+    "next_blade",  # ожидание конца записи на установке и переход через лопатку
+    "capture_wait",  # задержка старта записи в конвейере
+    "capture",
+    "features",
+    "predict",
+    "persist",
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+class ScanTelemetry:
+    """
+    Длительности фаз каждой лопатки за сканирование (в мс).
+    Фазы установки добавляет поток сканирования, фазы конвейера — потоки стадий, поэтому доступ под блокировкой.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.blades = {}  # номер лопатки -> {фаза: мс}
+
+    def add(self, blade_num: int, phase: str, seconds: float):
+        with self.lock:
+            phases = self.blades.setdefault(blade_num, {})
+            phases[phase] = phases.get(phase, 0.0) + seconds * 1000
+
+    def summary(self) -> dict:
+        """Перцентили (p50/p90/p99) и максимум каждой фазы по лопаткам сканирования"""
+        with self.lock:
+            rows = list(self.blades.values())
+        return summarize([[row.get(phase) for phase in PHASES] for row in rows])
+
+    def save(self, disk_scan_id: int):
+        """Одна пакетная вставка строк BladePhaseTiming в конце сканирования"""
+        with self.lock:
+            #у всех строк одинаковый набор колонок — иначе пакетная вставка невозможна
+            rows = [dict({phase: phases.get(phase) for phase in PHASES}, disk_scan_id=disk_scan_id, blade_num=num)
+                    for num, phases in sorted(self.blades.items())]
+        if not rows:
+            return
+        try:
+            with Session() as session:
+                session.execute(insert(BladePhaseTiming), rows)
+                session.commit()
+        except Exception as e:
+            logger.error(f"Не удалось сохранить тайминги фаз сканирования {disk_scan_id}: {e}")
+
+
+def summarize(rows) -> dict:
+    """rows — список строк значений в порядке PHASES (None — фаза не измерена)"""
+    summary = {}
+    for index, phase in enumerate(PHASES):
+        values = np.array([row[index] for row in rows if row[index] is not None], dtype=np.float64)
+        if not len(values):
+            continue
+        summary[phase] = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+        summary[phase]["max"] = float(values.max())
+        summary[phase]["count"] = int(len(values))
+    return summary
+
+
+def load_scan_summary(disk_scan_id: int) -> dict:
+    """Перцентили фаз сохранённого сканирования (для анализа после работы установки)"""
+    with Session() as session:
+        rows = session.query(*[getattr(BladePhaseTiming, phase) for phase in PHASES]) \
+            .filter(BladePhaseTiming.disk_scan_id == disk_scan_id) \
+            .all()
+    return summarize(rows)
+
+
+def format_summary(summary: dict) -> str:
+    lines = []
+    for phase in PHASES:
+        if phase in summary:
+            stats = summary[phase]
+            lines.append(f"{phase}: p50 {stats['p50']:.0f} мс, p90 {stats['p90']:.0f} мс, "
+                         f"p99 {stats['p99']:.0f} мс, max {stats['max']:.0f} мс (n={stats['count']})")
+    return "\n".join(lines)
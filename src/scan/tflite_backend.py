@@ -0,0 +1,92 @@
+import base64
+import logging
+import time
+
+import numpy as np
+
+from src.db import Session
+from src.models import DiskTypeModel
+
+# модуль не импортирует keras/tensorflow на верхнем уровне: при наличии tflite_runtime
+# (или ai_edge_litert) сканирование с бэкендом TFLite обходится без загрузки полного TF
+
+logger = logging.getLogger(__name__)
+
+
+def _make_interpreter(model_bytes: bytes):
+    """
+    Создаёт интерпретатор TFLite из байтов flatbuffer'а.
+    Порядок поиска рантайма: tflite_runtime -> ai_edge_litert -> tensorflow.lite.
+    """
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            logger.info("Облегчённый рантайм TFLite не найден, используется tensorflow.lite")
+            from tensorflow.lite import Interpreter
+    return Interpreter(model_content=model_bytes)
+
+
+class TFLiteModel:
+    """
+    Обёртка над интерпретатором TFLite для предсказания по одной лопатке.
+    Учитывает квантование входа/выхода, если модель экспортирована с целочисленными тензорами.
+    """
+
+    def __init__(self, model_bytes: bytes):
+        self.interpreter = _make_interpreter(model_bytes)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.input_dim = int(self.input_details["shape"][-1])
+
+    def predict(self, features) -> float:
+        """Возвращает «сырое» значение выхода модели (вероятность класса "Годен")"""
+        input_data = np.array([features], dtype=np.float32)
+        input_scale, input_zero_point = self.input_details["quantization"]
+        if input_scale:
+            input_data = np.round(input_data / input_scale + input_zero_point)
+        self.interpreter.set_tensor(self.input_details["index"], input_data.astype(self.input_details["dtype"]))
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_details["index"]).astype(np.float32)
+        output_scale, output_zero_point = self.output_details["quantization"]
+        if output_scale:
+            output = (output - output_zero_point) * output_scale
+        return float(output[0][0])
+
+    def warm_up(self):
+        start = time.perf_counter()
+        self.predict(np.zeros(self.input_dim, dtype=np.float32))
+        logger.info(f"Прогрев TFLite-модели выполнен за {(time.perf_counter() - start) * 1000:.1f} мс")
+
+
+def load_tflite_model_from_db(disk_type_id):
+    """
+    Загружает TFLite-вариант установленной (is_current) модели для типа диска.
+    Возвращает TFLiteModel или None, если модели нет или она не была экспортирована в TFLite.
+    """
+    session = Session()
+    try:
+        model_row = session.query(DiskTypeModel.id, DiskTypeModel.tflite_model) \
+            .filter(DiskTypeModel.disk_type_id == disk_type_id, DiskTypeModel.is_current == True) \
+            .first()
+        if not model_row:
+            logger.warning(f"Нет установленной модели для disk_type_id={disk_type_id}")
+            return None
+        if not model_row.tflite_model:
+            logger.warning(f"Модель ID {model_row.id} не имеет TFLite-варианта")
+            return None
+
+        start = time.perf_counter()
+        model = TFLiteModel(base64.b64decode(model_row.tflite_model))
+        model.warm_up()
+        logger.info(f"TFLite-модель ID {model_row.id} загружена за {(time.perf_counter() - start) * 1000:.1f} мс")
+        return model
+
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке TFLite-модели из БД: {e}", exc_info=True)
+        return None
+    finally:
+        session.close()
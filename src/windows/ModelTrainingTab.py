@@ -1,3 +1,5 @@
+import datetime
+import json
 import logging
 
 import numpy as np
@@ -5,9 +7,10 @@ import io
 from functools import partial
 from xml.sax.handler import feature_external_ges
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSlot
 from PyQt5.QtWidgets import QListWidgetItem, QCheckBox, QWidget, QHBoxLayout, QTableWidgetItem, QHeaderView, QPushButton
-from PyQt5.QtWidgets import QTableWidgetItem, QTabBar, QTabWidget, QApplication, QMessageBox
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox
+from PyQt5.QtWidgets import QTableWidgetItem, QTabBar, QTabWidget, QApplication, QMessageBox, QProgressDialog
 
 from pydantic_core.core_schema import model_field
 from requests import session
@@ -17,6 +20,7 @@ from tensorflow.python.keras.utils.version_utils import training
 from src.db import Session
 from src.models import DiskType, DiskScan, Blade, DiskTypeModel
 from src.scan.ml_predict import extract_features, build_model, get_training_dataset, save_model_to_db
+from src.scan.model_training import TrainingWorker
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -43,11 +47,70 @@ class NonSwitchableTabWidget(QTabWidget):
     def keyPressEvent(self, event):
         pass
 
+class TrainingOptionsDialog(QDialog):
+    """Выбор режима обучения перед запуском"""
+    MODES = [
+        ("Полное обучение новой модели", TrainingWorker.MODE_FULL),
+        ("Дообучение текущей модели на новых данных", TrainingWorker.MODE_INCREMENTAL),
+        ("Подбор гиперпараметров (k-fold)", TrainingWorker.MODE_SEARCH),
+    ]
+    MODEL_KINDS = [
+        ("Нейросеть Keras (MLP)", TrainingWorker.KIND_KERAS),
+        ("Логистическая регрессия (scikit-learn)", TrainingWorker.KIND_SKLEARN_LOGREG),
+        ("Градиентный бустинг (scikit-learn)", TrainingWorker.KIND_SKLEARN_HGB),
+        ("Логистическая регрессия (NumPy)", TrainingWorker.KIND_NUMPY_LOGREG),
+    ]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Обучение модели")
+
+        layout = QVBoxLayout()
+        self.label = QLabel("Выберите режим обучения:")
+        self.combo_mode = QComboBox()
+        for title, mode in self.MODES:
+            self.combo_mode.addItem(title, mode)
+        self.label_kind = QLabel("Тип модели:")
+        self.combo_kind = QComboBox()
+        for title, kind in self.MODEL_KINDS:
+            self.combo_kind.addItem(title, kind)
+        self.combo_kind.currentIndexChanged.connect(self.on_kind_changed)
+        self.button_ok = QPushButton("Начать")
+        self.button_cancel = QPushButton("Отмена")
+
+        layout.addWidget(self.label)
+        layout.addWidget(self.combo_mode)
+        layout.addWidget(self.label_kind)
+        layout.addWidget(self.combo_kind)
+        layout.addWidget(self.button_ok)
+        layout.addWidget(self.button_cancel)
+
+        self.setLayout(layout)
+        self.button_cancel.clicked.connect(self.reject)
+        self.button_ok.clicked.connect(self.accept)
+
+    def on_kind_changed(self):
+        # классические модели обучаются только полностью
+        is_keras = self.get_model_kind() == TrainingWorker.KIND_KERAS
+        if not is_keras:
+            self.combo_mode.setCurrentIndex(0)
+        self.combo_mode.setEnabled(is_keras)
+
+    def get_mode(self):
+        return self.combo_mode.currentData()
+
+    def get_model_kind(self):
+        return self.combo_kind.currentData()
+
+
 class ModelTrainingTab(QWidget):
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
         self.signals_connected = False
+        self.training_thread = None
+        self.training_worker = None
+        self.training_dialog = None
 
     def _set_signal_state(self, connect: bool): #сделано для того чтобы в будущем было проще добавлять кнопки
         """
@@ -199,6 +262,11 @@ class ModelTrainingTab(QWidget):
             scan = session.query(DiskScan).get(scan_id)
             if scan:
                 scan.is_training = (state == Qt.Checked)
+                if scan.is_training:
+                    # лопатки измерения становятся новыми обучающими данными для планировщика дообучения
+                    session.query(Blade) \
+                        .filter(Blade.disk_scan_id == scan_id, Blade.prediction.isnot(None)) \
+                        .update({Blade.labeled_at: datetime.datetime.now(datetime.UTC)}, synchronize_session=False)
                 session.commit()
                 logger.info(f"Состояние is_training для измерения ID {scan_id} обновлено на {scan.is_training}")
         except Exception as e:
@@ -213,7 +281,23 @@ class ModelTrainingTab(QWidget):
         if selected_disk_type_id:
             session = Session()
             try:
-                disk_models = session.query(DiskTypeModel).filter_by(disk_type_id=selected_disk_type_id).order_by(DiskTypeModel.id.asc()).all()
+                # выбираем только метаданные, сам артефакт модели (base64) не загружаем
+                disk_models = session.query(
+                    DiskTypeModel.id,
+                    DiskTypeModel.is_current,
+                    DiskTypeModel.created_at,
+                    DiskTypeModel.feature_version,
+                    DiskTypeModel.input_dim,
+                    DiskTypeModel.train_samples,
+                    DiskTypeModel.history,
+                    DiskTypeModel.artifact_size,
+                    DiskTypeModel.train_duration,
+                    DiskTypeModel.tflite_size,
+                    DiskTypeModel.training_mode,
+                    DiskTypeModel.parent_model_id,
+                    DiskTypeModel.cv_metrics,
+                    DiskTypeModel.model_type,
+                ).filter_by(disk_type_id=selected_disk_type_id).order_by(DiskTypeModel.id.asc()).all()
                 logger.info(f"Загружено {len(disk_models)} измерений для типа диска ID {selected_disk_type_id}")
 
                 # Очищаем ListWidget
@@ -222,7 +306,7 @@ class ModelTrainingTab(QWidget):
                 # Заполняем ListWidget новыми измерениями и добавляем чекбоксы
                 for model in disk_models:
                     item = QListWidgetItem(self.main_window.mt_avaliable_models)
-                    item.setText(f"ID: {model.id} created_at:{model.created_at}")
+                    item.setText(self.format_model_description(model))
                     item.setData(Qt.UserRole, model.id)  # Сохраняем ID измерения
 
                     # Создаем виджет для чекбокса
@@ -256,6 +340,50 @@ class ModelTrainingTab(QWidget):
             finally:
                 session.close()
 
+    @staticmethod
+    def format_model_description(model):
+        """
+        Формирует строку описания модели для списка mt_avaliable_models по её метаданным.
+        """
+        text = f"ID: {model.id} created_at:{model.created_at}"
+        details = [f"тип: {model.model_type}"]
+        if model.training_mode == TrainingWorker.MODE_INCREMENTAL:
+            details.append(f"дообучена от ID {model.parent_model_id}")
+        if model.feature_version:
+            details.append(f"признаки: {model.feature_version}")
+        if model.input_dim:
+            details.append(f"вход: {model.input_dim}")
+        if model.train_samples:
+            details.append(f"примеров: {model.train_samples}")
+        if model.history:
+            try:
+                history = json.loads(model.history)
+                if history.get("accuracy"):
+                    details.append(f"accuracy: {history['accuracy'][-1]:.3f}")
+                if history.get("loss"):
+                    details.append(f"loss: {history['loss'][-1]:.4f}")
+                    details.append(f"эпох: {len(history['loss'])}")
+                if history.get("val_loss"):
+                    details.append(f"val_loss: {min(history['val_loss']):.4f}")
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Не удалось разобрать историю обучения модели ID {model.id}: {e}")
+        if model.cv_metrics:
+            try:
+                cv_metrics = json.loads(model.cv_metrics)
+                details.append(f"CV accuracy: {cv_metrics['val_accuracy_mean']:.3f} "
+                               f"± {cv_metrics['val_accuracy_std']:.3f} ({cv_metrics['folds']} фолдов)")
+            except (ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Не удалось разобрать метрики CV модели ID {model.id}: {e}")
+        if model.artifact_size:
+            details.append(f"размер: {model.artifact_size / 1024:.1f} КБ")
+        if model.train_duration:
+            details.append(f"обучение: {model.train_duration:.1f} с")
+        if model.tflite_size:
+            details.append(f"TFLite: {model.tflite_size / 1024:.1f} КБ")
+        if details:
+            text += "\n" + ", ".join(details)
+        return text
+
     def delete_model(self, model_id):
         reply = QMessageBox.question(
             self,
@@ -377,6 +505,7 @@ class ModelTrainingTab(QWidget):
             blade = session.query(Blade).get(blade_id)
             if blade:
                 blade.prediction = status
+                blade.labeled_at = datetime.datetime.now(datetime.UTC)
                 session.commit()
                 logger.info(f"Статус дефекта лопатки ID {blade_id} изменен на {status}")
                 self.update_blade_results()
@@ -414,29 +543,141 @@ class ModelTrainingTab(QWidget):
     #     return np.array(X, dtype=np.float32), np.array(y, dtype=np.float32)
 
     def train_model(self):
+        """
+        Запускает обучение модели в фоновом потоке (TrainingWorker).
+        Вкладка остаётся доступной, прогресс и отмена — через неблокирующий QProgressDialog.
+        """
+        if self.training_thread is not None:
+            logger.warning("Обучение уже выполняется")
+            return
+        retrain_scheduler = getattr(self.main_window, "retrain_scheduler", None)
+        if retrain_scheduler is not None and retrain_scheduler.is_training():
+            QMessageBox.warning(self, "Ошибка", "Идёт автоматическое дообучение модели, повторите позже")
+            return
         selected_item = self.main_window.mt_disk_type.currentText()
-        self.set_controls_enabled(False)
-        QApplication.processEvents()
-        data = get_training_dataset(selected_item)
-        if not data:
-            QMessageBox.warning(self, "Ошибка", "Обучение не совершено, нет данных")
-            logger.error("Ошибка: Обучение отменено")
-            self.set_controls_enabled(True)
+        if not selected_item:
+            logger.error("Не выбран тип диска для обучения")
+            return
+
+        dialog = TrainingOptionsDialog(self)
+        if dialog.exec_() != QDialog.Accepted:
             return
+        mode = dialog.get_mode()
+        model_kind = dialog.get_model_kind()
+
+        self.main_window.mt_save.setEnabled(False)
+
+        self.training_dialog = QProgressDialog("Подготовка обучающей выборки...", "Отменить", 0, 0, self)
+        self.training_dialog.setWindowTitle("Обучение модели")
+        self.training_dialog.setWindowModality(Qt.NonModal)
+        self.training_dialog.setAutoClose(False)
+        self.training_dialog.setAutoReset(False)
+        self.training_dialog.canceled.connect(self.cancel_training)
+        self.training_dialog.show()
+
+        self.training_worker = TrainingWorker(selected_item, mode=mode, model_kind=model_kind)
+        self.training_thread = QThread()
+        self.training_worker.moveToThread(self.training_thread)
+        self.training_thread.started.connect(self.training_worker.run)
+        self.training_worker.progress.connect(self.on_training_progress)
+        self.training_worker.finished.connect(self.on_training_finished)
+        self.training_worker.failed.connect(self.on_training_failed)
+        self.training_worker.cancelled.connect(self.on_training_cancelled)
+        for signal in (self.training_worker.finished, self.training_worker.failed, self.training_worker.cancelled):
+            signal.connect(self.training_thread.quit)
+        self.training_thread.finished.connect(self.on_training_thread_finished)
+        self.training_thread.start()
+        logger.info(f"Запущено фоновое обучение модели ({mode}) для типа диска '{selected_item}'")
+
+    def cancel_training(self):
+        if self.training_worker is not None:
+            logger.info("Запрошена отмена обучения")
+            self.training_worker.cancel()
+            if self.training_dialog is not None:
+                self.training_dialog.setLabelText("Отмена обучения...")
+
+    def shutdown(self):
+        """Закрытие приложения: ручное обучение отменяется, поток ждётся до конца (как RetrainScheduler.shutdown)"""
+        if self.training_thread is None:
+            return
+        self.cancel_training()
+        self.training_thread.quit()
+        self.training_thread.wait()
+
+    @pyqtSlot(object)
+    def on_training_progress(self, progress):
+        if self.training_dialog is None:
+            return
+        if "trial" in progress:
+            self.training_dialog.setMaximum(progress["trials"])
+            self.training_dialog.setValue(progress["trial"])
+            self.training_dialog.setLabelText(
+                f"Подбор гиперпараметров: испытание {progress['trial']}/{progress['trials']}, "
+                f"accuracy (CV) {progress['val_accuracy']:.3f}"
+            )
+            return
+        self.training_dialog.setMaximum(progress["epochs"])
+        self.training_dialog.setValue(progress["epoch"])
+        text = (f"Эпоха {progress['epoch']}/{progress['epochs']}: loss {progress['loss']:.4f}, "
+                f"accuracy {progress['accuracy']:.3f}")
+        if progress.get("val_loss") is not None:
+            # при ранней остановке число эпох — верхняя граница, ETA тоже максимальная
+            text += f", val_loss {progress['val_loss']:.4f}, осталось не более ~{progress['eta']:.0f} с"
         else:
-            X, y = data
-        model = build_model(input_dim=5)
-        history = model.fit(X,y, epochs=15, batch_size=8)
-        if save_model_to_db(model, selected_item):
-            logger.info("Успешно сохранено")
+            text += f", осталось ~{progress['eta']:.0f} с"
+        self.training_dialog.setLabelText(text)
+
+    @pyqtSlot(object)
+    def on_training_finished(self, result):
+        self.close_training_dialog()
+        logger.info(f"Обучение завершено, модель ID {result['model_id']} сохранена")
+        if result["mode"] == TrainingWorker.MODE_INCREMENTAL:
+            message = f"Модель дообучена на {result['train_samples']} лопатках: {result['history']}"
+        elif result["mode"] == TrainingWorker.MODE_SEARCH:
+            message = "Подбор гиперпараметров завершён, лучшие конфигурации:"
+            for place, trial in enumerate(result["leaderboard"][:5], start=1):
+                message += (f"\n{place}. accuracy {trial['val_accuracy_mean']:.3f} ± {trial['val_accuracy_std']:.3f}, "
+                            f"loss {trial['val_loss_mean']:.4f}: {trial['params']}")
+            message += f"\nЛучшая модель сохранена (ID {result['model_id']})"
         else:
-            logger.error("Ошибка. Не удалось сохранить модель")
-
-        print(history.history)
-        self.set_controls_enabled(True)
-        self.show_info_message(f"Модель обучена: {history.history}")
+            message = f"Модель обучена: {result['history']}"
+        convergence = result.get("convergence")
+        if convergence:
+            message += (f"\nЭпох обучения: {convergence['epochs_trained']}, "
+                        f"лучшая эпоха: {convergence['best_epoch']}")
+            if convergence["early_stopped"]:
+                message += " (ранняя остановка)"
+        parity = result.get("parity")
+        if parity:
+            message += (f"\nTFLite: совпадение решений {parity['agreement']:.1%}, "
+                        f"макс. расхождение {parity['max_abs_diff']:.4f} на {parity['blades']} лопатках")
+        self.show_info_message(message)
         self.update_avaliable_models()
 
+    @pyqtSlot(str)
+    def on_training_failed(self, message):
+        self.close_training_dialog()
+        logger.error(f"Ошибка: Обучение отменено: {message}")
+        QMessageBox.warning(self, "Ошибка", message)
+
+    @pyqtSlot()
+    def on_training_cancelled(self):
+        self.close_training_dialog()
+        logger.info("Обучение отменено пользователем, модель не сохранена")
+
+    def on_training_thread_finished(self):
+        self.training_thread.deleteLater()
+        self.training_worker.deleteLater()
+        self.training_thread = None
+        self.training_worker = None
+        self.main_window.mt_save.setEnabled(True)
+
+    def close_training_dialog(self):
+        if self.training_dialog is not None:
+            self.training_dialog.canceled.disconnect(self.cancel_training)
+            self.training_dialog.close()
+            self.training_dialog = None
+
     # def save_model_to_db(self, model, selected_item):
     #     session = Session()
     #     if selected_item:
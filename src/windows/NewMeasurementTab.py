@@ -1,18 +1,49 @@
 import logging
+import os
+import threading
+from datetime import datetime
 from itertools import repeat
 from multiprocessing.managers import Value
 
 from PyQt5.QtWidgets import QHeaderView, QWidget, QDialog, QBoxLayout, QLabel, QLineEdit, QCheckBox, QPushButton, \
     QVBoxLayout, QMessageBox
 from PyQt5.QtWidgets import QTableWidgetItem, QTabBar, QTabWidget
-from PyQt5.QtCore import QMetaObject, Qt, QThread, QLine, pyqtSlot
-from PyQt5.QtGui import QIntValidator
+from PyQt5.QtCore import QMetaObject, Qt, QThread, QLine, QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QIntValidator, QColor
 from sqlalchemy import values, Select
 
 from src.db import Session
 from src.models import DiskType, Blade, DiskScan
 
 from src.scan.Scanning import Scanning
+from src.scan.series import format_disk, format_series
+from src.scan import scan_session
+from src.scan.replay import ScanRecorder
+from src.config import settings
+
+
+class ResumeLookup(QObject):
+    """Поиск прерванного сканирования вне потока интерфейса: журнал лопаток сбрасывается в БД, затем сверка с сессией"""
+    finished = pyqtSignal(object)  # dict из scan_session.find_resumable или None
+
+    def __init__(self, blade_writer, disk_type_id, exclude):
+        super().__init__()
+        self.blade_writer = blade_writer
+        self.disk_type_id = disk_type_id
+        self.exclude = exclude
+
+    @pyqtSlot()
+    def run(self):
+        resume = None
+        try:
+            #лопатки из журнала должны попасть в БД до сверки с сессией, иначе последняя из них может быть записана снова
+            if not self.blade_writer.flush(settings.BLADE_FLUSH_TIMEOUT):
+                logger.warning("Не все лопатки из журнала записаны в БД, поиск прерванного сканирования по данным БД")
+            resume = scan_session.find_resumable(self.disk_type_id, self.exclude)
+        except Exception as e:
+            logger.error(f"Ошибка поиска прерванного сканирования: {e}", exc_info=True)
+        self.finished.emit(resume)
+
 
 class SeriesScanDialog(QDialog):
     def __init__(self, parent=None):
@@ -91,6 +122,11 @@ class NewMeasurementTab(QWidget):
 
         self.current_disk_type_blades = []
         self.current_disk_type_id = None
+        self.outlier_blades = {} #(disk_scan_id, num) -> D² лопаток, выбившихся из своего диска (только в этом сеансе)
+        self.scan_recorder = None  # запись текущего сканирования для воспроизведения (SCAN_RECORD_DIR)
+        self.resume_lookup = None  # поиск прерванного сканирования перед запуском (в своём потоке)
+        self.resume_lookup_thread = None
+        self.pending_start = None  # (disk_type_id, установка) запуска, ожидающего поиска
 
         header = self.main_window.nm_measurements.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
@@ -208,24 +244,97 @@ class NewMeasurementTab(QWidget):
                 if not disk_type:
                     logger.error(f"Тип диска с именем '{selected_item}' не найден.")
                     return
+                rig = self.main_window.station.rigs[0]
+                if rig.busy:
+                    logger.error(f"{rig.name}: сканирование уже запущено из обзора станции")
+                    QMessageBox.warning(self, "Ошибка", f"{rig.name}: сканирование уже идёт")
+                    return
                 logger.info(f"Запуск сканирования диска с ID {disk_type.id}")
                 self.set_controls_enabled(False)  # Блокируем элементы
-                # Запуск контроля на Arduino
-                logger.info("Отправка команды на старт контроля")
-                self.current_scan = Scanning(disk_type.id, self.main_window.arduino_worker)
-                self.scanning_thread = QThread()
-                self.current_scan.moveToThread(self.scanning_thread)
-                self.scanning_thread.started.connect(self.current_scan.start_scan)
-                self.current_scan.blade_downloaded.connect(self.on_blade_downloaded)
-                self.current_scan.scanning_finished.connect(self.scanning_thread.quit)
-                self.current_scan.scanning_finished.connect(self.on_scanning_finished)
-                self.current_scan.scanning_finished.connect(self.scanning_thread.deleteLater)
-                # self.current_scan.scanning_finished.connect(self.scanning_thread.deleteLater) убрал 8.03.25
-                self.scanning_thread.start()
+                self.start_resume_lookup(disk_type.id, rig)
 
+        except Exception as e:
+            logger.error(f"Ошибка при старте сканирования: {e}", exc_info=True)
+
+    def start_resume_lookup(self, disk_type_id, rig):
+        """
+        Поиск прерванного сканирования идёт в отдельном потоке: перед ним журнал лопаток сбрасывается в БД,
+        и при медленной или недоступной БД интерфейс не должен зависать. Запуск продолжается в on_resume_lookup_finished.
+        """
+        self.main_window.statusBar().showMessage("Поиск прерванного сканирования...")
+        self.pending_start = (disk_type_id, rig)
+        self.resume_lookup = ResumeLookup(self.main_window.blade_writer, disk_type_id,
+                                          self.main_window.station.active_disk_scans())
+        self.resume_lookup_thread = QThread()
+        self.resume_lookup.moveToThread(self.resume_lookup_thread)
+        self.resume_lookup_thread.started.connect(self.resume_lookup.run)
+        self.resume_lookup.finished.connect(self.on_resume_lookup_finished)
+        self.resume_lookup.finished.connect(self.resume_lookup_thread.quit)
+        self.resume_lookup_thread.finished.connect(self.resume_lookup.deleteLater)
+        self.resume_lookup_thread.finished.connect(self.resume_lookup_thread.deleteLater)
+        self.resume_lookup_thread.start()
 
+    @pyqtSlot(object)
+    def on_resume_lookup_finished(self, resume):
+        self.main_window.statusBar().clearMessage()
+        #ссылки на поиск и его поток остаются до следующего запуска: поток завершается уже после этого слота
+        disk_type_id, rig = self.pending_start
+        self.pending_start = None
+        try:
+            self.launch_scan(disk_type_id, rig, self.ask_resume(resume))
         except Exception as e:
             logger.error(f"Ошибка при старте сканирования: {e}", exc_info=True)
+            self.set_controls_enabled(True)
+
+    def launch_scan(self, disk_type_id, rig, resume):
+        if rig.busy:
+            #пока шёл поиск прерванного сканирования, установку могли занять из обзора станции
+            logger.error(f"{rig.name}: сканирование уже запущено из обзора станции")
+            QMessageBox.warning(self, "Ошибка", f"{rig.name}: сканирование уже идёт")
+            self.set_controls_enabled(True)
+            return
+        # Запуск контроля на Arduino
+        logger.info("Отправка команды на старт контроля")
+        #серия — один экземпляр Scanning и один поток на все диски (модель и настройки установки не перегружаются)
+        repeats = (None if self.series_infinite else self.series_count) if self.series_mode else 1
+        arduino_worker, microphone = rig.worker, None
+        if settings.SCAN_RECORD_DIR:
+            #запись обмена с установкой и звука для воспроизведения без установки (src.scan.replay)
+            self.scan_recorder = ScanRecorder(
+                os.path.join(settings.SCAN_RECORD_DIR, datetime.now().strftime("%Y%m%d_%H%M%S")),
+                meta={"disk_type_id": disk_type_id, "repeats": repeats, "resume": resume})
+            arduino_worker = self.scan_recorder.wrap_worker(arduino_worker)
+            microphone = self.scan_recorder.wrap_microphone(rig.microphone)
+        #Scanning в своём потоке, с общими писателем лопаток и кэшем моделей станции
+        self.current_scan = self.main_window.station.create_scan(rig, disk_type_id, repeats=repeats,
+                                                                 resume=resume, arduino_worker=arduino_worker,
+                                                                 microphone=microphone)
+        self.scanning_thread = rig.thread
+        self.current_scan.blade_downloaded.connect(self.on_blade_downloaded)
+        self.current_scan.disk_finished.connect(self.on_disk_finished)
+        self.current_scan.scanning_finished.connect(self.on_scanning_finished)
+        # self.current_scan.scanning_finished.connect(self.scanning_thread.deleteLater) убрал 8.03.25
+        self.main_window.station.run(rig)
+
+    def ask_resume(self, resume):
+        """
+        Если у типа диска есть прерванное сканирование (обрыв связи с установкой или сбой приложения),
+        оператор выбирает: продолжить его со следующей лопатки или начать новое.
+        """
+        if resume is None:
+            return None
+        answer = QMessageBox.question(
+            self, "Прерванное сканирование",
+            f"Сканирование №{resume['disk_scan_id']} было прервано после лопатки {resume['last_blade_num']}.\n"
+            f"Продолжить его со следующей лопатки?\n\n"
+            f"Если установка перезагружалась, перед продолжением верните базу в начальное положение.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if answer == QMessageBox.Yes:
+            return resume
+        #статус — тоже запрос к БД, интерфейс его не ждёт
+        threading.Thread(target=scan_session.set_status, args=(resume["disk_scan_id"], "abandoned"),
+                         daemon=True).start()
+        return None
 
     def stop_control(self):
         """
@@ -259,26 +368,33 @@ class NewMeasurementTab(QWidget):
         self.series_mode = True
         self.series_stoped = False
         self.series_infinite = infinite
-        self.series_count = repeats if not infinite else float('inf')
+        self.series_count = repeats if not infinite else None
         logger.info("Начинается серийное сканирование")
         self.start_control()
 
 
+    def on_disk_finished(self, result):
+        """Диск серии отсканирован: обновляем таблицу и показываем производительность"""
+        message = format_disk(result)
+        if self.series_mode:
+            if not self.series_infinite:
+                logger.info(f"Серийное сканирование: осталось {self.series_count - result.index} итераций")
+            message = f"{message}; {format_series(self.current_scan.series.summary())}"
+        self.main_window.statusBar().showMessage(message)
+        self.update_blade_fields()
+
     def on_scanning_finished(self):
-        if self.series_mode and not self.series_stoped:
-            logger.info("Серийное сканирование: одна из итераций завершилась")
-            if self.series_infinite or self.series_count > 1:
-                if not self.series_infinite:
-                    self.series_count -= 1
-                    logger.info(f"Серийное сканирование: осталось {self.series_count} итераций")
-                self.start_control()
-                return
-            else:
-                self.series_mode = False
+        if self.series_mode:
+            logger.info(f"Серийное сканирование завершено: {format_series(self.current_scan.series.summary())}")
+        self.series_mode = False
 
         self.set_controls_enabled(True)  # Разблокируем элементы
         logger.info("Контроль завершен и элементы интерфейса разблокированы")
         self.update_blade_fields()
+        if self.scan_recorder is not None:
+            self.current_scan.arduino_worker.close()
+            self.scan_recorder.close()
+            self.scan_recorder = None
         self.current_scan = None
         self.scanning_thread = None
 
@@ -344,12 +460,17 @@ class NewMeasurementTab(QWidget):
                         "Не оценено"
                     )
                     self.main_window.nm_measurements.setItem(row, 2, QTableWidgetItem(result))
+                    outlier_score = self.outlier_blades.get((blade.disk_scan_id, blade.num))
+                    if outlier_score is not None:
+                        self.mark_outlier(row, outlier_score)
                     logger.debug(f"DiskScan {blade.disk_scan_id}, Лопатка {blade.num}: {result}")
             except Exception as e:
                 logger.error(f"Ошибка при обновлении данных лопаток: {e}", exc_info=True)
 
     @pyqtSlot(object)
     def on_blade_downloaded(self, blade):
+        if blade.outlier:
+            self.outlier_blades[(blade.disk_scan_id, blade.num)] = blade.outlier_score
         if blade.disk_type_id == self.current_disk_type_id:
             self.current_disk_type_blades.append(blade)
             self.add_blade_to_table(blade)
@@ -367,9 +488,20 @@ class NewMeasurementTab(QWidget):
             "Не оценено"
         )
         table.setItem(row_count, 2, QTableWidgetItem(result))
+        if blade.outlier:
+            self.mark_outlier(row_count, blade.outlier_score)
 
         table.scrollToItem(table.item(row_count, 0))
 
+    def mark_outlier(self, row, outlier_score):
+        """Подсвечивает лопатку, звук которой выбивается из остальных лопаток того же диска"""
+        table = self.main_window.nm_measurements
+        for column in range(table.columnCount()):
+            item = table.item(row, column)
+            if item is not None:
+                item.setBackground(QColor(255, 200, 120))
+                item.setToolTip(f"Выбивается из остальных лопаток диска (расстояние Махаланобиса² = {outlier_score:.1f})")
+
 
 
 
@@ -0,0 +1,128 @@
+import logging
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, \
+    QComboBox, QSpinBox, QPushButton, QLabel, QMessageBox, QAbstractItemView
+
+from src.db import Session
+from src.models import DiskType
+
+logger = logging.getLogger(__name__)
+
+
+class StationOverviewDialog(QDialog):
+    """
+    Обзор установок станции: связь, идущая серия и производительность каждой установки.
+    Отсюда же запускаются и останавливаются серии на установках; основная установка обычно
+    управляется вкладкой «Новое измерение».
+    """
+    COLUMNS = ["Установка", "Порт", "Связь", "Тип диска", "Дисков", "Лопаток", "Лопаток/ч"]
+
+    def __init__(self, station, parent=None):
+        super().__init__(parent)
+        self.station = station
+        self.setWindowTitle("Станция")
+        self.resize(760, 320)
+        self.disk_types = {}  # id -> имя
+
+        layout = QVBoxLayout()
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        layout.addWidget(self.table)
+        self.total_label = QLabel()
+        layout.addWidget(self.total_label)
+
+        controls = QHBoxLayout()
+        self.disk_type_combo = QComboBox()
+        self.repeats_spin = QSpinBox()
+        self.repeats_spin.setRange(1, 99999)
+        self.start_button = QPushButton("Запустить серию")
+        self.stop_button = QPushButton("Остановить")
+        controls.addWidget(QLabel("Тип диска:"))
+        controls.addWidget(self.disk_type_combo)
+        controls.addWidget(QLabel("Дисков:"))
+        controls.addWidget(self.repeats_spin)
+        controls.addWidget(self.start_button)
+        controls.addWidget(self.stop_button)
+        layout.addLayout(controls)
+        self.setLayout(layout)
+
+        self.start_button.clicked.connect(self.start_selected)
+        self.stop_button.clicked.connect(self.stop_selected)
+        self.station.rig_changed.connect(self.refresh)
+        #лопатки/ч меняются и без событий установки, поэтому таблица ещё и обновляется по таймеру
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.load_disk_types()
+        self.refresh()
+        self.timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def load_disk_types(self):
+        try:
+            with Session() as session:
+                self.disk_types = {disk_type.id: disk_type.name for disk_type in session.query(DiskType).all()}
+        except Exception as e:
+            logger.error(f"Ошибка загрузки типов дисков: {e}", exc_info=True)
+            return
+        self.disk_type_combo.clear()
+        for disk_type_id, name in self.disk_types.items():
+            self.disk_type_combo.addItem(name, disk_type_id)
+
+    def refresh(self, *args):
+        rows = self.station.overview()
+        self.table.setRowCount(len(rows))
+        for row_idx, row in enumerate(rows):
+            values = [
+                row["name"],
+                row["port"] or "",
+                "есть" if row["connected"] else "нет",
+                self.disk_types.get(row["disk_type_id"], "") if row["scanning"] else "",
+                str(row["disks"]),
+                str(row["blades"]),
+                f"{row['blades_per_hour']:.0f}",
+            ]
+            for col_idx, value in enumerate(values):
+                self.table.setItem(row_idx, col_idx, QTableWidgetItem(value))
+        total = sum(row["blades_per_hour"] for row in rows if row["scanning"])
+        working = sum(1 for row in rows if row["scanning"])
+        self.total_label.setText(f"Сканируют {working} из {len(rows)} установок, всего {total:.0f} лопаток/ч")
+
+    def selected_rig(self):
+        row_idx = self.table.currentRow()
+        if row_idx < 0:
+            QMessageBox.warning(self, "Ошибка", "Не выбрана установка")
+            return None
+        return self.station.rigs[row_idx]
+
+    def start_selected(self):
+        rig = self.selected_rig()
+        if rig is None:
+            return
+        disk_type_id = self.disk_type_combo.currentData()
+        if disk_type_id is None:
+            QMessageBox.warning(self, "Ошибка", "Не выбран тип диска")
+            return
+        if not rig.connected:
+            QMessageBox.warning(self, "Ошибка", f"{rig.name}: не подключена плата")
+            return
+        if self.station.create_scan(rig, disk_type_id, repeats=self.repeats_spin.value()) is None:
+            QMessageBox.warning(self, "Ошибка", f"{rig.name}: сканирование уже идёт")
+            return
+        logger.info(f"{rig.name}: запуск серии из {self.repeats_spin.value()} дисков, тип диска {disk_type_id}")
+        self.station.run(rig)
+
+    def stop_selected(self):
+        rig = self.selected_rig()
+        if rig is not None:
+            self.station.stop_scan(rig)
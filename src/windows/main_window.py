@@ -7,13 +7,17 @@ from PyQt5.QtCore import QEvent, pyqtSlot
 
 from src.interfaces.fixed_interface_2_2 import Ui_SoundScan
 
-from src.arduino.arduino_controller import ArduinoController
+from src.config import settings
+from src.scan.station import Station
+from src.scan.retrain_scheduler import RetrainScheduler
+from src.scan.blade_writer import BladeWriter
 
 from src.windows.ModelTrainingTab import ModelTrainingTab
 from src.windows.ChangeHistoryTab import ChangeHistoryTab
 from src.windows.NewMeasurementTab import NewMeasurementTab
 from src.windows.DiskTypeTab import DiskTypeTab
 from src.windows.DeviceConfigTab import DeviceConfigTab
+from src.windows.StationOverviewDialog import StationOverviewDialog
 
 logger = logging.getLogger(__name__)
 
@@ -36,10 +40,29 @@ class MainWindow(QMainWindow, Ui_SoundScan):
             self.tabs['model_training'] = ModelTrainingTab(self)
             logger.info("Интерфейс загружен успешно")
 
+            # общий писатель лопаток: журнал незавершённой записи с прошлого запуска отправляется в БД при старте
+            self.blade_writer = BladeWriter(settings.BLADE_JOURNAL_DIR, batch_size=settings.BLADE_WRITE_BATCH,
+                                            flush_interval=settings.BLADE_FLUSH_INTERVAL)
+            self.blade_writer.start()
+
             self.connection_established = False
-            self.arduino_worker = ArduinoController().create_worker()
+            #установки ПК (строки DeviceConfig): у каждой своя плата и свой поток сканирования, модели и писатель общие;
+            #основная (первая) управляется вкладкой «Новое измерение», остальные — из обзора станции
+            self.station = Station(self.blade_writer)
+            self.station.load()
+            self.arduino_worker = self.station.rigs[0].worker
             self.arduino_worker.connection_established.connect(self.on_connection_established)  # Подключаем обработчик состояния подключения
-            self.arduino_worker.start()  # Запуск потока
+            self.station.start()  # Запуск потоков плат
+            self.station_dialog = None
+            self.menuBar().addAction("Станция", self.show_station_overview)
+
+            self.retrain_scheduler = None
+            if settings.AUTO_RETRAIN:
+                self.retrain_scheduler = RetrainScheduler(self.is_busy, self)
+                self.retrain_scheduler.candidate_registered.connect(self.on_candidate_registered)
+                #серия на любой установке станции прерывает фоновое обучение
+                self.station.scan_started.connect(self.retrain_scheduler.on_scan_started)
+                self.retrain_scheduler.start()
             self.setup_ui()
 
         except Exception as e:
@@ -56,6 +79,30 @@ class MainWindow(QMainWindow, Ui_SoundScan):
         else:
             logger.info("Ошибка подключения к Arduino.")
 
+    def show_station_overview(self):
+        if self.station_dialog is None:
+            self.station_dialog = StationOverviewDialog(self.station, self)
+        self.station_dialog.show()
+        self.station_dialog.raise_()
+
+    def closeEvent(self, event):
+        if self.retrain_scheduler is not None:
+            self.retrain_scheduler.shutdown()
+        self.tabs['model_training'].shutdown()
+        self.station.close()
+        self.blade_writer.close(settings.BLADE_FLUSH_TIMEOUT)
+        super().closeEvent(event)
+
+    def is_busy(self):
+        """Идёт сканирование или ручное обучение — фоновое дообучение не запускается"""
+        return (any(rig.busy for rig in self.station.rigs)
+                or self.tabs['model_training'].training_thread is not None)
+
+    @pyqtSlot(object)
+    def on_candidate_registered(self, result):
+        if self.current_tab == 'model_training':
+            self.tabs['model_training'].update_avaliable_models()
+
     def setup_ui(self):
         print('setup_ui')
 
@@ -0,0 +1,4 @@
+import os
+
+# src.config требует DB_URL при импорте; модульным тестам сама БД не нужна
+os.environ.setdefault("DB_URL", "sqlite://")
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from src.scan import blade_writer
+from src.scan.blade_writer import _encode_record, read_journal
+
+
+def make_record(num, scan=b"RIFF....WAVE"):
+    return {
+        "uid": f"uid-{num}",
+        "disk_scan_id": 7,
+        "num": num,
+        "prediction": 0.25,
+        "base_position": 100 * num,
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "scan": scan,
+    }
+
+
+def write_journal(path, records, tail=b""):
+    with open(path, "wb") as f:
+        for record in records:
+            f.write(_encode_record(record))
+        f.write(tail)
+
+
+def test_journal_round_trip(tmp_path):
+    records = [make_record(1), make_record(2, scan=b""), make_record(3, scan=bytes(range(256)) * 4)]
+    path = tmp_path / "1.journal"
+    write_journal(path, records)
+    assert read_journal(str(path)) == records
+
+
+@pytest.mark.parametrize("cut", [1, 5, 20])
+def test_truncated_tail_is_dropped(tmp_path, cut):
+    records = [make_record(1), make_record(2)]
+    torn = _encode_record(make_record(3))
+    path = tmp_path / "1.journal"
+    write_journal(path, records, tail=torn[:cut])
+    assert read_journal(str(path)) == records
+
+
+def test_empty_journal(tmp_path):
+    path = tmp_path / "1.journal"
+    path.write_bytes(b"")
+    assert read_journal(str(path)) == []
+
+
+def test_replay_skips_journals_of_live_writers(tmp_path, monkeypatch):
+    inserted = []
+    monkeypatch.setattr(blade_writer, "insert_blades", lambda records: inserted.extend(records))
+    live = blade_writer.BladeWriter(str(tmp_path))
+    with live.lock:
+        live._claim_owner_dir()
+    write_journal(os.path.join(live.owner_dir, "1.journal"), [make_record(1)])
+    #каталог завершившегося процесса: журнал есть, блокировки владельца нет
+    os.makedirs(tmp_path / "1_1")
+    (tmp_path / "1_1.owner").write_bytes(b"")
+    write_journal(tmp_path / "1_1" / "1.journal", [make_record(2)])
+
+    other = blade_writer.BladeWriter(str(tmp_path))
+    other.replay_pending()
+    assert [record["uid"] for record in inserted] == ["uid-2"]
+    assert not (tmp_path / "1_1").exists() and not (tmp_path / "1_1.owner").exists()
+    assert os.path.exists(os.path.join(live.owner_dir, "1.journal"))
+
+
+def test_replay_runs_in_writer_thread_and_is_retried(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "1_1")
+    (tmp_path / "1_1.owner").write_bytes(b"")
+    write_journal(tmp_path / "1_1" / "1.journal", [make_record(1)])
+    calls, inserted = [], []
+
+    def insert_blades(records):
+        calls.append(len(records))
+        if len(calls) == 1:
+            raise ConnectionError("БД недоступна")
+        inserted.extend(records)
+
+    monkeypatch.setattr(blade_writer, "insert_blades", insert_blades)
+    writer = blade_writer.BladeWriter(str(tmp_path), retry_interval=0.05)
+    writer.start()
+    #flush ждёт и восстановления журналов прошлых запусков
+    assert writer.flush(timeout=5)
+    writer.close(timeout=5)
+    assert len(calls) == 2
+    assert [record["uid"] for record in inserted] == ["uid-1"]
+    assert not (tmp_path / "1_1").exists()
@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.scan.hyperparam_search import make_folds, run_search
+
+
+def test_folds_are_stratified():
+    y = np.array([0] * 10 + [1] * 10)
+    folds = make_folds(y, 5, seed=0)
+    assert len(folds) == 5
+    for train_idx, val_idx in folds:
+        assert np.bincount(y[val_idx].astype(int)).tolist() == [2, 2]
+        assert not set(train_idx) & set(val_idx)
+    assert sorted(np.concatenate([val_idx for _, val_idx in folds])) == list(range(len(y)))
+
+
+def test_folds_reduced_to_smallest_class():
+    y = np.array([0] * 20 + [1] * 3, dtype=np.float32)
+    folds = make_folds(y, 5, seed=0)
+    assert len(folds) == 3
+    for _, val_idx in folds:
+        assert y[val_idx].sum() == 1
+
+
+@pytest.mark.parametrize("y", [[0] * 10 + [1], [0] * 10, [1, 1, 0]])
+def test_too_few_examples_raise(y):
+    with pytest.raises(ValueError):
+        make_folds(np.array(y), 5)
+
+
+def tiny_dataset():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20, 4)).astype(np.float32)
+    y = np.array([0, 1] * 10, dtype=np.float32)
+    X[y == 1] += 2.0
+    return X, y
+
+
+def test_run_search_two_trials():
+    pytest.importorskip("tensorflow")
+    X, y = tiny_dataset()
+    trials = [{"hidden_layers": [[4, "relu"]], "epochs": 2, "batch_size": 4},
+              {"hidden_layers": [[8, "relu"]], "optimizer": "adam", "epochs": 2, "batch_size": 4}]
+    progress = []
+    leaderboard = run_search(X, y, trials, k_folds=2, max_workers=2, seed=0,
+                             progress_callback=lambda done, total, result: progress.append((done, total)))
+    assert sorted(result["trial"] for result in leaderboard) == [0, 1]
+    assert all(result["folds"] == 2 for result in leaderboard)
+    assert [result["val_accuracy_mean"] for result in leaderboard] == \
+        sorted((result["val_accuracy_mean"] for result in leaderboard), reverse=True)
+    assert progress == [(1, 2), (2, 2)]
+
+
+def test_run_search_stops_without_waiting_for_trials():
+    pytest.importorskip("tensorflow")
+    X, y = tiny_dataset()
+    #испытания заведомо дольше теста: отмена не должна дожидаться их окончания
+    trials = [{"hidden_layers": [[4, "relu"]], "epochs": 100000, "batch_size": 1}] * 2
+    started = time.monotonic()
+    leaderboard = run_search(X, y, trials, k_folds=2, max_workers=2, should_stop=lambda: True)
+    assert leaderboard == []
+    assert time.monotonic() - started < 60
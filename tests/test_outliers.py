@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.scan.outliers import OnlineOutlierDetector
+
+
+def test_inverse_matches_direct_computation():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(30, 5)) * [1.0, 3.0, 0.5, 10.0, 2.0]
+    detector = OnlineOutlierDetector(min_blades=len(X) + 1, variance_floor=0.5)
+    for x in X:
+        assert detector.add(x) == (False, None)
+    centered = X - X.mean(axis=0)
+    m2 = 0.5 * np.eye(5) + centered.T @ centered
+    assert detector.n == len(X)
+    np.testing.assert_allclose(detector.mean, X.mean(axis=0))
+    np.testing.assert_allclose(detector.m2_inv, np.linalg.inv(m2), rtol=1e-8, atol=1e-12)
+
+
+def test_obvious_outlier_is_flagged_and_not_accumulated():
+    rng = np.random.default_rng(1)
+    detector = OnlineOutlierDetector(alpha=0.001, min_blades=8)
+    for x in rng.normal(size=(20, 3)):
+        detector.add(x)
+    n, mean, m2_inv = detector.n, detector.mean.copy(), detector.m2_inv.copy()
+
+    is_outlier, score = detector.add([40.0, -40.0, 40.0])
+    assert is_outlier and score > detector.threshold()
+    assert detector.n == n
+    np.testing.assert_array_equal(detector.mean, mean)
+    np.testing.assert_array_equal(detector.m2_inv, m2_inv)
+
+    is_outlier, score = detector.add(mean)
+    assert not is_outlier and score is not None
+    assert detector.n == n + 1
+
+
+def test_no_scores_before_min_blades():
+    detector = OnlineOutlierDetector(min_blades=8)
+    results = [detector.add([float(i), 100.0 * (i == 5)]) for i in range(8)]
+    assert results == [(False, None)] * 8
+    assert detector.n == 8
@@ -0,0 +1,60 @@
+from src.arduino.protocol import SEQ_MODULO, RigState
+
+
+def snapshot(seq, **flags):
+    return {"scan_in_progress": False, "blade_found": False, "base_position": 0, **flags, "seq": seq}
+
+
+def test_consecutive_events_apply():
+    state = RigState()
+    assert state.apply(snapshot(10))
+    assert state.apply({"s": 11, "sip": 1})
+    assert state.apply({"s": 12, "bf": 1, "p": 250})
+    assert state.flags["scan_in_progress"] and state.flags["blade_found"]
+    assert state.flags["base_position"] == 250
+    assert state.seq == 12 and state.gaps == 0
+
+
+def test_gap_requests_snapshot():
+    state = RigState()
+    state.apply(snapshot(10))
+    assert not state.apply({"s": 13, "sip": 1})
+    assert state.gaps == 1
+    #событие после пропуска всё равно применено, следующее по порядку — без пропуска
+    assert state.flags["scan_in_progress"]
+    assert state.apply({"s": 14, "sip": 0})
+    assert state.gaps == 1
+
+
+def test_sequence_wraps_around():
+    state = RigState()
+    state.apply(snapshot(SEQ_MODULO - 2))
+    assert state.apply({"s": SEQ_MODULO - 1, "bf": 1})
+    assert state.apply({"s": 0, "bf": 0})
+    assert state.apply({"s": 1, "sip": 1})
+    assert state.seq == 1 and state.gaps == 0
+
+
+def test_gap_across_wrap_around():
+    state = RigState()
+    state.apply(snapshot(SEQ_MODULO - 1))
+    assert not state.apply({"s": 2, "bf": 1})
+    assert state.gaps == 1
+
+
+def test_stale_events_are_ignored():
+    state = RigState()
+    state.apply(snapshot(20, blade_found=True))
+    #события, уже учтённые в снимке (тот же или более ранний номер), снимок не откатывают
+    assert state.apply({"s": 20, "bf": 0})
+    assert state.apply({"s": 18, "bf": 0})
+    assert state.flags["blade_found"]
+    assert state.seq == 20 and state.gaps == 0
+
+
+def test_event_before_first_snapshot_is_a_gap():
+    state = RigState()
+    assert not state.apply({"s": 5, "sip": 1})
+    assert not state.synced and state.gaps == 1
+    assert state.apply(snapshot(5))
+    assert state.synced